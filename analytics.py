@@ -0,0 +1,498 @@
+"""
+Cálculos de inventario independientes de Streamlit.
+
+Todas las funciones reciben el libro tipado por ``ingestion.preparar_libro``
+(o la tabla de stock derivada de él) y devuelven DataFrames o diccionarios,
+sin efectos secundarios sobre la interfaz. ``InventarioDashboard`` sólo
+dibuja sus resultados; informe.py los calcula desde la línea de comandos.
+"""
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Umbrales por defecto (mismo orden que InventarioDashboard.ESTADOS_STOCK)
+ESTADOS_STOCK = {
+    'CRÍTICO': {'umbral': 5},
+    'BAJO': {'umbral': 20},
+    'NORMAL': {'umbral': float('inf')}
+}
+
+COLUMNAS_STOCK = [
+    'Almacén', 'Producto', 'Lote', 'Stock', 'Kg Total', 'Total Inicial',
+    'Entradas', 'Traspasos Recibidos', 'Traspasos Enviados', 'Salidas',
+    'Ventas Total', '% Vendido', '% Disponible', 'Estado Stock', 'Rotación'
+]
+
+# Cada movimiento se descompone en "patas" con signo sobre un almacén:
+# ENTRADA y SALIDA afectan a 'almacen'; un TRASPASO sale de 'almacen'
+# (enviado) y entra en 'almacen actual' (recibido).
+_PATAS = ['ENTRADA', 'TRASPASO_REC', 'TRASPASO_ENV', 'SALIDA']
+_MEDIDAS = ['cajas', 'kg', 'precio total']
+_PATA_ORIGEN = {'ENTRADA': 0, 'TRASPASO': 2, 'SALIDA': 3}
+
+
+def _almacen_valido(serie: pd.Series) -> np.ndarray:
+    """No nulo y no vacío; se evalúa sobre los valores únicos (rápido en categóricas)."""
+    codigos, unicos = pd.factorize(serie)
+    validos = np.array([str(a).strip() != '' for a in unicos] + [False], dtype=bool)
+    return validos[codigos]
+
+
+def _unicos(serie: pd.Series, previos: pd.Index = None) -> pd.Index:
+    """Valores en orden de primera aparición, a continuación de los ya vistos."""
+    nuevos = pd.Index(np.asarray(serie.unique(), dtype=object), dtype=object)
+    if previos is None:
+        return nuevos
+    return previos.append(nuevos[~nuevos.isin(previos)])
+
+
+def _orden_almacenes(origen: pd.Index, destino: pd.Index) -> pd.Index:
+    """Almacenes en orden de aparición (primero 'almacen', luego 'almacen actual')."""
+    almacenes = origen.append(destino[~destino.isin(origen)])
+    return pd.Index([a for a in almacenes if pd.notna(a) and str(a).strip() != ''])
+
+
+def descomponer_patas(df: pd.DataFrame, extra: list = ()) -> pd.DataFrame:
+    """
+    Una fila por pata con almacén válido: nombre, lote, almacen, medidas,
+    las columnas ``extra`` del libro y 'pata' (categórica en el orden de _PATAS).
+    """
+    mov = df['movimiento']
+    es_traspaso = (mov == 'TRASPASO').to_numpy()
+    extra = list(extra)
+
+    es_origen = mov.isin(['ENTRADA', 'TRASPASO', 'SALIDA']).to_numpy()
+    origen = df.loc[es_origen, ['nombre', 'lote', 'almacen'] + _MEDIDAS + extra]
+    codigos = mov[es_origen].map(_PATA_ORIGEN).to_numpy(dtype=np.int8)
+    origen = origen.assign(pata=pd.Categorical.from_codes(codigos, categories=_PATAS))
+
+    destino = df.loc[es_traspaso, ['nombre', 'lote', 'almacen actual'] + _MEDIDAS + extra]
+    destino = destino.rename(columns={'almacen actual': 'almacen'}).assign(
+        pata=pd.Categorical.from_codes(np.full(len(destino), _PATAS.index('TRASPASO_REC'), dtype=np.int8), categories=_PATAS)
+    )
+
+    # Con categóricas que comparten diccionario la concatenación conserva los códigos
+    patas = pd.concat([origen, destino], ignore_index=True)
+    return patas[_almacen_valido(patas['almacen'])]
+
+
+def agregar_movimientos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrupa el libro de movimientos una sola vez por (nombre, lote, almacén, pata).
+    Devuelve una tabla ancha con columnas (medida, pata) indexada por
+    (nombre, lote, almacen).
+    """
+    patas = descomponer_patas(df)
+    columnas = pd.MultiIndex.from_product([_MEDIDAS, _PATAS])
+    if patas.empty:
+        indice = pd.MultiIndex.from_arrays([[], [], []], names=['nombre', 'lote', 'almacen'])
+        return pd.DataFrame(0, index=indice, columns=columnas)
+
+    agregado = patas.groupby(['nombre', 'lote', 'almacen', 'pata'], sort=False, observed=True)[_MEDIDAS].sum()
+    ancho = agregado.unstack('pata', fill_value=0)
+    ancho.columns = pd.MultiIndex.from_arrays([
+        ancho.columns.get_level_values(0), ancho.columns.get_level_values(1).astype(str)
+    ])
+    return ancho.reindex(columns=columnas, fill_value=0)
+
+
+def calcular_porcentaje(parte, total):
+    """Calcula porcentaje con manejo de errores."""
+    try:
+        return round((parte / total * 100), 2) if total > 0 else 0
+    except:
+        return 0
+
+
+def porcentaje(parte, total) -> np.ndarray:
+    """
+    Versión vectorizada de ``calcular_porcentaje``. Redondea con numpy, igual
+    que el cálculo fila a fila original (round() sobre np.float64).
+    """
+    parte = np.asarray(parte, dtype=float)
+    total = np.asarray(total, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.where(total > 0, parte / total * 100, 0.0)
+    return np.round(pct, 2)
+
+
+def clasificar_estado(stock, estados_stock: dict = ESTADOS_STOCK) -> np.ndarray:
+    """
+    Asigna el primer estado cuyo umbral sea >= stock (por defecto 'NORMAL').
+
+    Con el máximo acumulado de los umbrales (en el orden del diccionario) el
+    primer estado que encaja es el primer tramo cuyo límite alcanza el stock,
+    así que basta una búsqueda binaria por valor.
+    """
+    stock = np.asarray(stock, dtype=float)
+    umbrales = np.array([config['umbral'] for config in estados_stock.values()], dtype=float)
+    # Un umbral NaN no se cumple nunca, como en la comparación escalar
+    validos = ~np.isnan(umbrales)
+    limites = np.maximum.accumulate(umbrales[validos])
+    etiquetas = np.array(list(estados_stock) + ['NORMAL'], dtype=object)[np.append(validos, True)]
+    # Un stock NaN queda detrás de todos los límites: 'NORMAL'
+    return etiquetas[np.searchsorted(limites, stock, side='left')]
+
+
+def formatear_numero(numero, decimales=2):
+    """Formatea números (ej: 1000 => 1K, 1,000,000 => 1M)."""
+    try:
+        if abs(numero) >= 1_000_000:
+            return f"{numero/1_000_000:.{decimales}f}M"
+        elif abs(numero) >= 1_000:
+            return f"{numero/1_000:.{decimales}f}K"
+        else:
+            return f"{numero:.{decimales}f}"
+    except:
+        return "0"
+
+
+def formatear_numeros(valores, decimales: int = 2) -> np.ndarray:
+    """
+    Versión por lotes de ``formatear_numero``: array de textos con el mismo
+    resultado elemento a elemento. Los arrays enteros o reales se escalan y
+    formatean de una vez; cualquier otro valor pasa por ``formatear_numero``.
+    """
+    valores = np.asarray(valores)
+    if valores.dtype.kind not in 'iuf':
+        return np.array([formatear_numero(v, decimales) for v in valores.ravel().tolist()],
+                        dtype=object).reshape(valores.shape)
+    numeros = valores.astype(float)
+    magnitud = np.abs(numeros)
+    millones = magnitud >= 1_000_000
+    miles = ~millones & (magnitud >= 1_000)
+    escala = np.where(millones, 1_000_000.0, np.where(miles, 1_000.0, 1.0))
+    sufijo = np.where(millones, 'M', np.where(miles, 'K', ''))
+    textos = np.char.add(np.char.mod(f'%.{int(decimales)}f', numeros / escala), sufijo)
+    return textos.astype(object)
+
+
+def formatear_metricas(valores) -> list:
+    """
+    Textos de las tarjetas de métricas: los reales, abreviados con
+    ``formatear_numeros`` en una sola llamada; los conteos, tal cual.
+    """
+    valores = list(valores)
+    reales = [i for i, v in enumerate(valores) if isinstance(v, (float, np.floating))]
+    textos = [f"{v}" for v in valores]
+    for i, texto in zip(reales, formatear_numeros([valores[i] for i in reales])):
+        textos[i] = texto
+    return textos
+
+
+def tabla_stock(ancho: pd.DataFrame, estados_stock: dict = ESTADOS_STOCK) -> pd.DataFrame:
+    """Construye la tabla de stock a partir de los acumulados por (nombre, lote, almacen)."""
+    entradas = ancho[('cajas', 'ENTRADA')]
+    tr_rec = ancho[('cajas', 'TRASPASO_REC')]
+    tr_env = ancho[('cajas', 'TRASPASO_ENV')]
+    salidas = ancho[('cajas', 'SALIDA')]
+
+    total_inicial = entradas + tr_rec
+    stock = total_inicial - tr_env - salidas
+    kg_total = (
+        ancho[('kg', 'ENTRADA')] + ancho[('kg', 'TRASPASO_REC')]
+        - ancho[('kg', 'TRASPASO_ENV')] - ancho[('kg', 'SALIDA')]
+    )
+    pct_vendido = porcentaje(salidas, total_inicial)
+
+    # Las claves del libro pueden ser categóricas; la tabla de stock usa texto
+    claves = ancho.index
+    stock_df = pd.DataFrame({
+        'Almacén': np.asarray(claves.get_level_values('almacen'), dtype=object),
+        'Producto': np.asarray(claves.get_level_values('nombre'), dtype=object),
+        'Lote': np.asarray(claves.get_level_values('lote'), dtype=object),
+        'Stock': stock.to_numpy(),
+        'Kg Total': kg_total.to_numpy(),
+        'Total Inicial': total_inicial.to_numpy(),
+        'Entradas': entradas.to_numpy(),
+        'Traspasos Recibidos': tr_rec.to_numpy(),
+        'Traspasos Enviados': tr_env.to_numpy(),
+        'Salidas': salidas.to_numpy(),
+        'Ventas Total': ancho[('precio total', 'SALIDA')].to_numpy(),
+        '% Vendido': pct_vendido,
+        '% Disponible': porcentaje(stock, total_inicial),
+        'Estado Stock': clasificar_estado(stock, estados_stock),
+        'Rotación': pct_vendido
+    })
+
+    visibles = ((total_inicial > 0) | (stock != 0)).to_numpy()
+    return stock_df[visibles].reset_index(drop=True)
+
+
+def ordenar_stock(stock_df: pd.DataFrame, productos: pd.Index, lotes: pd.Index,
+                  almacenes: pd.Index) -> pd.DataFrame:
+    """Ordena como el recorrido producto × lote × almacén del cálculo original."""
+    if stock_df.empty:
+        return stock_df
+    rango_prod = productos.get_indexer(stock_df['Producto'])
+    rango_lote = lotes.get_indexer(stock_df['Lote'])
+    rango_alm = almacenes.get_indexer(stock_df['Almacén'])
+    orden = np.lexsort((rango_alm, rango_lote, rango_prod))
+    return stock_df.iloc[orden].reset_index(drop=True)
+
+
+def ordenes_libro(df: pd.DataFrame) -> tuple:
+    """Productos, lotes y almacenes en orden de aparición (para ordenar_stock)."""
+    almacenes = _orden_almacenes(_unicos(df['almacen']), _unicos(df['almacen actual']))
+    return _unicos(df['nombre']), _unicos(df['lote']), almacenes
+
+
+def calcular_stock_actual(df: pd.DataFrame, estados_stock: dict = ESTADOS_STOCK) -> pd.DataFrame:
+    """
+    Stock por (almacén, producto, lote) con una única agregación agrupada.
+    Coste aproximadamente lineal en el número de filas del libro.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS_STOCK)
+
+    stock_df = tabla_stock(agregar_movimientos(df), estados_stock)
+    return ordenar_stock(stock_df, *ordenes_libro(df)).round(2)
+
+
+METRICAS_VACIAS = {
+    'Total Productos': 0,
+    'Total Almacenes': 0,
+    'Total Lotes': 0,
+    'Total Cajas en Stock': 0,
+    'Total Kg en Stock': 0,
+    'Total Ventas ($)': 0,
+    'Productos en Estado Crítico': 0,
+    'Rotación Promedio (%)': 0
+}
+
+
+def calcular_metricas_generales(stock_df: pd.DataFrame) -> dict:
+    """Métricas resumen de una tabla de stock (posiblemente filtrada)."""
+    if stock_df.empty:
+        return dict(METRICAS_VACIAS)
+    return {
+        'Total Productos': len(stock_df['Producto'].unique()),
+        'Total Almacenes': len(stock_df['Almacén'].unique()),
+        'Total Lotes': len(stock_df['Lote'].unique()),
+        'Total Cajas en Stock': stock_df['Stock'].sum(),
+        'Total Kg en Stock': stock_df['Kg Total'].sum(),
+        'Total Ventas ($)': stock_df['Ventas Total'].sum(),
+        'Productos en Estado Crítico': len(stock_df[stock_df['Estado Stock'] == 'CRÍTICO']),
+        'Rotación Promedio (%)': stock_df['Rotación'].mean()
+    }
+
+
+def filtrar_stock(stock_df: pd.DataFrame, lotes=None, almacenes=None, estados=None) -> pd.DataFrame:
+    """Filtros de las vistas; una lista vacía o None no filtra."""
+    marca = np.ones(len(stock_df), dtype=bool)
+    for columna, valores in (('Lote', lotes), ('Almacén', almacenes), ('Estado Stock', estados)):
+        if valores:
+            marca &= stock_df[columna].isin(valores).to_numpy()
+    return stock_df[marca]
+
+
+def entradas_vs_salidas(stock_df: pd.DataFrame) -> pd.DataFrame:
+    """Entradas, salidas y % vendido por producto."""
+    df_group = stock_df.groupby('Producto').agg({
+        'Entradas': 'sum',
+        'Salidas': 'sum',
+        'Total Inicial': 'sum'
+    }).reset_index()
+    df_group['% Vendido'] = porcentaje(df_group['Salidas'], df_group['Total Inicial'])
+    return df_group
+
+
+def metricas_producto(df_prod: pd.DataFrame) -> dict:
+    return {
+        "Stock Total": df_prod['Stock'].sum(),
+        "Kg Totales": df_prod['Kg Total'].sum(),
+        "Ventas Totales ($)": df_prod['Ventas Total'].sum(),
+        "Rotación (%)": df_prod['Rotación'].mean()
+    }
+
+
+def metricas_almacen(df_alm: pd.DataFrame) -> dict:
+    return {
+        "Total Productos": len(df_alm['Producto'].unique()),
+        "Stock Total": df_alm['Stock'].sum(),
+        "Productos Críticos": len(df_alm[df_alm['Estado Stock'] == 'CRÍTICO'])
+    }
+
+
+def resumen_almacen(df_alm: pd.DataFrame, estados_stock: dict = ESTADOS_STOCK) -> pd.DataFrame:
+    """Estado de stock por producto dentro de un almacén (de mayor a menor stock)."""
+    resumen = df_alm.groupby('Producto').agg({
+        'Stock': 'sum',
+        'Kg Total': 'sum',
+        'Total Inicial': 'sum',
+        'Salidas': 'sum',
+        '% Vendido': 'mean',
+        '% Disponible': 'mean'
+    }).round(2).reset_index()
+    resumen['Estado'] = clasificar_estado(resumen['Stock'], estados_stock)
+    return resumen.sort_values('Stock', ascending=False)
+
+
+def resumen_almacenes(stock_df: pd.DataFrame) -> pd.DataFrame:
+    """Una fila por almacén con las métricas de ``metricas_almacen``."""
+    grupos = stock_df.groupby('Almacén')
+    return pd.DataFrame({
+        'Total Productos': grupos['Producto'].nunique(),
+        'Stock Total': grupos['Stock'].sum(),
+        'Kg Total': grupos['Kg Total'].sum(),
+        'Ventas Total': grupos['Ventas Total'].sum(),
+        'Productos Críticos': (stock_df['Estado Stock'] == 'CRÍTICO').groupby(stock_df['Almacén']).sum(),
+    }).round(2).reset_index()
+
+
+def ventas_validas(df: pd.DataFrame) -> pd.DataFrame:
+    """Salidas con precio: las filas que cuentan como venta."""
+    ventas = df[df['movimiento'] == 'SALIDA']
+    return ventas[ventas['precio'] > 0]
+
+
+def ventas_agrupadas(ventas: pd.DataFrame, claves, total_ventas: float) -> pd.DataFrame:
+    """Cajas, kg e importe por ``claves``, de mayor a menor importe."""
+    agrupado = ventas.groupby(claves, observed=True).agg({
+        'cajas': 'sum', 'kg': 'sum', 'precio total': 'sum'
+    }).round(2).sort_values('precio total', ascending=False)
+    agrupado['% del Total'] = (agrupado['precio total'] / total_ventas * 100).round(2)
+    agrupado['Precio/Kg'] = (agrupado['precio total'] / agrupado['kg']).round(2)
+    return agrupado
+
+
+def metricas_ventas(ventas: pd.DataFrame) -> dict:
+    total_ventas = ventas['precio total'].sum()
+    total_kg = ventas['kg'].sum()
+    return {
+        "Total Ventas": total_ventas,
+        "Total Kg Vendidos": total_kg,
+        "Total Cajas Vendidas": ventas['cajas'].sum(),
+        "Precio Promedio/Kg": total_ventas / total_kg if total_kg else 0
+    }
+
+
+def metricas_cliente(df_cliente: pd.DataFrame, total_ventas: float) -> dict:
+    return metricas_compras(df_cliente['precio total'].sum(), df_cliente['kg'].sum(), total_ventas)
+
+
+def metricas_compras(total_cli: float, kg_cli: float, total_ventas: float) -> dict:
+    """Métricas de un cliente a partir de su importe y sus kg."""
+    return {
+        "Total Compras": total_cli,
+        "Total Kg": kg_cli,
+        "% del Total": (total_cli/total_ventas*100) if total_ventas else 0,
+        "Precio Promedio/Kg": total_cli/kg_cli if kg_cli > 0 else 0
+    }
+
+
+COLUMNAS_DETALLE_VENTAS = [
+    'nombre', 'lote', 'cliente', 'vendedor',
+    'cajas', 'kg', 'precio', 'precio total'
+]
+
+
+def detalle_ventas(ventas: pd.DataFrame) -> pd.DataFrame:
+    """Detalle de ventas completo, ordenado por cliente y producto."""
+    return ventas[COLUMNAS_DETALLE_VENTAS].sort_values(['cliente', 'nombre'])
+
+
+def filtrar_ventas(ventas: pd.DataFrame, clientes=None, productos=None, vendedores=None,
+                   detalle: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Detalle de ventas filtrado, ordenado por cliente y producto. ``detalle``
+    (el de detalle_ventas) evita reordenar: el orden es estable, así que
+    filtrar la tabla ya ordenada da el mismo resultado.
+    """
+    if detalle is None:
+        detalle = detalle_ventas(ventas)
+    marca = np.ones(len(detalle), dtype=bool)
+    for columna, valores in (('cliente', clientes), ('nombre', productos), ('vendedor', vendedores)):
+        if valores:
+            marca &= detalle[columna].isin(valores).to_numpy()
+    return detalle if marca.all() else detalle[marca]
+
+
+def huella_dataframe(df: pd.DataFrame) -> str:
+    """Huella del contenido del libro: identifica una versión de los datos."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+#        Libro incremental: sólo procesa las filas añadidas al final
+# -----------------------------------------------------------------------------
+_COLUMNAS_CHECKSUM = ['nombre', 'lote', 'movimiento', 'almacen', 'almacen actual'] + _MEDIDAS
+
+
+def _hashes_filas(df: pd.DataFrame) -> np.ndarray:
+    """Un hash por fila de las columnas que intervienen en el stock."""
+    return pd.util.hash_pandas_object(df[_COLUMNAS_CHECKSUM], index=False).to_numpy()
+
+
+def _huella_prefijo(hashes: np.ndarray, n: int) -> bytes:
+    return hashlib.blake2b(hashes[:n].tobytes(), digest_size=16).digest()
+
+
+class StockIncremental:
+    """
+    Acumulados por (producto, lote, almacén) y número de filas ya procesadas.
+
+    La hoja sólo crece por el final: si tiene al menos las filas ya procesadas
+    y la huella de esas filas no ha cambiado, se suman únicamente las filas
+    nuevas; si no (filas borradas o editadas en cualquier posición), se
+    reconstruye desde cero. Comprobar la huella cuesta un hash por fila,
+    bastante menos que volver a agregar el libro.
+    Es seguro compartir una instancia entre sesiones.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reconstrucciones = 0
+        self.filas_incrementales = 0
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.filas_procesadas = 0
+        self._huella = None
+        self._ancho = None
+        self._productos = None
+        self._lotes = None
+        self._alm_origen = None
+        self._alm_destino = None
+
+    def _incorporar(self, nuevas: pd.DataFrame):
+        parcial = agregar_movimientos(nuevas)
+        if self._ancho is None:
+            self._ancho = parcial
+        elif not parcial.empty:
+            self._ancho = pd.concat([self._ancho, parcial]).groupby(level=[0, 1, 2], sort=False).sum()
+
+        self._productos = _unicos(nuevas['nombre'], self._productos)
+        self._lotes = _unicos(nuevas['lote'], self._lotes)
+        self._alm_origen = _unicos(nuevas['almacen'], self._alm_origen)
+        self._alm_destino = _unicos(nuevas['almacen actual'], self._alm_destino)
+
+    def actualizar(self, df: pd.DataFrame, estados_stock: dict = ESTADOS_STOCK) -> pd.DataFrame:
+        """Incorpora las filas nuevas de ``df`` y devuelve la tabla de stock."""
+        if df.empty:
+            return pd.DataFrame(columns=COLUMNAS_STOCK)
+
+        with self._lock:
+            n = self.filas_procesadas
+            hashes = _hashes_filas(df)
+            if n and len(df) >= n and _huella_prefijo(hashes, n) == self._huella:
+                nuevas = df.iloc[n:]
+                self.filas_incrementales += len(nuevas)
+            else:
+                self._reiniciar()
+                self.reconstrucciones += 1
+                nuevas = df
+
+            if not nuevas.empty:
+                self._incorporar(nuevas)
+                self.filas_procesadas = len(df)
+                self._huella = _huella_prefijo(hashes, len(df))
+
+            stock_df = tabla_stock(self._ancho, estados_stock)
+            almacenes = _orden_almacenes(self._alm_origen, self._alm_destino)
+            return ordenar_stock(stock_df, self._productos, self._lotes, almacenes).round(2)
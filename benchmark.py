@@ -0,0 +1,178 @@
+"""
+Banco de pruebas de rendimiento sobre libros sintéticos (generador.py).
+
+Mide, para cada tamaño de libro, las etapas que ejecuta el dashboard en una
+carga: limpieza/tipado de la ingesta, huella, cálculo de stock, métricas,
+agrupaciones de ventas y construcción de las figuras. Cada medida se escribe
+como una línea JSON para poder comparar ejecuciones:
+
+    python benchmark.py --filas 10000 100000 1000000 --salida bench.jsonl
+    python benchmark.py --filas 10000000 --repeticiones 1 --etapas ingestion stock
+
+Un libro de 10M filas en formato texto ocupa varios GB en memoria.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import analytics
+import generador
+import ingestion
+
+
+def _medir(funcion, repeticiones: int) -> tuple:
+    """Devuelve (tiempos, último resultado)."""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        resultado = None
+        gc.collect()
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos, resultado
+
+
+def _dashboard():
+    """InventarioDashboard sin servidor de Streamlit (las llamadas st.* no hacen nada)."""
+    from streamlit import logger
+    logger.set_log_level('ERROR')
+    import dashboard
+    return dashboard.InventarioDashboard()
+
+
+def etapas(libro_texto: pd.DataFrame, tablero) -> list:
+    """
+    Etapas en orden de ejecución; cada una es (nombre, función, extras) y
+    puede usar los resultados de las anteriores a través de ``estado``.
+    """
+    estado = {'texto': libro_texto}
+
+    def ingestion_():
+        estado['libro'] = ingestion.preparar_libro(estado['texto'])
+        return estado['libro']
+
+    def stock():
+        estado['stock'] = analytics.calcular_stock_actual(estado['libro'])
+        return estado['stock']
+
+    def ventas():
+        estado['ventas'] = analytics.ventas_validas(estado['libro'])
+        estado['total_ventas'] = estado['ventas']['precio total'].sum()
+        return estado['ventas']
+
+    lista = [
+        ('ingestion', ingestion_, lambda r: {'memoria_bytes': r.attrs['memoria']}),
+        ('huella', lambda: analytics.huella_dataframe(estado['libro']), None),
+        ('stock', stock, lambda r: {'filas_resultado': len(r)}),
+        ('metricas', lambda: analytics.calcular_metricas_generales(estado['stock']), None),
+        ('ventas_filtro', ventas, lambda r: {'filas_resultado': len(r)}),
+        ('ventas_por_producto', lambda: analytics.ventas_agrupadas(
+            estado['ventas'], ['nombre', 'lote'], estado['total_ventas']),
+         lambda r: {'filas_resultado': len(r)}),
+        ('ventas_por_cliente', lambda: analytics.ventas_agrupadas(
+            estado['ventas'], 'cliente', estado['total_ventas']),
+         lambda r: {'filas_resultado': len(r)}),
+    ]
+    if tablero is not None:
+        extras_figura = lambda fig: {'json_bytes': len(fig.to_json())}
+        lista += [
+            ('figura_barras', lambda: tablero.generar_grafico_stock(
+                estado['stock'], tipo='barras', titulo='Stock por Producto y Estado'), extras_figura),
+            ('figura_treemap', lambda: tablero.generar_grafico_stock(
+                estado['stock'], tipo='treemap', titulo='Distribución de Stock'), extras_figura),
+            ('figura_entradas_salidas', lambda: tablero.figura_entradas_vs_salidas(estado['stock'])[0],
+             extras_figura),
+        ]
+    return lista
+
+
+def entorno() -> dict:
+    return {
+        'tipo': 'entorno',
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'cpus': os.cpu_count(),
+        'plataforma': platform.platform(),
+    }
+
+
+def ejecutar(tamanos: list, repeticiones: int = 3, seleccion: list = None,
+             figuras: bool = True, opciones_libro: dict = None, salida=sys.stdout):
+    """Escribe una línea JSON por (tamaño, etapa) en ``salida``."""
+    tablero = _dashboard() if figuras else None
+    salida.write(json.dumps(entorno()) + '\n')
+
+    for filas in tamanos:
+        inicio = time.perf_counter()
+        libro_texto = generador.generar_libro(filas, **(opciones_libro or {}))
+        generacion = time.perf_counter() - inicio
+
+        for nombre, funcion, extras in etapas(libro_texto, tablero):
+            # Las etapas no seleccionadas se ejecutan una vez para preparar las siguientes
+            medir = seleccion is None or nombre in seleccion
+            tiempos, resultado = _medir(funcion, repeticiones if medir else 1)
+            if not medir:
+                continue
+            registro = {
+                'tipo': 'medida',
+                'filas': filas,
+                'etapa': nombre,
+                'repeticiones': repeticiones,
+                'segundos_min': min(tiempos),
+                'segundos_mediana': statistics.median(tiempos),
+                'segundos_max': max(tiempos),
+                'filas_por_segundo': filas / min(tiempos) if min(tiempos) else None,
+                'generacion_segundos': generacion,
+            }
+            if extras is not None:
+                registro.update(extras(resultado))
+            salida.write(json.dumps(registro) + '\n')
+            salida.flush()
+            print(f"{filas:>10,} {nombre:<24} {min(tiempos) * 1000:>10.1f} ms", file=sys.stderr)
+
+        del libro_texto
+        gc.collect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas del dashboard de inventario")
+    parser.add_argument("--filas", type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--etapas", nargs='+', help="etapas a medir (por defecto todas)")
+    parser.add_argument("--sin-figuras", action='store_true', help="no medir la construcción de figuras")
+    parser.add_argument("--productos", type=int, default=40)
+    parser.add_argument("--lotes", type=int, default=6, help="lotes por producto")
+    parser.add_argument("--almacenes", type=int, default=5)
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="fichero JSON lines (por defecto stdout)")
+    args = parser.parse_args()
+
+    opciones_libro = {
+        'productos': args.productos, 'lotes_por_producto': args.lotes,
+        'almacenes': args.almacenes, 'clientes': args.clientes, 'semilla': args.semilla
+    }
+    salida = open(args.salida, 'a', encoding='utf-8') if args.salida else sys.stdout
+    try:
+        ejecutar(args.filas, args.repeticiones, args.etapas, not args.sin_figuras, opciones_libro, salida)
+    finally:
+        if args.salida:
+            salida.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Caché LRU de figuras Plotly compartida por todas las sesiones.
+
+La clave incluye la huella de los datos, el tipo de gráfico y los filtros
+que lo determinan, así que una figura sólo se reutiliza mientras los datos
+no cambian. El tamaño de cada entrada es el de su JSON serializado y, al
+superar ``max_bytes``, se expulsan las menos usadas recientemente.
+
+Las figuras guardadas no deben modificarse después de obtenerlas.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from perfil import bytes_figura
+
+_Entrada = namedtuple('_Entrada', ['figura', 'bytes'])
+
+
+def separar_tamano(resultado) -> tuple:
+    """``(figura, bytes)`` tal cual; una figura sola, con bytes None (sin medir)."""
+    return resultado if isinstance(resultado, tuple) else (resultado, None)
+
+
+class CacheFiguras:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_totales = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsadas = 0
+
+    def obtener(self, clave: tuple, construir):
+        """
+        Figura de ``clave``; si no está, ``construir()`` y guardarla.
+        ``construir()`` puede devolver ``(figura, bytes)`` si ya midió su JSON.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada.figura
+            self.fallos += 1
+
+        figura, tamano = separar_tamano(construir())
+        if figura is None:
+            return None
+        if tamano is None:
+            tamano = bytes_figura(figura)
+        if tamano > self.max_bytes:
+            return figura
+
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self.bytes_totales -= anterior.bytes
+            self._entradas[clave] = _Entrada(figura, tamano)
+            self.bytes_totales += tamano
+            while self.bytes_totales > self.max_bytes:
+                _, expulsada = self._entradas.popitem(last=False)
+                self.bytes_totales -= expulsada.bytes
+                self.expulsadas += 1
+        return figura
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                'figuras': len(self._entradas),
+                'bytes': self.bytes_totales,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsadas': self.expulsadas,
+            }
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes_totales = 0
@@ -0,0 +1,534 @@
+"""
+Prueba de carga con varias sesiones simultáneas del dashboard.
+
+Arranca un servidor real (``streamlit run dashboard.py``) y le conecta N
+clientes a la vez por el mismo WebSocket que usa el navegador
+(/_stcore/stream), de modo que todas las sesiones comparten el proceso y
+sus cachés, como en producción. La fuente es un libro sintético
+(generador.py) servido por sheets_local.py, sin red ni credenciales. Cada
+sesión sigue un guion aleatorio (con semilla) de cambios de pestaña, filtros
+de lote y almacén y selectores de cliente y producto, y se mide cada rerun
+desde que el cliente lo pide hasta que recibe su fin. Los clientes no
+declaran mensajes en caché, así que reciben cada rerun completo.
+
+Para cada número de sesiones (cada nivel con un servidor recién arrancado)
+se informa de los percentiles p50/p95/p99 de latencia por rerun (global y
+por acción) y del RSS (en reposo y pico) y la CPU del proceso del servidor,
+leídos de /proc. Los errores de la aplicación (excepciones o st.error en el
+rerun) se cuentan aparte de los del arnés (conexión que falla o agota su
+tiempo, guion roto), y los pasos omitidos porque el widget no está en la
+página no entran en los percentiles. Una línea JSON por medida, como
+benchmark.py:
+
+    python carga.py --sesiones 1 4 16 --filas 100000 --salida carga.jsonl
+    INVENTARIO_VISTAS_PEREZOSAS=0 python carga.py --sesiones 8 --acciones lote almacen
+    python carga.py --fuente csv:datos/ --sesiones 4 8 --sincronizar
+
+Las variables INVENTARIO_* del entorno pasan al servidor, de modo que se
+pueden comparar configuraciones de caché con el mismo guion.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+
+import numpy as np
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.sync.client import connect
+
+import generador
+from benchmark import entorno
+from data_sources import crear_fuente
+from sheets_local import ServidorSheetsLocal
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard.py')
+
+# Pestañas del dashboard (etiqueta de la vista -> clave de sus subpestañas)
+STOCK, VENTAS, COMERCIAL = "📊 Stock", "💰 Ventas", "🎯 Vista Comercial"
+VISTAS = [STOCK, VENTAS, COMERCIAL]
+SUBPESTANAS = {VENTAS: "ventas_pestana", COMERCIAL: "comercial_pestana"}
+
+
+# Resultado de cada paso del guion
+OK, ERROR_APP, ERROR_ARNES, OMITIDO = 'ok', 'app', 'arnes', 'omitido'
+
+
+def conectar(url: str, timeout: float):
+    """WebSocket de una sesión nueva en el servidor ``url``."""
+    return connect(url.replace('http', 'ws', 1) + '/_stcore/stream', subprotocols=['streamlit'],
+                   max_size=None, open_timeout=timeout)
+
+
+class SesionWeb:
+    """
+    Un usuario: una conexión WebSocket al servidor, como la del navegador, y
+    las medidas (acción, segundos, resultado) de sus pasos. Los pasos con
+    error del arnés u omitidos no tienen segundos.
+    """
+
+    def __init__(self, ws, semilla: int, timeout: float):
+        self.ws = ws
+        self.timeout = timeout
+        self.rng = random.Random(semilla)
+        self.medidas = []
+        self.errores_arnes = []
+        self.pagina = ''
+        # Widgets de la última página recibida (clave -> (proto, tipo, fragmento))
+        # y estado de los que ha tocado el usuario (id -> WidgetState): el
+        # navegador reenvía ese estado en cada rerun
+        self.widgets = {}
+        self.estados = {}
+        self.pestanas = {}
+
+    def rerun(self, accion: str, fragmento: str = ''):
+        mensaje = BackMsg()
+        cliente = mensaje.rerun_script
+        cliente.page_script_hash = self.pagina
+        cliente.fragment_id = fragmento
+        cliente.widget_states.widgets.extend(self.estados.values())
+        inicio = time.perf_counter()
+        try:
+            self.ws.send(mensaje.SerializeToString())
+            error = self._recibir(completo=not fragmento)
+        except Exception as exc:
+            self.fallo_arnes(accion, exc)
+            return
+        segundos = time.perf_counter() - inicio
+        self.medidas.append((accion, segundos, ERROR_APP if error else OK))
+
+    def _recibir(self, completo: bool) -> bool:
+        """Lee mensajes hasta el fin del rerun; True si la app mostró un error."""
+        if completo:
+            self.widgets = {}
+        error = False
+        while True:
+            mensaje = ForwardMsg()
+            mensaje.ParseFromString(self.ws.recv(timeout=self.timeout))
+            tipo = mensaje.WhichOneof('type')
+            if tipo == 'new_session':
+                self.pagina = mensaje.new_session.page_script_hash or mensaje.new_session.main_script_hash
+            elif tipo == 'delta':
+                error |= self._delta(mensaje.delta)
+            elif tipo == 'script_finished' and mensaje.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return error or mensaje.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR
+
+    def _delta(self, delta) -> bool:
+        if delta.WhichOneof('type') == 'add_block' and delta.add_block.WhichOneof('type') == 'tab_container':
+            self._widget(delta.add_block.tab_container, 'pestanas', delta.fragment_id)
+        elif delta.WhichOneof('type') == 'new_element':
+            elemento = delta.new_element
+            tipo = elemento.WhichOneof('type')
+            if tipo == 'exception' or (tipo == 'alert' and elemento.alert.format == Alert.ERROR):
+                return True
+            if tipo in ('multiselect', 'selectbox'):
+                self._widget(getattr(elemento, tipo), tipo, delta.fragment_id)
+        return False
+
+    def _widget(self, widget, tipo: str, fragmento: str):
+        # Los widgets con key tienen id "$$ID-<hash>-<key>"
+        if widget.id.startswith('$$ID-'):
+            self.widgets[widget.id.split('-', 2)[2]] = (widget, tipo, fragmento)
+
+    def _cambiar(self, key: str, tipo: str, accion: str, valor):
+        widget, _, fragmento = self.widgets[key]
+        estado = WidgetState(id=widget.id)
+        if tipo == 'multiselect':
+            estado.string_array_value.data.extend(valor)
+        else:
+            estado.string_value = valor
+        self.estados[widget.id] = estado
+        self.rerun(accion, fragmento)
+
+    def fallo_arnes(self, accion: str, exc: BaseException):
+        self.medidas.append((accion, None, ERROR_ARNES))
+        self.errores_arnes.append(f"{accion}: {type(exc).__name__}: {exc}")
+
+    def _pestana(self, clave: str, etiqueta: str):
+        if self.pestanas.get(clave) == etiqueta:
+            return
+        if self.widgets.get(clave, (None, None))[1] != 'pestanas':
+            self.medidas.append(('pestana', None, OMITIDO))
+            return
+        self.pestanas[clave] = etiqueta
+        self._cambiar(clave, 'pestanas', 'pestana', etiqueta)
+
+    def abrir(self, vista: str, subpestana: str = None):
+        # Sin pestaña elegida la vista abierta es la primera
+        if vista != STOCK or 'vista_pestana' in self.pestanas:
+            self._pestana('vista_pestana', vista)
+        if subpestana:
+            self._pestana(SUBPESTANAS[vista], subpestana)
+
+    def elegir(self, tipo: str, key: str, accion: str):
+        """Cambia el widget ``key`` a un valor al azar y mide el rerun."""
+        if self.widgets.get(key, (None, None))[1] != tipo:
+            self.medidas.append((accion, None, OMITIDO))
+            return
+        opciones = list(self.widgets[key][0].options)
+        if not opciones:
+            return
+        if tipo == 'multiselect':
+            valor = self.rng.sample(opciones, k=min(len(opciones), self.rng.randint(0, 2)))
+        else:
+            valor = self.rng.choice(opciones)
+        self._cambiar(key, tipo, accion, valor)
+
+
+ACCIONES = {
+    'pestana': lambda s: s.abrir(s.rng.choice(VISTAS)),
+    'lote': lambda s: (s.abrir(STOCK), s.elegir('multiselect', 'stock_lote_filter', 'lote')),
+    'almacen': lambda s: (s.abrir(STOCK), s.elegir('multiselect', 'stock_almacen_filter', 'almacen')),
+    'cliente': lambda s: (
+        s.abrir(VENTAS, "👥 Análisis por Cliente"),
+        s.elegir('selectbox', 'ventas_cliente_select', 'cliente')
+    ),
+    'producto': lambda s: (
+        s.abrir(COMERCIAL, "🔍 Por Producto"),
+        s.elegir('selectbox', 'comercial_producto_select', 'producto')
+    ),
+}
+
+
+class Muestreo:
+    """
+    RSS del proceso ``pid`` cada ``intervalo`` segundos y CPU que consume
+    entre inicio y fin, leídos de /proc. Sin /proc (fuera de Linux) los
+    valores quedan en None.
+    """
+
+    def __init__(self, pid: int, intervalo: float = 0.05):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.inicial = self.pico = self.cpu = None
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+
+    def rss(self):
+        try:
+            with open(f'/proc/{self.pid}/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            return None
+
+    def segundos_cpu(self):
+        try:
+            with open(f'/proc/{self.pid}/stat') as f:
+                # El nombre del proceso va entre paréntesis; después, utime y stime son los campos 14 y 15
+                campos = f.read().rsplit(')', 1)[1].split()
+            return (int(campos[11]) + int(campos[12])) / os.sysconf('SC_CLK_TCK')
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _bucle(self):
+        while not self._parar.wait(self.intervalo):
+            rss = self.rss()
+            if rss is not None:
+                self.pico = max(self.pico or 0, rss)
+
+    def __enter__(self):
+        self.inicial = self.pico = self.rss()
+        self._cpu = self.segundos_cpu()
+        self._inicio = time.perf_counter()
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+        cpu = self.segundos_cpu()
+        self.segundos = time.perf_counter() - self._inicio
+        if cpu is not None and self._cpu is not None:
+            self.cpu = cpu - self._cpu
+
+
+def entorno_servidor(fuente: str) -> dict:
+    """Entorno del servidor: el de este proceso, con la fuente local."""
+    # Sin instantánea en disco ni traza salvo que se pidan: se mide el dashboard, no el arranque
+    return {'INVENTARIO_SNAPSHOT_DIR': '', 'INVENTARIO_PERFIL_TRAZA': '', **os.environ,
+            'INVENTARIO_FUENTE': fuente}
+
+
+class ServidorStreamlit:
+    """
+    ``streamlit run dashboard.py`` en un subproceso, con la fuente ``fuente``
+    (URL del servidor de sheets_local.py). ``pid`` es el proceso que se mide:
+    el script se ejecuta en hilos de ese mismo proceso.
+    """
+
+    def __init__(self, fuente: str, registro: str, timeout: float = 120):
+        self.fuente = fuente
+        self.registro = registro
+        self.timeout = timeout
+        self.proceso = None
+        self.url = None
+
+    @property
+    def pid(self) -> int:
+        return self.proceso.pid
+
+    def iniciar(self) -> str:
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            puerto = s.getsockname()[1]
+        self.url = f"http://127.0.0.1:{puerto}"
+        with open(self.registro, 'w', encoding='utf-8') as log:
+            self.proceso = subprocess.Popen(
+                [sys.executable, '-m', 'streamlit', 'run', SCRIPT,
+                 '--server.headless', 'true', '--server.address', '127.0.0.1', '--server.port', str(puerto),
+                 '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false',
+                 '--logger.level', 'error'],
+                env=entorno_servidor(self.fuente),
+                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            )
+        limite = time.monotonic() + self.timeout
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                break
+            try:
+                with urlopen(self.url + '/_stcore/health', timeout=1) as respuesta:
+                    if respuesta.status == 200:
+                        return self.url
+            except OSError:
+                time.sleep(0.2)
+        self.detener()
+        with open(self.registro, encoding='utf-8', errors='replace') as log:
+            raise RuntimeError(f"streamlit no arrancó en {self.timeout:.0f} s:\n{log.read()[-2000:]}")
+
+    def detener(self):
+        if self.proceso is None or self.proceso.poll() is not None:
+            return
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
+            self.proceso.wait()
+
+
+def _percentiles(segundos: list) -> dict:
+    if not segundos:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    ms = np.asarray(segundos) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'p50_ms': round(p50, 1), 'p95_ms': round(p95, 1), 'p99_ms': round(p99, 1),
+            'max_ms': round(ms.max(), 1)}
+
+
+def usuario(url: str, semilla: int, interacciones: int, acciones: list, pausa: float,
+            timeout: float, salida: threading.Barrier, paso: threading.Barrier) -> dict:
+    """
+    Una sesión simulada, en su propio hilo: se conecta, espera a las demás en
+    ``salida`` y ejecuta el guion. Devuelve sus medidas.
+    """
+    try:
+        ws = conectar(url, timeout)
+    except Exception:
+        # Sin esta sesión las demás no pasarían de la salida
+        salida.abort()
+        raise
+    with ws:
+        sesion = SesionWeb(ws, semilla, timeout)
+        try:
+            _guion(sesion, interacciones, acciones, pausa, timeout, salida, paso)
+        finally:
+            if paso is not None:
+                # Las sesiones que siguen no esperan a una que ya ha terminado
+                paso.abort()
+    return {'medidas': sesion.medidas, 'errores_arnes': sesion.errores_arnes}
+
+
+def _guion(sesion: SesionWeb, interacciones: int, acciones: list, pausa: float, timeout: float,
+           salida: threading.Barrier, paso: threading.Barrier):
+    salida.wait(timeout)
+    sesion.rerun('inicial')
+    for _ in range(interacciones):
+        if paso is not None:
+            try:
+                paso.wait(timeout)
+            except threading.BrokenBarrierError as exc:
+                # Otra sesión ha caído: no habrá más pasos sincronizados
+                sesion.fallo_arnes('sincronizar', exc)
+                break
+        elif pausa:
+            time.sleep(sesion.rng.uniform(0, 2 * pausa))
+        accion = sesion.rng.choice(acciones)
+        try:
+            ACCIONES[accion](sesion)
+        except Exception as exc:
+            sesion.fallo_arnes(accion, exc)
+
+
+def ejecutar_nivel(fuente: str, carpeta: str, sesiones: int, interacciones: int, acciones: list,
+                   pausa: float = 0, sincronizar: bool = False, semilla: int = 0,
+                   timeout: float = 300) -> dict:
+    """
+    Arranca un servidor de Streamlit nuevo, abre ``sesiones`` sesiones a la
+    vez contra él y cada una ejecuta ``interacciones`` acciones del guion.
+    Devuelve las medidas y errores del arnés de todas las sesiones, la
+    memoria y CPU del servidor y la duración.
+    """
+    servidor = ServidorStreamlit(fuente, os.path.join(carpeta, f"streamlit_{sesiones}.log"))
+    url = servidor.iniciar()
+    resultado = {'medidas': [], 'errores_arnes': []}
+    try:
+        salida = threading.Barrier(sesiones)
+        paso = threading.Barrier(sesiones) if sincronizar else None
+        with Muestreo(servidor.pid) as muestreo, ThreadPoolExecutor(max_workers=sesiones) as hilos:
+            futuros = [
+                hilos.submit(usuario, url, semilla * 1000 + i, interacciones, acciones, pausa, timeout,
+                             salida, paso)
+                for i in range(sesiones)
+            ]
+            for i, futuro in enumerate(futuros):
+                try:
+                    sesion = futuro.result()
+                except Exception as exc:
+                    # La sesión entera falló (no conectó o perdió la barrera de salida)
+                    resultado['errores_arnes'].append(f"sesion {i}: {type(exc).__name__}: {exc}")
+                    continue
+                resultado['medidas'] += sesion['medidas']
+                resultado['errores_arnes'] += sesion['errores_arnes']
+    finally:
+        servidor.detener()
+    resultado.update(segundos=muestreo.segundos, rss_inicial=muestreo.inicial, rss_pico=muestreo.pico,
+                     cpu=muestreo.cpu)
+    return resultado
+
+
+def _mb(valor):
+    return None if valor is None else round(valor / 1e6, 1)
+
+
+def registros_nivel(sesiones: int, resultado: dict) -> list:
+    """
+    Una línea por nivel (reruns tras la carga inicial) y una por acción. Los
+    percentiles sólo cuentan los reruns medidos, con o sin error de la app.
+    """
+    medidas = resultado['medidas']
+    medidos = [(a, s) for a, s, r in medidas if r in (OK, ERROR_APP)]
+    reruns = [(a, s) for a, s in medidos if a != 'inicial']
+    iniciales = [s for a, s in medidos if a == 'inicial']
+    segundos, cpu = resultado['segundos'], resultado['cpu']
+    inicial, pico = resultado['rss_inicial'], resultado['rss_pico']
+    resumen = {
+        'tipo': 'carga',
+        'sesiones': sesiones,
+        'reruns': len(reruns),
+        'errores_app': sum(r == ERROR_APP for _, _, r in medidas),
+        # Pasos con error del arnés y sesiones que no llegaron a terminar
+        'errores_arnes': len(resultado['errores_arnes']),
+        'omitidos': sum(r == OMITIDO for _, _, r in medidas),
+        **_percentiles([s for _, s in reruns]),
+        'inicial_p50_ms': _percentiles(iniciales)['p50_ms'],
+        'inicial_max_ms': _percentiles(iniciales)['max_ms'],
+        'segundos': round(segundos, 2),
+        'reruns_por_segundo': round(len(medidos) / segundos, 2) if segundos else None,
+        # Memoria y CPU del servidor de Streamlit, que comparte cachés entre sesiones
+        'rss_inicial_mb': _mb(inicial),
+        'rss_pico_mb': _mb(pico),
+        'rss_por_sesion_mb': _mb((pico - inicial) / sesiones) if pico is not None else None,
+        'cpu_segundos': round(cpu, 2) if cpu is not None else None,
+        # Núcleos ocupados de media (1.0 = un núcleo entero)
+        'cpu_nucleos': round(cpu / segundos, 2) if cpu is not None and segundos else None,
+        'cpu_segundos_por_sesion': round(cpu / sesiones, 2) if cpu is not None else None,
+        'detalle_arnes': resultado['errores_arnes'][:5],
+    }
+    por_accion = {}
+    for accion, segundos_paso, estado in medidas:
+        if accion != 'inicial':
+            por_accion.setdefault(accion, []).append((segundos_paso, estado))
+    return [resumen] + [
+        {'tipo': 'accion', 'sesiones': sesiones, 'accion': accion,
+         'n': sum(e in (OK, ERROR_APP) for _, e in pasos),
+         'omitidos': sum(e == OMITIDO for _, e in pasos),
+         **_percentiles([s for s, e in pasos if e in (OK, ERROR_APP)])}
+        for accion, pasos in sorted(por_accion.items())
+    ]
+
+
+def preparar_fuente(carpeta: str, fuente: str = None, filas: int = 100_000, semilla: int = 0) -> tuple:
+    """
+    Arranca el servidor local sobre ``fuente`` o sobre un libro sintético de
+    ``filas`` movimientos escrito en ``carpeta``. Devuelve (servidor, url).
+    """
+    if fuente is None:
+        fuente = generador.guardar_libro(generador.generar_libro(filas, semilla=semilla), carpeta)
+    servidor = ServidorSheetsLocal(crear_fuente(fuente))
+    return servidor, servidor.iniciar()
+
+
+# Resumen por nivel en stderr: (título, campo del registro)
+COLUMNAS = [
+    ('sesiones', 'sesiones'), ('reruns', 'reruns'), ('p50 ms', 'p50_ms'), ('p95 ms', 'p95_ms'),
+    ('p99 ms', 'p99_ms'), ('RSS0 MB', 'rss_inicial_mb'), ('RSS MB', 'rss_pico_mb'), ('CPU s', 'cpu_segundos'),
+    ('núcleos', 'cpu_nucleos'), ('err app', 'errores_app'), ('err arnés', 'errores_arnes'),
+    ('omitidos', 'omitidos'),
+]
+
+
+def ejecutar(niveles: list, interacciones: int = 20, acciones: list = None, pausa: float = 0,
+             sincronizar: bool = False, fuente: str = None, filas: int = 100_000,
+             semilla: int = 0, salida=sys.stdout):
+    temporal = tempfile.TemporaryDirectory(prefix='carga_')
+    servidor, url = preparar_fuente(temporal.name, fuente, filas, semilla)
+    acciones = acciones or list(ACCIONES)
+
+    salida.write(json.dumps({
+        **entorno(), 'fuente': fuente or f"generador:{filas}", 'interacciones': interacciones,
+        'acciones': acciones, 'pausa': pausa, 'sincronizar': sincronizar,
+        'config': {k: v for k, v in entorno_servidor(url).items() if k.startswith('INVENTARIO_')},
+    }) + '\n')
+    print(' '.join(f"{titulo:>9}" for titulo, _ in COLUMNAS), file=sys.stderr)
+    try:
+        for sesiones in niveles:
+            resultado = ejecutar_nivel(url, temporal.name, sesiones, interacciones, acciones, pausa,
+                                       sincronizar, semilla)
+            registros = registros_nivel(sesiones, resultado)
+            for registro in registros:
+                salida.write(json.dumps(registro) + '\n')
+            salida.flush()
+            r = registros[0]
+            print(' '.join(f"{str(r[campo]):>9}" for _, campo in COLUMNAS), file=sys.stderr)
+            for detalle in r['detalle_arnes']:
+                print(f"{'':>8} {detalle}", file=sys.stderr)
+    finally:
+        servidor.detener()
+        temporal.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga multiusuario del dashboard")
+    parser.add_argument("--sesiones", type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument("--interacciones", type=int, default=20, help="acciones por sesión")
+    parser.add_argument("--acciones", nargs='+', choices=list(ACCIONES), help="por defecto todas")
+    parser.add_argument("--pausa", type=float, default=0, help="segundos medios entre acciones")
+    parser.add_argument("--sincronizar", action='store_true',
+                        help="todas las sesiones lanzan cada acción a la vez")
+    parser.add_argument("--fuente", help="csv:ruta | parquet:ruta | sqlite:ruta (por defecto, libro sintético)")
+    parser.add_argument("--filas", type=int, default=100_000, help="filas del libro sintético")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="fichero JSON lines (por defecto stdout)")
+    args = parser.parse_args()
+
+    salida = open(args.salida, 'a', encoding='utf-8') if args.salida else sys.stdout
+    try:
+        ejecutar(args.sesiones, args.interacciones, args.acciones, args.pausa, args.sincronizar,
+                 args.fuente, args.filas, args.semilla, salida)
+    finally:
+        if args.salida:
+            salida.close()
+
+
+if __name__ == '__main__':
+    main()
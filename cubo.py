@@ -0,0 +1,153 @@
+"""
+Cubo de stock para responder a los filtros de las vistas sin recorrer la
+tabla completa.
+
+Las celdas del cubo son las filas de la tabla de stock (una por almacén,
+producto y lote, con su estado), que ya son agregados aditivos del libro de
+movimientos. Para cada valor de cada dimensión se guarda la lista ordenada
+de celdas en las que aparece (posting list); una combinación de filtros se
+resuelve uniendo las listas de los valores elegidos en cada dimensión e
+intersectando las dimensiones. Las métricas se suman sobre las celdas
+seleccionadas, de modo que el coste depende del número de celdas y no del
+tamaño del libro.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analytics import METRICAS_VACIAS, porcentaje
+
+DIMENSIONES = ['Almacén', 'Producto', 'Lote', 'Estado Stock']
+
+
+class CuboStock:
+    """Índices y medidas de una versión de la tabla de stock (sólo lectura)."""
+
+    def __init__(self, stock_df: pd.DataFrame, max_selecciones: int = 128):
+        self.tabla = stock_df.reset_index(drop=True)
+        self.celdas = len(self.tabla)
+        self._codigos = {}
+        self._valores = {}
+        self._listas = {}
+        for dim in DIMENSIONES:
+            codigos, valores = pd.factorize(self.tabla[dim], sort=True)
+            self._codigos[dim] = codigos
+            self._valores[dim] = valores
+            # Posting lists: posiciones de cada valor, ordenadas y sin repetidos
+            orden = np.argsort(codigos, kind='stable')
+            cortes = np.cumsum(np.bincount(codigos[codigos >= 0], minlength=len(valores)))[:-1]
+            self._listas[dim] = dict(zip(valores, np.split(orden[codigos[orden] >= 0], cortes)))
+        self._medidas = {col: self.tabla[col].to_numpy() for col in (
+            'Stock', 'Kg Total', 'Ventas Total', 'Entradas', 'Salidas', 'Total Inicial', 'Rotación'
+        )}
+        self._critico = (self.tabla['Estado Stock'] == 'CRÍTICO').to_numpy()
+
+        self.max_selecciones = max_selecciones
+        self._selecciones = OrderedDict()
+        self._lock = threading.Lock()
+
+    # -------------------------------------------------------------------------
+    #        Selección
+    # -------------------------------------------------------------------------
+    def opciones(self, dim: str) -> list:
+        """Valores de la dimensión en orden (como sorted(stock_df[dim].unique()))."""
+        return list(self._valores[dim])
+
+    @staticmethod
+    def clave_filtros(filtros: dict) -> tuple:
+        return tuple(
+            (dim, tuple(sorted(map(str, filtros[dim]))))
+            for dim in DIMENSIONES if filtros.get(dim)
+        )
+
+    def _posiciones_dimension(self, dim: str, valores) -> np.ndarray:
+        listas = [self._listas[dim][v] for v in dict.fromkeys(valores) if v in self._listas[dim]]
+        if not listas:
+            return np.empty(0, dtype=np.intp)
+        if len(listas) == 1:
+            return listas[0]
+        # Las listas de una misma dimensión son disjuntas: basta con ordenar
+        return np.sort(np.concatenate(listas))
+
+    def seleccion(self, filtros: dict = None) -> np.ndarray:
+        """Posiciones (ordenadas) de las celdas que cumplen todos los filtros."""
+        filtros = filtros or {}
+        clave = self.clave_filtros(filtros)
+        with self._lock:
+            if clave in self._selecciones:
+                self._selecciones.move_to_end(clave)
+                return self._selecciones[clave]
+
+        if not clave:
+            posiciones = np.arange(self.celdas)
+        else:
+            por_dimension = sorted(
+                (self._posiciones_dimension(dim, filtros[dim]) for dim, _ in clave), key=len
+            )
+            posiciones = por_dimension[0]
+            for otras in por_dimension[1:]:
+                if not len(posiciones):
+                    break
+                posiciones = np.intersect1d(posiciones, otras, assume_unique=True)
+        posiciones.setflags(write=False)
+
+        with self._lock:
+            self._selecciones[clave] = posiciones
+            while len(self._selecciones) > self.max_selecciones:
+                self._selecciones.popitem(last=False)
+        return posiciones
+
+    def filtrar(self, filtros: dict = None) -> pd.DataFrame:
+        """Filas de la tabla de stock que cumplen los filtros, en su orden original."""
+        posiciones = self.seleccion(filtros)
+        if len(posiciones) == self.celdas:
+            return self.tabla
+        return self.tabla.iloc[posiciones]
+
+    # -------------------------------------------------------------------------
+    #        Agregados
+    # -------------------------------------------------------------------------
+    def _distintos(self, dim: str, posiciones: np.ndarray) -> int:
+        return int(np.count_nonzero(np.bincount(
+            self._codigos[dim][posiciones], minlength=len(self._valores[dim])
+        )))
+
+    def metricas(self, filtros: dict = None) -> dict:
+        """Igual que analytics.calcular_metricas_generales sobre la tabla filtrada."""
+        posiciones = self.seleccion(filtros)
+        if not len(posiciones):
+            return dict(METRICAS_VACIAS)
+        suma = lambda col: self._medidas[col][posiciones].sum()
+        return {
+            'Total Productos': self._distintos('Producto', posiciones),
+            'Total Almacenes': self._distintos('Almacén', posiciones),
+            'Total Lotes': self._distintos('Lote', posiciones),
+            'Total Cajas en Stock': suma('Stock'),
+            'Total Kg en Stock': suma('Kg Total'),
+            'Total Ventas ($)': suma('Ventas Total'),
+            'Productos en Estado Crítico': int(np.count_nonzero(self._critico[posiciones])),
+            'Rotación Promedio (%)': suma('Rotación') / len(posiciones)
+        }
+
+    def entradas_vs_salidas(self, filtros: dict = None) -> pd.DataFrame:
+        """Igual que analytics.entradas_vs_salidas sobre la tabla filtrada."""
+        posiciones = self.seleccion(filtros)
+        codigos = self._codigos['Producto'][posiciones]
+        presentes = np.flatnonzero(np.bincount(codigos, minlength=len(self._valores['Producto'])))
+
+        def sumar(col):
+            medida = self._medidas[col]
+            total = np.bincount(codigos, weights=medida[posiciones], minlength=len(self._valores['Producto']))
+            # bincount suma en float; las cajas enteras conservan su tipo
+            return total[presentes].astype(medida.dtype) if medida.dtype.kind in 'iu' else total[presentes]
+
+        df_group = pd.DataFrame({
+            'Producto': np.asarray(self._valores['Producto'][presentes], dtype=object),
+            'Entradas': sumar('Entradas'),
+            'Salidas': sumar('Salidas'),
+            'Total Inicial': sumar('Total Inicial'),
+        })
+        df_group['% Vendido'] = porcentaje(df_group['Salidas'], df_group['Total Inicial'])
+        return df_group
@@ -11,11 +11,27 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import functools
+import hashlib
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import numpy as np
+
+import analytics
+import ingestion
+import graficos
+import perfil
+import snapshot
+import tablas
+from cache_figuras import CacheFiguras, separar_tamano
+from cubo import CuboStock
+from data_cache import CacheDatos
+from data_sources import crear_fuente, parsear_rango
+from historico import HistoricoStock
+from indice_ventas import IndiceVentas
+from refresco import Refrescador
 
 # -----------------------------------------------------------------------------
 #                               Estilos CSS
@@ -64,62 +80,265 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------
-#       1) Función externa cacheada para cargar datos desde Google Sheets
+#       1) Funciones externas cacheadas para cargar datos desde Google Sheets
 # -----------------------------------------------------------------------------
-@st.cache_data
-def load_data_from_sheets(spreadsheet_id: str, range_name: str) -> pd.DataFrame:
+def descargar_hoja(fuente: str, spreadsheet_id: str, range_name: str,
+                   opciones: dict = None, anterior: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Descarga el rango desde la fuente configurada y retorna un DataFrame (sin caché).
+    Si la firma de la fuente coincide con la de ``anterior`` no se descarga
+    nada y se devuelve ``anterior`` tal cual.
+    """
+    credenciales = st.secrets["gcp_service_account"] if fuente == "sheets" else None
+    origen = crear_fuente(fuente, spreadsheet_id, credenciales, **(opciones or {}))
+    # La firma se toma antes de leer: un cambio a mitad se verá en la próxima
+    firma = origen.firma(range_name)
+    if firma is not None and anterior is not None and anterior.attrs.get('firma') == firma:
+        return anterior
+    inicio = time.perf_counter()
+    df = origen.leer(range_name)
+    tiempos = {'descarga': time.perf_counter() - inicio}
+    # El libro se tipa una vez por descarga; si faltan columnas, load_data lo informa
+    if df.empty or ingestion.columnas_faltantes(df):
+        return df
+    inicio = time.perf_counter()
+    libro = ingestion.preparar_libro(df)
+    tiempos['ingestion'] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    libro.attrs['huella'] = analytics.huella_dataframe(libro)
+    tiempos['huella'] = time.perf_counter() - inicio
+    libro.attrs['tiempos'] = tiempos
+    libro.attrs['firma'] = firma
+    return libro
+
+def descargar_y_guardar(fuente: str, spreadsheet_id: str, range_name: str,
+                        opciones: dict = None, ruta_snapshot: str = None,
+                        anterior: pd.DataFrame = None) -> pd.DataFrame:
+    """Descarga el libro y, si ha cambiado, reemplaza la instantánea local."""
+    libro = descargar_hoja(fuente, spreadsheet_id, range_name, opciones, anterior)
+    if libro is anterior:
+        return libro
+    huella = libro.attrs.get('huella')
+    if ruta_snapshot and huella and snapshot.leer_huella(ruta_snapshot) != huella:
+        snapshot.guardar(libro, ruta_snapshot)
+    return libro
+
+@st.cache_resource
+def obtener_cache_datos() -> CacheDatos:
+    """Caché de descargas compartida por todas las sesiones del proceso."""
+    return CacheDatos()
+
+def load_data_from_sheets(spreadsheet_id: str, range_name: str, ttl: float = 300,
+                          forzar: bool = False, fuente: str = "sheets",
+                          opciones: dict = None, snapshot_dir: str = None,
+                          cache: CacheDatos = None) -> pd.DataFrame:
     """
-    Carga datos desde Google Sheets y retorna un DataFrame.
-    Vive fuera de la clase para evitar UnhashableParamError.
+    Carga datos desde Google Sheets (u otra fuente compatible) y retorna un DataFrame.
+    Con ``forzar`` recarga sólo esta hoja/rango; el resto de usuarios sigue
+    viendo la copia anterior hasta que termina la descarga.
+    Con ``snapshot_dir`` el primer acceso de un proceso usa la instantánea
+    local y la hoja remota se consulta en segundo plano.
     """
-    if "gcp_service_account" not in st.secrets:
+    if fuente == "sheets" and "gcp_service_account" not in st.secrets:
         st.error("No se encontraron credenciales en st.secrets (gcp_service_account).")
         return pd.DataFrame()
 
-    credentials_dict = st.secrets["gcp_service_account"]
-    creds = service_account.Credentials.from_service_account_info(
-        credentials_dict,
-        scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"]
+    cache = cache or obtener_cache_datos()
+    clave = (fuente, spreadsheet_id, range_name)
+    ruta = snapshot.ruta_snapshot(snapshot_dir, clave) if snapshot_dir else None
+    # Con la copia guardada, la descarga se omite si la fuente no ha cambiado
+    cargar = lambda: descargar_y_guardar(
+        fuente, spreadsheet_id, range_name, opciones, ruta, anterior=cache.valor(clave)
     )
+    semilla = (lambda: snapshot.cargar(ruta)) if ruta else None
+    if forzar:
+        df = cache.refrescar(clave, cargar)
+    else:
+        df = cache.obtener(clave, cargar, ttl, semilla)
+    return df
 
-    service = build("sheets", "v4", credentials=creds)
-    sheet = service.spreadsheets()
+def cargar_rangos(spreadsheet_id: str, rangos: list, ttl: float = 300,
+                  forzar: bool = False, fuente: str = "sheets",
+                  opciones: dict = None, snapshot_dir: str = None,
+                  cache: CacheDatos = None) -> dict:
+    """
+    Carga cada rango en paralelo, cada uno con su propia entrada de caché
+    (y su instantánea), y devuelve {rango: DataFrame}. El tiempo total es
+    el del rango más lento, no la suma.
+    """
+    if fuente == "sheets" and "gcp_service_account" not in st.secrets:
+        st.error("No se encontraron credenciales en st.secrets (gcp_service_account).")
+        return {rango: pd.DataFrame() for rango in rangos}
+    # La caché se obtiene aquí: los hilos no tienen contexto de Streamlit
+    cache = cache or obtener_cache_datos()
+    cargar = lambda rango: load_data_from_sheets(
+        spreadsheet_id, rango, ttl, forzar, fuente, opciones, snapshot_dir, cache
+    )
+    if len(rangos) == 1:
+        return {rangos[0]: cargar(rangos[0])}
+    with ThreadPoolExecutor(max_workers=len(rangos)) as pool:
+        return dict(zip(rangos, pool.map(cargar, rangos)))
+
+def categoria_de_rango(rango: str) -> str:
+    return parsear_rango(rango)['hoja']
+
+def error_partes(partes: dict):
+    """Mensaje del primer problema de las hojas cargadas, o None si todas valen."""
+    for rango, parte in partes.items():
+        hoja = f" ({rango})" if len(partes) > 1 else ""
+        if parte.empty:
+            return f"📊 No se encontraron datos en la hoja de cálculo{hoja}."
+        missing_cols = ingestion.columnas_faltantes(parte)
+        if missing_cols:
+            return f"❌ Faltan columnas requeridas{hoja}: {missing_cols}"
+    return None
+
+def huellas_partes(rangos: list, partes: dict) -> tuple:
+    return tuple(partes[r].attrs.get('huella') or analytics.huella_dataframe(partes[r]) for r in rangos)
+
+def combinar_partes(huellas: tuple, rangos: tuple, partes: dict) -> pd.DataFrame:
+    libro = ingestion.combinar_libros({categoria_de_rango(r): partes[r] for r in rangos})
+    h = hashlib.blake2b(digest_size=16)
+    for rango, huella in zip(rangos, huellas):
+        h.update(f"{rango}\0{huella}\0".encode())
+    libro.attrs['huella'] = h.hexdigest()
+    # Las hojas se descargan a la vez: cada etapa tarda lo que la más lenta
+    tiempos = {}
+    for parte in partes.values():
+        for etapa, segundos in parte.attrs.get('tiempos', {}).items():
+            tiempos[etapa] = max(tiempos.get(etapa, 0), segundos)
+    libro.attrs['tiempos'] = tiempos
+    return libro
+
+# Libro combinado de varias hojas, uno por combinación de versiones de las partes
+@st.cache_resource(max_entries=4, show_spinner=False)
+def libro_combinado(huellas: tuple, rangos: tuple, _partes: dict) -> pd.DataFrame:
+    return combinar_partes(huellas, rangos, _partes)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def libro_de_categorias(huella: str, categorias: tuple, _libro: pd.DataFrame) -> pd.DataFrame:
+    """Filas de las categorías elegidas, con su propia huella."""
+    libro = _libro[_libro[ingestion.COLUMNA_CATEGORIA].isin(categorias).to_numpy()].reset_index(drop=True)
+    libro.attrs = {
+        **_libro.attrs,
+        'huella': hashlib.blake2b(f"{huella}\0{categorias}".encode(), digest_size=16).hexdigest()
+    }
+    return libro
 
-    result = sheet.values().get(
-        spreadsheetId=spreadsheet_id,
-        range=range_name
-    ).execute()
-    values = result.get('values', [])
-    if not values:
-        return pd.DataFrame()
+@st.cache_resource(max_entries=8)
+def obtener_stock_incremental(spreadsheet_id: str, range_name: str, categorias: tuple) -> analytics.StockIncremental:
+    """
+    Libro de stock incremental compartido por todas las sesiones de una hoja
+    y selección de categorías (vacía = todas): cada selección ve su propio
+    libro, que sólo crece por el final. Sólo procesa las filas añadidas desde
+    la última carga.
+    """
+    return analytics.StockIncremental()
+
+# Resultados compartidos entre sesiones, una entrada por versión de los datos
+# (huella del DataFrame). Streamlit bloquea por clave: usuarios concurrentes
+# con la misma versión esperan un único cálculo.
+@st.cache_data(max_entries=8, show_spinner=False)
+def stock_por_version(huella: str, spreadsheet_id: str, range_name: str, categorias: tuple,
+                      _df: pd.DataFrame, _estados_stock: dict) -> pd.DataFrame:
+    ledger = obtener_stock_incremental(spreadsheet_id, range_name, categorias)
+    return ledger.actualizar(_df, _estados_stock)
+
+@st.cache_resource
+def obtener_cache_figuras() -> CacheFiguras:
+    """Figuras ya construidas, compartidas por todas las sesiones del proceso."""
+    mb = float(os.environ.get("INVENTARIO_CACHE_FIGURAS_MB", 64))
+    return CacheFiguras(int(mb * 1024 * 1024))
+
+# Índice de las ventas válidas (grupos y agregados por cliente, producto,
+# lote y vendedor); de sólo lectura, se comparte entre sesiones como el cubo
+@st.cache_resource(max_entries=8, show_spinner=False)
+def ventas_por_version(huella: str, spreadsheet_id: str, range_name: str,
+                       _df: pd.DataFrame) -> IndiceVentas:
+    return IndiceVentas(analytics.ventas_validas(_df))
+
+# Índice temporal del libro (sumas acumuladas por clave); de sólo lectura
+@st.cache_resource(max_entries=8, show_spinner=False)
+def historico_por_version(huella: str, spreadsheet_id: str, range_name: str,
+                          _df: pd.DataFrame) -> HistoricoStock:
+    return HistoricoStock(_df)
+
+# El cubo es de sólo lectura: se comparte el mismo objeto entre sesiones
+@st.cache_resource(max_entries=8, show_spinner=False)
+def cubo_por_version(huella: str, spreadsheet_id: str, range_name: str,
+                     _stock_df: pd.DataFrame) -> CuboStock:
+    return CuboStock(_stock_df)
+
+def preparar_datos(config: dict, cache: CacheDatos, ledger: analytics.StockIncremental,
+                   anterior, forzar: bool) -> tuple:
+    """
+    Un ciclo del refresco: descarga las hojas y prepara libro, tabla de stock,
+    cubo, histórico y ventas. Si ninguna hoja cambió se reutiliza lo anterior.
+    """
+    if config['fuente'] == "sheets" and "gcp_service_account" not in st.secrets:
+        raise RuntimeError("No se encontraron credenciales en st.secrets (gcp_service_account).")
+    rangos = config['rangos']
+    partes = cargar_rangos(
+        config['spreadsheet_id'], rangos, config['ttl'], forzar, config['fuente'],
+        config['opciones'], config['snapshot_dir'], cache
+    )
+    error = error_partes(partes)
+    if error:
+        raise ValueError(error)
+    huellas = huellas_partes(rangos, partes)
+    if anterior is not None and anterior.datos['huellas'] == huellas:
+        return anterior.datos, anterior.huella
+
+    libro = partes[rangos[0]] if len(rangos) == 1 else combinar_partes(huellas, tuple(rangos), partes)
+    huella = libro.attrs.get('huella') or analytics.huella_dataframe(libro)
+    stock_df = ledger.actualizar(libro, config['estados_stock'])
+    datos = {
+        'huellas': huellas,
+        'libro': libro,
+        'stock': stock_df,
+        'cubo': CuboStock(stock_df),
+        'historico': HistoricoStock(libro),
+        'ventas': IndiceVentas(analytics.ventas_validas(libro)),
+    }
+    return datos, huella
 
-    df = pd.DataFrame(values[1:], columns=values[0])
-    return df
+@st.cache_resource(show_spinner=False)
+def obtener_refrescador(fuente: str, spreadsheet_id: str, range_name: str, intervalo: float,
+                        _config: dict) -> Refrescador:
+    """Refresco de fondo de una combinación de hojas, compartido por todas las sesiones."""
+    cache = obtener_cache_datos()
+    ledger = analytics.StockIncremental()
+    preparar = lambda anterior, forzar: preparar_datos(_config, cache, ledger, anterior, forzar)
+    return Refrescador(preparar, intervalo).iniciar()
+
+def _guardar_widget(key: str):
+    st.session_state[f"_guardado_{key}"] = st.session_state[key]
+
+def fragmento(metodo):
+    """
+    Sección del dashboard como st.fragment: un cambio en sus widgets sólo
+    vuelve a ejecutar la sección, sin recargar datos ni el resto de la página.
+    En esos reruns parciales la sección escribe su propia traza.
+    """
+    @st.fragment
+    @functools.wraps(metodo)
+    def seccion(self, *args, **kwargs):
+        if self.rerun_completo:
+            return metodo(self, *args, **kwargs)
+        self.iniciar_traza()
+        with self.traza.etapa(metodo.__name__, 'fragmento'):
+            resultado = metodo(self, *args, **kwargs)
+        self.traza.escribir(self.PERFIL_TRAZA)
+        return resultado
+    return seccion
 
 # -----------------------------------------------------------------------------
 #        2) Clase de utilidades: cálculos de porcentajes, formateos, etc.
 # -----------------------------------------------------------------------------
 class InventarioAnalytics:
-    @staticmethod
-    def calcular_porcentaje(parte, total):
-        """Calcula porcentaje con manejo de errores."""
-        try:
-            return round((parte / total * 100), 2) if total > 0 else 0
-        except:
-            return 0
-
-    @staticmethod
-    def formatear_numero(numero, decimales=2):
-        """Formatea números (ej: 1000 => 1K, 1,000,000 => 1M)."""
-        try:
-            if abs(numero) >= 1_000_000:
-                return f"{numero/1_000_000:.{decimales}f}M"
-            elif abs(numero) >= 1_000:
-                return f"{numero/1_000:.{decimales}f}K"
-            else:
-                return f"{numero:.{decimales}f}"
-        except:
-            return "0"
+    # Versiones escalares; las vectorizadas están en analytics
+    calcular_porcentaje = staticmethod(analytics.calcular_porcentaje)
+    formatear_numero = staticmethod(analytics.formatear_numero)
 
 # -----------------------------------------------------------------------------
 #        3) Clase principal del Dashboard
@@ -127,8 +346,43 @@ class InventarioAnalytics:
 class InventarioDashboard:
     def __init__(self):
         self.SPREADSHEET_ID = "1acGspGuv-i0KSA5Q8owZpFJb1ytgm1xljBLZoa2cSN8"
-        self.RANGE_NAME = "Carnes!A1:L"
+        # Una hoja (rango) por categoría de producto, separadas por ';'
+        self.RANGOS = [
+            r.strip() for r in os.environ.get("INVENTARIO_RANGOS", "Carnes!A1:L").split(';') if r.strip()
+        ]
+        # Identifica la combinación de rangos en las cachés derivadas (stock, cubo...)
+        self.RANGE_NAME = ';'.join(self.RANGOS)
+        self.CACHE_TTL = float(os.environ.get("INVENTARIO_CACHE_TTL", 300))
+        # Segundos entre refrescos de fondo; "0" vuelve a cargar dentro de cada rerun
+        self.REFRESCO = float(os.environ.get("INVENTARIO_REFRESCO", 300))
+        # Segundos que un rerun espera como máximo a la primera carga del refresco
+        self.ESPERA_CARGA = float(os.environ.get("INVENTARIO_ESPERA_CARGA", 120))
+        # "sheets" (por defecto), "http://host:puerto", "csv:ruta", "parquet:ruta" o "sqlite:ruta"
+        self.FUENTE = os.environ.get("INVENTARIO_FUENTE", "sheets")
+        # Descarga por ventanas de filas en paralelo para hojas muy grandes
+        self.OPCIONES_DESCARGA = {
+            'filas_por_bloque': int(os.environ.get("INVENTARIO_FILAS_POR_BLOQUE", 50000)),
+            'max_hilos': int(os.environ.get("INVENTARIO_HILOS_DESCARGA", 4))
+        }
+        # Instantánea local para arranques en frío ("" la desactiva)
+        self.SNAPSHOT_DIR = os.environ.get("INVENTARIO_SNAPSHOT_DIR", ".snapshots")
+        # Fichero JSON lines donde se añade la traza de cada rerun ("" = sin traza)
+        self.PERFIL_TRAZA = os.environ.get("INVENTARIO_PERFIL_TRAZA", "")
+        self.traza = perfil.Traza()
+        # False fuera de run_dashboard, es decir, en los reruns de un fragmento
+        self.rerun_completo = False
+        # Categorías por gráfico (el resto se agrupa en "Otros") y tamaño máximo
+        # del JSON de cada figura; 0 desactiva cada límite
+        self.TOP_N_GRAFICOS = int(os.environ.get("INVENTARIO_TOP_N_GRAFICOS", 25))
+        self.MAX_BYTES_FIGURA = int(os.environ.get("INVENTARIO_MAX_BYTES_FIGURA", 500_000))
+        # Sólo se ejecuta la pestaña abierta; "0" vuelve a ejecutarlas todas en cada rerun
+        self.VISTAS_PEREZOSAS = os.environ.get("INVENTARIO_VISTAS_PEREZOSAS", "1") != "0"
         self.df = pd.DataFrame()
+        self.huella = ''
+        # Categorías elegidas en la barra lateral; vacía = todas
+        self.categorias = ()
+        # Publicación del refresco de fondo que usa este rerun
+        self.publicada = None
         self.analytics = InventarioAnalytics()
 
         self.COLOR_SCHEME = {
@@ -147,116 +401,96 @@ class InventarioDashboard:
             'NORMAL': {'umbral': float('inf'), 'color': '#2ecc71'}
         }
 
+    def refrescador(self) -> Refrescador:
+        config = {
+            'spreadsheet_id': self.SPREADSHEET_ID,
+            'rangos': self.RANGOS,
+            'ttl': self.CACHE_TTL,
+            'fuente': self.FUENTE,
+            'opciones': self.OPCIONES_DESCARGA,
+            'snapshot_dir': self.SNAPSHOT_DIR,
+            'estados_stock': self.ESTADOS_STOCK,
+        }
+        return obtener_refrescador(self.FUENTE, self.SPREADSHEET_ID, self.RANGE_NAME, self.REFRESCO, config)
+
     def load_data(self) -> bool:
+        if self.REFRESCO > 0:
+            return self.load_data_publicada()
         with st.spinner("Cargando datos..."):
-            df_tmp = load_data_from_sheets(self.SPREADSHEET_ID, self.RANGE_NAME)
-            if df_tmp.empty:
-                st.error("📊 No se encontraron datos en la hoja de cálculo.")
-                return False
-
-            required_columns = [
-                'nombre', 'lote', 'movimiento', 'almacen',
-                'almacen actual', 'cajas', 'kg', 'precio', 'precio total'
-            ]
-            missing_cols = [c for c in required_columns if c not in df_tmp.columns]
-            if missing_cols:
-                st.error(f"❌ Faltan columnas requeridas: {missing_cols}")
+            partes = cargar_rangos(
+                self.SPREADSHEET_ID, self.RANGOS, self.CACHE_TTL,
+                fuente=self.FUENTE, opciones=self.OPCIONES_DESCARGA,
+                snapshot_dir=self.SNAPSHOT_DIR
+            )
+            error = error_partes(partes)
+            if error:
+                st.error(error)
                 return False
 
-            numeric_cols = ['cajas', 'kg', 'precio', 'precio total']
-            for col in numeric_cols:
-                df_tmp[col] = pd.to_numeric(
-                    df_tmp[col].replace(['', 'E', '#VALUE!', '#N/A'], '0'),
-                    errors='coerce'
-                ).fillna(0)
-
-            df_tmp['movimiento'] = df_tmp['movimiento'].str.upper().fillna('')
-            df_tmp['almacen'] = df_tmp['almacen'].str.strip().fillna('')
-            df_tmp['almacen actual'] = df_tmp['almacen actual'].str.strip().fillna('')
+            if len(partes) == 1:
+                df_tmp = partes[self.RANGOS[0]]
+            else:
+                df_tmp = libro_combinado(huellas_partes(self.RANGOS, partes), tuple(self.RANGOS), partes)
+                df_tmp = self.filtrar_categorias(df_tmp)
 
             self.df = df_tmp
+            self.huella = df_tmp.attrs.get('huella') or analytics.huella_dataframe(df_tmp)
             st.success("✅ Datos cargados exitosamente")
             return True
+
+    def load_data_publicada(self) -> bool:
+        """Toma la última publicación del refresco de fondo; sólo la primera se espera."""
+        refrescador = self.refrescador()
+        with st.spinner("Cargando datos..."):
+            publicada = refrescador.actual(self.ESPERA_CARGA)
+        if publicada is None:
+            if not refrescador.primera_terminada:
+                st.error(
+                    f"⏳ La primera carga de datos sigue en curso tras {self.ESPERA_CARGA:.0f} s. "
+                    "Vuelve a intentarlo en unos momentos."
+                )
+            else:
+                st.error(refrescador.ultimo_error or "📊 No se encontraron datos en la hoja de cálculo.")
+            return False
+
+        self.publicada = publicada
+        df_tmp = publicada.datos['libro']
+        if len(self.RANGOS) > 1:
+            df_tmp = self.filtrar_categorias(df_tmp)
+        self.df = df_tmp
+        self.huella = df_tmp.attrs.get('huella') or publicada.huella
+        st.success("✅ Datos cargados exitosamente")
+        return True
+
+    def preparado(self, nombre: str):
+        """Resultado ya calculado por el refresco, si este rerun usa su libro tal cual."""
+        if self.publicada is not None and self.huella == self.publicada.huella:
+            return self.publicada.datos[nombre]
+        return None
+
+    def filtrar_categorias(self, libro: pd.DataFrame) -> pd.DataFrame:
+        """Selector de categorías (hojas) en la barra lateral; vacío = todas."""
+        categorias = list(libro[ingestion.COLUMNA_CATEGORIA].cat.categories)
+        with st.sidebar:
+            elegidas = st.multiselect("🏷️ Categorías", options=categorias, key="categorias_filter")
+        if not elegidas or len(elegidas) == len(categorias):
+            return libro
+        self.categorias = tuple(sorted(elegidas))
+        return libro_de_categorias(libro.attrs['huella'], self.categorias, libro)
+
     def calcular_stock_actual(self) -> pd.DataFrame:
         try:
             if self.df.empty:
                 return pd.DataFrame()
 
-            with st.spinner('Calculando stock actual...'):
-                stock_data = []
-
-                productos = self.df['nombre'].unique()
-                lotes = self.df['lote'].unique()
-                almacenes = pd.concat([
-                    self.df['almacen'], self.df['almacen actual']
-                ]).unique()
-                almacenes = [a for a in almacenes if pd.notna(a) and str(a).strip() != '']
-
-                total_items = len(productos)*len(lotes)*len(almacenes)
-                progress_bar = st.progress(0)
-                current_item = 0
-
-                for prod in productos:
-                    for lote in lotes:
-                        for alm in almacenes:
-                            current_item += 1
-                            progress_bar.progress(current_item / total_items)
-
-                            df_fil = self.df[(self.df['nombre'] == prod) & (self.df['lote'] == lote)]
-
-                            df_ent = df_fil[(df_fil['movimiento'] == 'ENTRADA') & (df_fil['almacen'] == alm)]
-                            entradas = df_ent['cajas'].sum()
-                            kg_entradas = df_ent['kg'].sum()
-
-                            df_t_rec = df_fil[(df_fil['movimiento'] == 'TRASPASO') & (df_fil['almacen actual'] == alm)]
-                            tr_rec = df_t_rec['cajas'].sum()
-                            kg_t_rec = df_t_rec['kg'].sum()
-
-                            df_t_env = df_fil[(df_fil['movimiento'] == 'TRASPASO') & (df_fil['almacen'] == alm)]
-                            tr_env = df_t_env['cajas'].sum()
-                            kg_t_env = df_t_env['kg'].sum()
-
-                            df_sal = df_fil[(df_fil['movimiento'] == 'SALIDA') & (df_fil['almacen'] == alm)]
-                            salidas = df_sal['cajas'].sum()
-                            kg_sal = df_sal['kg'].sum()
-                            ventas_total = df_sal['precio total'].sum()
-
-                            total_inicial = entradas + tr_rec
-                            stock = total_inicial - tr_env - salidas
-                            kg_total = kg_entradas + kg_t_rec - kg_t_env - kg_sal
-
-                            pct_vendido = self.analytics.calcular_porcentaje(salidas, total_inicial)
-                            pct_disp = self.analytics.calcular_porcentaje(stock, total_inicial)
-                            rotacion = pct_vendido
-
-                            estado = 'NORMAL'
-                            for est, config in self.ESTADOS_STOCK.items():
-                                if stock <= config['umbral']:
-                                    estado = est
-                                    break
-
-                            if total_inicial > 0 or stock != 0:
-                                stock_data.append({
-                                    'Almacén': alm,
-                                    'Producto': prod,
-                                    'Lote': lote,
-                                    'Stock': stock,
-                                    'Kg Total': kg_total,
-                                    'Total Inicial': total_inicial,
-                                    'Entradas': entradas,
-                                    'Traspasos Recibidos': tr_rec,
-                                    'Traspasos Enviados': tr_env,
-                                    'Salidas': salidas,
-                                    'Ventas Total': ventas_total,
-                                    '% Vendido': pct_vendido,
-                                    '% Disponible': pct_disp,
-                                    'Estado Stock': estado,
-                                    'Rotación': rotacion
-                                })
-
-                progress_bar.empty()
-
-                stock_df = pd.DataFrame(stock_data).round(2)
+            with st.spinner('Calculando stock actual...'), self.traza.etapa('calcular_stock_actual') as info:
+                stock_df = self.preparado('stock')
+                if stock_df is None:
+                    stock_df = stock_por_version(
+                        self.huella, self.SPREADSHEET_ID, self.RANGE_NAME, self.categorias,
+                        self.df, self.ESTADOS_STOCK
+                    )
+                info['filas'] = len(stock_df)
                 if stock_df.empty:
                     st.warning("📊 No se encontraron datos de stock para mostrar")
                 return stock_df
@@ -264,42 +498,33 @@ class InventarioDashboard:
             st.error(f"❌ Error en el cálculo de stock: {str(e)}")
             return pd.DataFrame()
 
-    def calcular_metricas_generales(self, stock_df: pd.DataFrame) -> dict:
-        if stock_df.empty:
-            return {
-                'Total Productos': 0,
-                'Total Almacenes': 0,
-                'Total Lotes': 0,
-                'Total Cajas en Stock': 0,
-                'Total Kg en Stock': 0,
-                'Total Ventas ($)': 0,
-                'Productos en Estado Crítico': 0,
-                'Rotación Promedio (%)': 0
-            }
+    def cubo_stock(self, stock_df: pd.DataFrame) -> CuboStock:
+        with self.traza.etapa('cubo_stock'):
+            return self.preparado('cubo') or cubo_por_version(
+                self.huella, self.SPREADSHEET_ID, self.RANGE_NAME, stock_df
+            )
+
+    def historico_stock(self) -> HistoricoStock:
+        with self.traza.etapa('historico_stock'):
+            return self.preparado('historico') or historico_por_version(
+                self.huella, self.SPREADSHEET_ID, self.RANGE_NAME, self.df
+            )
+
+    def calcular_metricas_generales(self, cubo: CuboStock, filtros: dict = None) -> dict:
+        """Métricas de la tabla de stock filtrada, sumadas sobre las celdas del cubo."""
         try:
-            return {
-                'Total Productos': len(stock_df['Producto'].unique()),
-                'Total Almacenes': len(stock_df['Almacén'].unique()),
-                'Total Lotes': len(stock_df['Lote'].unique()),
-                'Total Cajas en Stock': stock_df['Stock'].sum(),
-                'Total Kg en Stock': stock_df['Kg Total'].sum(),
-                'Total Ventas ($)': stock_df['Ventas Total'].sum(),
-                'Productos en Estado Crítico': len(stock_df[stock_df['Estado Stock'] == 'CRÍTICO']),
-                'Rotación Promedio (%)': stock_df['Rotación'].mean()
-            }
+            with self.traza.etapa('calcular_metricas_generales'):
+                return cubo.metricas(filtros)
         except Exception as e:
             st.error(f"Error cálculo métricas generales: {e}")
             return {}
 
     def mostrar_metricas(self, metricas: dict, columnas=4):
         cols = st.columns(columnas)
+        textos = analytics.formatear_metricas(metricas.values())
         i = 0
-        for titulo, valor in metricas.items():
+        for titulo, valor_str in zip(metricas, textos):
             with cols[i % columnas]:
-                if isinstance(valor, float):
-                    valor_str = f"{valor:,.2f}"
-                else:
-                    valor_str = f"{valor}"
                 st.markdown(f"""
                     <div class="metric-card">
                         <h4 style="color: {self.COLOR_SCHEME['text']}; margin-bottom: 8px;">
@@ -311,9 +536,133 @@ class InventarioDashboard:
                     </div>
                     """, unsafe_allow_html=True)
             i += 1
-    def generar_grafico_stock(self, stock_df: pd.DataFrame, tipo='barras', titulo='', key_suffix=''):
+
+    def pestanas(self, etiquetas: list, key: str):
+        """
+        st.tabs que recuerda la pestaña abierta y provoca un rerun al cambiarla,
+        de modo que las vistas pueden ejecutar sólo la pestaña visible.
+        """
+        if self.VISTAS_PEREZOSAS:
+            return st.tabs(etiquetas, key=key, on_change="rerun")
+        return st.tabs(etiquetas)
+
+    @staticmethod
+    def estado_persistente(key: str, inicial=None) -> dict:
+        """
+        ``key`` y callback para un filtro de una pestaña: Streamlit olvida el
+        valor de los widgets que no se dibujan en un rerun, así que se guarda
+        una copia y se restaura cuando la pestaña vuelve a abrirse.
+        ``inicial`` sustituye al valor por defecto del widget (que no puede
+        pasarse junto con un valor en session_state).
+        """
+        copia = f"_guardado_{key}"
+        if key not in st.session_state:
+            if copia in st.session_state:
+                st.session_state[key] = st.session_state[copia]
+            elif inicial is not None:
+                st.session_state[key] = inicial
+        return {'key': key, 'on_change': _guardar_widget, 'args': (key,)}
+
+    @staticmethod
+    def pestana_abierta(pestana) -> bool:
+        # .open es None cuando las pestañas no siguen su estado: se ejecutan todas
+        return pestana.open is not False
+
+    def mostrar_grafico(self, fig, nombre: str = None, **kwargs):
+        """st.plotly_chart medido en la traza (tiempo de envío y tamaño del JSON)."""
+        nombre = nombre or kwargs.get('key', 'grafico')
+        with self.traza.etapa(nombre, 'grafico') as info:
+            if self.traza.activa:
+                info['bytes'] = perfil.bytes_figura(fig)
+            st.plotly_chart(fig, **kwargs)
+
+    def mostrar_tabla(self, nombre: str, df: pd.DataFrame, **kwargs):
+        """st.dataframe medido en la traza (tiempo de envío y tamaño Arrow)."""
+        with self.traza.etapa(nombre, 'tabla', filas=len(df)) as info:
+            if self.traza.activa:
+                info['bytes'] = perfil.bytes_tabla(df)
+            st.dataframe(df, **kwargs)
+
+    def tabla_paginada(self, nombre: str, df: pd.DataFrame, key: str, **kwargs):
+        """
+        Tabla con búsqueda, orden y paginación en el servidor: sólo la página
+        visible pasa por mostrar_tabla. Sin columna de orden se respeta el
+        orden de ``df``.
+        """
+        c1, c2, c3, c4, c5 = st.columns([3, 3, 2, 2, 2])
+        with c1:
+            texto = st.text_input("Buscar", **self.estado_persistente(f"{key}_buscar"))
+        with c2:
+            columna = st.selectbox(
+                "Ordenar por", options=[None] + list(df.columns),
+                format_func=lambda c: "—" if c is None else str(c),
+                **self.estado_persistente(f"{key}_orden")
+            )
+        with c3:
+            descendente = st.checkbox("Descendente", **self.estado_persistente(f"{key}_desc"))
+        with c4:
+            tamano = st.selectbox(
+                "Filas por página", options=tablas.TAMANOS_PAGINA,
+                **self.estado_persistente(f"{key}_tamano", inicial=tablas.TAMANO_INICIAL)
+            )
+
+        with self.traza.etapa(f"{nombre}_buscar", filas=len(df)):
+            encontradas = tablas.buscar(df, texto)
+        paginas = tablas.total_paginas(len(encontradas), tamano)
+        clave_pagina = f"{key}_pagina"
+        kwargs_pagina = self.estado_persistente(clave_pagina)
+        # Con menos filas (otro filtro u otra búsqueda) la página guardada puede no existir
+        if st.session_state.get(clave_pagina, 1) > paginas:
+            st.session_state[clave_pagina] = paginas
+            _guardar_widget(clave_pagina)
+        with c5:
+            numero = st.number_input("Página", min_value=1, max_value=paginas, step=1, **kwargs_pagina)
+
+        with self.traza.etapa(f"{nombre}_ordenar", filas=len(encontradas)):
+            ordenadas = tablas.ordenar(encontradas, columna, descendente, filas=numero * tamano)
+        self.mostrar_tabla(nombre, tablas.pagina(ordenadas, numero, tamano), **kwargs)
+        inicio = (numero - 1) * tamano
+        st.caption(
+            f"Filas {min(inicio + 1, len(encontradas)):,}–{min(inicio + tamano, len(encontradas)):,} "
+            f"de {len(encontradas):,} · página {numero} de {paginas}"
+        )
+
+    def generar_grafico_stock(self, stock_df: pd.DataFrame, tipo='barras', titulo='', key_suffix='',
+                              filtros: dict = None):
+        """Con ``filtros`` (los que produjeron ``stock_df``) la figura se guarda en caché."""
         if stock_df.empty:
             return None
+        if tipo not in ('barras', 'pie', 'treemap'):
+            return None
+        clave = None if filtros is None else (tipo, titulo, CuboStock.clave_filtros(filtros))
+
+        def construir():
+            with self.traza.etapa(f"figura_{tipo}", 'figura', filas=len(stock_df)):
+                return self.figura_reducida(lambda n: self._figura_stock(stock_df, tipo, titulo, n))
+        return self.figura_cacheada(clave, construir)
+
+    def figura_cacheada(self, clave: tuple, construir):
+        """
+        Figura de la caché compartida para esta versión de los datos; ``clave``
+        identifica el gráfico y los filtros/selección que lo determinan
+        (None = no cachear). ``construir()`` devuelve la figura o, si viene de
+        figura_reducida, ``(figura, bytes)``.
+        """
+        if clave is None:
+            return separar_tamano(construir())[0]
+        clave = (self.huella, self.TOP_N_GRAFICOS, self.MAX_BYTES_FIGURA) + tuple(clave)
+        return obtener_cache_figuras().obtener(clave, construir)
+
+    def figura_reducida(self, construir, n: int = None) -> tuple:
+        """
+        ``construir(n)`` con el top N configurado (u ``n``; 0 = sin recortar de
+        entrada), recortado hasta caber en MAX_BYTES_FIGURA. Devuelve
+        ``(figura, bytes)`` como graficos.limitar_payload.
+        """
+        n = self.TOP_N_GRAFICOS if n is None else n
+        return graficos.limitar_payload(construir, n, self.MAX_BYTES_FIGURA)
+
+    def _figura_stock(self, stock_df: pd.DataFrame, tipo: str, titulo: str, n: int):
 
         layout_config = {
             'paper_bgcolor': 'rgba(0,0,0,0)',
@@ -330,7 +679,7 @@ class InventarioDashboard:
 
         if tipo == 'barras':
             fig = px.bar(
-                stock_df,
+                graficos.datos_barras_stock(stock_df, n),
                 x='Producto',
                 y='Stock',
                 color='Estado Stock',
@@ -344,7 +693,7 @@ class InventarioDashboard:
 
         elif tipo == 'pie':
             fig = px.pie(
-                stock_df,
+                graficos.datos_tarta(stock_df, 'Almacén', 'Stock', n),
                 values='Stock',
                 names='Almacén'
             )
@@ -353,7 +702,7 @@ class InventarioDashboard:
 
         elif tipo == 'treemap':
             fig = px.treemap(
-                stock_df,
+                graficos.datos_treemap_stock(stock_df, n),
                 path=['Almacén', 'Producto'],
                 values='Stock',
                 color='Estado Stock',
@@ -370,21 +719,19 @@ class InventarioDashboard:
 
         return fig
 
-    def generar_grafico_entradas_vs_salidas(self, stock_df: pd.DataFrame, key_suffix=''):
-        if stock_df.empty:
-            st.warning("No hay datos para Entradas vs. Salidas")
-            return
+    def figura_entradas_vs_salidas(self, stock_df: pd.DataFrame, df_group: pd.DataFrame = None) -> tuple:
+        """
+        ``(figura, bytes)``; ``df_group`` permite pasar la agregación ya hecha
+        (p. ej. desde el cubo).
+        """
+        with self.traza.etapa('figura_entradas_salidas', 'figura', filas=len(stock_df)):
+            if df_group is None:
+                df_group = analytics.entradas_vs_salidas(stock_df)
+            return self.figura_reducida(
+                lambda n: self._figura_entradas_vs_salidas(graficos.datos_entradas_vs_salidas(df_group, n))
+            )
 
-        df_group = stock_df.groupby('Producto').agg({
-            'Entradas': 'sum',
-            'Salidas': 'sum',
-            'Total Inicial': 'sum'
-        }).reset_index()
-
-        df_group['% Vendido'] = df_group.apply(
-            lambda row: self.analytics.calcular_porcentaje(row['Salidas'], row['Total Inicial']),
-            axis=1
-        )
+    def _figura_entradas_vs_salidas(self, df_group: pd.DataFrame) -> go.Figure:
 
         fig = make_subplots(specs=[[{"secondary_y": True}]])
         fig.add_trace(
@@ -405,8 +752,9 @@ class InventarioDashboard:
             ),
             secondary_y=False
         )
+        linea = go.Scattergl if graficos.usar_webgl(len(df_group)) else go.Scatter
         fig.add_trace(
-            go.Scatter(
+            linea(
                 x=df_group['Producto'],
                 y=df_group['% Vendido'],
                 name='% Vendido',
@@ -425,7 +773,22 @@ class InventarioDashboard:
             hovermode="x unified",
             plot_bgcolor='white'
         )
-        st.plotly_chart(fig, use_container_width=True, key=f"entradas_salidas_{key_suffix}")
+        return fig
+
+    def generar_grafico_entradas_vs_salidas(self, stock_df: pd.DataFrame, key_suffix='',
+                                            cubo: CuboStock = None, filtros: dict = None):
+        """Con ``cubo`` la agregación sale del cubo y la figura se guarda en caché."""
+        if stock_df.empty:
+            st.warning("No hay datos para Entradas vs. Salidas")
+            return
+        if cubo is None:
+            fig, _ = self.figura_entradas_vs_salidas(stock_df)
+        else:
+            fig = self.figura_cacheada(
+                ('entradas_salidas', CuboStock.clave_filtros(filtros or {})),
+                lambda: self.figura_entradas_vs_salidas(stock_df, cubo.entradas_vs_salidas(filtros))
+            )
+        self.mostrar_grafico(fig, use_container_width=True, key=f"entradas_salidas_{key_suffix}")
 
     def stock_view(self):
         st.markdown(f"<h2 style='color: {self.COLOR_SCHEME['text']}; margin-bottom: 20px;'>📊 Vista General de Stock</h2>", 
@@ -435,38 +798,41 @@ class InventarioDashboard:
         if stock_df.empty:
             st.warning("⚠️ No hay datos disponibles para mostrar")
             return
+        self.panel_stock(self.cubo_stock(stock_df))
 
+        historico = self.historico_stock()
+        if historico.disponible:
+            self.panel_historico(historico)
+
+    @fragmento
+    def panel_stock(self, cubo: CuboStock):
+        """Filtros y todo lo que depende de ellos; un cambio de filtro sólo rerunea esta parte."""
         st.markdown("### 🔍 Filtros")
         col1, col2, col3 = st.columns(3)
         with col1:
             lote_filter = st.multiselect(
                 "Filtrar por Lote",
-                options=sorted(stock_df['Lote'].unique()),
-                key="stock_lote_filter"
+                options=cubo.opciones('Lote'),
+                **self.estado_persistente("stock_lote_filter")
             )
         with col2:
             almacen_filter = st.multiselect(
                 "Filtrar por Almacén",
-                options=sorted(stock_df['Almacén'].unique()),
-                key="stock_almacen_filter"
+                options=cubo.opciones('Almacén'),
+                **self.estado_persistente("stock_almacen_filter")
             )
         with col3:
             estado_filter = st.multiselect(
                 "Filtrar por Estado",
-                options=sorted(stock_df['Estado Stock'].unique()),
-                key="stock_estado_filter"
+                options=cubo.opciones('Estado Stock'),
+                **self.estado_persistente("stock_estado_filter")
             )
 
-        df_filtered = stock_df.copy()
-        if lote_filter:
-            df_filtered = df_filtered[df_filtered['Lote'].isin(lote_filter)]
-        if almacen_filter:
-            df_filtered = df_filtered[df_filtered['Almacén'].isin(almacen_filter)]
-        if estado_filter:
-            df_filtered = df_filtered[df_filtered['Estado Stock'].isin(estado_filter)]
+        filtros = {'Lote': lote_filter, 'Almacén': almacen_filter, 'Estado Stock': estado_filter}
+        df_filtered = cubo.filtrar(filtros)
 
         st.markdown("### 📈 Métricas Principales")
-        metricas = self.calcular_metricas_generales(df_filtered)
+        metricas = self.calcular_metricas_generales(cubo, filtros)
         self.mostrar_metricas(metricas)
 
         st.markdown("### 📊 Análisis Visual")
@@ -474,165 +840,194 @@ class InventarioDashboard:
         with col1:
             fig_stock = self.generar_grafico_stock(
                 df_filtered, tipo='barras', titulo='Stock por Producto y Estado',
-                key_suffix='stock_view_1'
+                key_suffix='stock_view_1', filtros=filtros
             )
             if fig_stock:
-                st.plotly_chart(fig_stock, use_container_width=True, key="stock_bar_1")
+                self.mostrar_grafico(fig_stock, use_container_width=True, key="stock_bar_1")
 
         with col2:
             fig_tree = self.generar_grafico_stock(
                 df_filtered, tipo='treemap', titulo='Distribución de Stock',
-                key_suffix='stock_view_2'
+                key_suffix='stock_view_2', filtros=filtros
             )
             if fig_tree:
-                st.plotly_chart(fig_tree, use_container_width=True, key="stock_tree_1")
+                self.mostrar_grafico(fig_tree, use_container_width=True, key="stock_tree_1")
 
         st.markdown("### 📋 Detalle de Stock")
-        st.dataframe(
+        self.tabla_paginada(
+            "stock_detalle",
             df_filtered[[
                 'Almacén','Producto','Lote','Stock','Kg Total','Estado Stock',
                 '% Disponible','Rotación'
             ]],
-            use_container_width=True,
-            height=400
+            key="stock_detalle",
+            use_container_width=True
         )
 
         st.markdown("### 📊 Entradas vs. Salidas y % Vendido (por Producto)")
-        self.generar_grafico_entradas_vs_salidas(df_filtered, key_suffix='stock_view')
+        self.generar_grafico_entradas_vs_salidas(
+            df_filtered, key_suffix='stock_view', cubo=cubo, filtros=filtros
+        )
+    @fragmento
+    def panel_historico(self, historico: HistoricoStock):
+        """Stock a una fecha pasada y evolución diaria, desde el índice temporal."""
+        st.markdown("### 📅 Stock Histórico")
+        primera, ultima = historico.primera.date(), historico.ultima.date()
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            kwargs_fecha = self.estado_persistente("historico_fecha", inicial=ultima)
+            # Con otra versión de los datos la fecha guardada puede quedar fuera del rango
+            st.session_state["historico_fecha"] = min(max(st.session_state["historico_fecha"], primera), ultima)
+            fecha = st.date_input("Stock a fecha", min_value=primera, max_value=ultima, **kwargs_fecha)
+        with c2:
+            productos = st.multiselect(
+                "Productos (evolución)",
+                options=sorted(historico.claves['Producto'].unique()),
+                **self.estado_persistente("historico_producto")
+            )
+        with c3:
+            almacenes = st.multiselect(
+                "Almacenes (evolución)",
+                options=sorted(historico.claves['Almacén'].unique()),
+                **self.estado_persistente("historico_almacen")
+            )
+
+        with self.traza.etapa('stock_a_fecha'):
+            stock_fecha = historico.stock_a_fecha(fecha, self.ESTADOS_STOCK)
+        self.mostrar_metricas(analytics.calcular_metricas_generales(stock_fecha))
+        self.tabla_paginada(
+            "historico_detalle",
+            stock_fecha[['Almacén','Producto','Lote','Stock','Kg Total','Estado Stock']],
+            key="historico_detalle",
+            use_container_width=True
+        )
+
+        filtros = {'Producto': productos, 'Almacén': almacenes}
+
+        def construir():
+            # Sin top N: sólo se quitan puntos si la serie no cabe en MAX_BYTES_FIGURA
+            serie = historico.serie(filtros=filtros)
+            return self.figura_reducida(lambda n: self._figura_historico(graficos.muestrear(serie, n)), n=0)
+        with self.traza.etapa('serie_historica', 'figura'):
+            fig = self.figura_cacheada(('historico', CuboStock.clave_filtros(filtros)), construir)
+        self.mostrar_grafico(fig, use_container_width=True, key="historico_linea", nombre="historico_linea")
+
+    def _figura_historico(self, serie: pd.DataFrame):
+        fig = px.line(
+            serie, x='Fecha', y='Stock', title="Evolución del Stock (cajas al cierre de cada día)",
+            hover_data=['Kg Total'],
+            render_mode='webgl' if graficos.usar_webgl(len(serie)) else 'svg'
+        )
+        fig.update_traces(line_color=self.COLOR_SCHEME['primary'])
+        return fig
+
     def ventas_view(self):
         st.markdown(f"<h2 style='color: {self.COLOR_SCHEME['text']}; margin-bottom: 20px;'>💰 Análisis de Ventas</h2>", 
                     unsafe_allow_html=True)
 
-        ventas = self.df[self.df['movimiento'] == 'SALIDA'].copy()
-        ventas = ventas[ventas['precio'] > 0]
+        with self.traza.etapa('ventas_validas'):
+            indice = self.preparado('ventas') or ventas_por_version(
+                self.huella, self.SPREADSHEET_ID, self.RANGE_NAME, self.df
+            )
 
-        if ventas.empty:
+        if not indice.filas:
             st.warning("⚠️ No hay datos de ventas disponibles")
             return
 
-        tabs = st.tabs(["📊 Resumen de Ventas", "👥 Análisis por Cliente", "📋 Detalle de Ventas"])
+        tabs = self.pestanas(["📊 Resumen de Ventas", "👥 Análisis por Cliente", "📋 Detalle de Ventas"], "ventas_pestana")
 
         with tabs[0]:
-            total_ventas = ventas['precio total'].sum()
-            total_kg = ventas['kg'].sum()
-            total_cajas = ventas['cajas'].sum()
-            precio_prom = total_ventas / total_kg if total_kg else 0
-
-            metricas = {
-                "Total Ventas": total_ventas,
-                "Total Kg Vendidos": total_kg,
-                "Total Cajas Vendidas": total_cajas,
-                "Precio Promedio/Kg": precio_prom
-            }
-            self.mostrar_metricas(metricas)
-
-            st.markdown("### 📈 Top Ventas por Producto")
-            col1, col2 = st.columns([3,2])
-            with col1:
-                ventas_prod = ventas.groupby(['nombre','lote']).agg({
-                    'cajas':'sum','kg':'sum','precio total':'sum'
-                }).round(2).sort_values('precio total', ascending=False)
-                ventas_prod['% del Total'] = (ventas_prod['precio total'] / total_ventas * 100).round(2)
-                ventas_prod['Precio/Kg'] = (ventas_prod['precio total'] / ventas_prod['kg']).round(2)
-                st.dataframe(ventas_prod, use_container_width=True, height=400)
-            with col2:
-                fig = px.pie(
-                    ventas_prod.reset_index(),
-                    values='precio total',
-                    names='nombre',
-                    title="Distribución de Ventas por Producto",
-                    hole=0.4
-                )
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig, use_container_width=True, key="ventas_pie_1")
-
-        with tabs[1]:
-            st.markdown("### 👥 Análisis por Cliente")
-            ventas_cliente = ventas.groupby('cliente').agg({
-                'cajas':'sum','kg':'sum','precio total':'sum'
-            }).round(2).sort_values('precio total', ascending=False)
-            ventas_cliente['% del Total'] = (ventas_cliente['precio total'] / total_ventas * 100).round(2)
-            ventas_cliente['Precio/Kg'] = (ventas_cliente['precio total'] / ventas_cliente['kg']).round(2)
-            st.dataframe(ventas_cliente, use_container_width=True)
-
-            st.markdown("### 🔍 Detalle por Cliente")
-            cliente_sel = st.selectbox(
-                "Seleccionar Cliente",
-                options=sorted(ventas['cliente'].dropna().unique()),
-                key="ventas_cliente_select"
-            )
-            if cliente_sel:
-                df_cliente = ventas[ventas['cliente'] == cliente_sel]
-                total_cli = df_cliente['precio total'].sum()
-                kg_cli = df_cliente['kg'].sum()
-
-                metricas_cliente = {
-                    "Total Compras": total_cli,
-                    "Total Kg": kg_cli,
-                    "% del Total": (total_cli/total_ventas*100) if total_ventas else 0,
-                    "Precio Promedio/Kg": total_cli/kg_cli if kg_cli>0 else 0
-                }
-                self.mostrar_metricas(metricas_cliente)
+            if self.pestana_abierta(tabs[0]):
+                self.mostrar_metricas(indice.metricas)
 
-                col1, col2 = st.columns(2)
+                st.markdown("### 📈 Top Ventas por Producto")
+                col1, col2 = st.columns([3,2])
                 with col1:
-                    fig_dist = px.pie(
-                        df_cliente,
+                    with self.traza.etapa('ventas_por_producto'):
+                        ventas_prod = indice.agrupado(['nombre','lote'])
+                    self.mostrar_tabla("ventas_producto", ventas_prod, use_container_width=True, height=400)
+                with col2:
+                    fig = self.figura_cacheada(('ventas_pie',), lambda: self.figura_reducida(lambda n: px.pie(
+                        graficos.datos_tarta(ventas_prod.reset_index(), 'nombre', 'precio total', n),
                         values='precio total',
                         names='nombre',
-                        title=f"Distribución de Compras - {cliente_sel}",
+                        title="Distribución de Ventas por Producto",
                         hole=0.4
-                    )
-                    st.plotly_chart(fig_dist, use_container_width=True, key=f"cliente_pie_{cliente_sel}")
-                with col2:
-                    fig_bar = px.bar(
-                        df_cliente,
-                        x='nombre',
-                        y=['cajas','kg'],
-                        title=f"Cantidades por Producto - {cliente_sel}",
-                        barmode='group'
-                    )
-                    fig_bar.update_layout(xaxis_tickangle=-45)
-                    st.plotly_chart(fig_bar, use_container_width=True, key=f"cliente_bar_{cliente_sel}")
+                    ).update_traces(textposition='inside', textinfo='percent+label')))
+                    self.mostrar_grafico(fig, use_container_width=True, key="ventas_pie_1")
+
+        with tabs[1]:
+            if self.pestana_abierta(tabs[1]):
+                st.markdown("### 👥 Análisis por Cliente")
+                with self.traza.etapa('ventas_por_cliente'):
+                    ventas_cliente = indice.agrupado('cliente')
+                self.mostrar_tabla("ventas_cliente", ventas_cliente, use_container_width=True)
+
+                self.detalle_cliente(indice)
 
         with tabs[2]:
-            st.markdown("### 📋 Detalle de Ventas")
-            col1, col2, col3 = st.columns(3)
+            if self.pestana_abierta(tabs[2]):
+                self.detalle_ventas(indice)
+
+    @fragmento
+    def detalle_cliente(self, indice: IndiceVentas):
+        st.markdown("### 🔍 Detalle por Cliente")
+        cliente_sel = st.selectbox(
+            "Seleccionar Cliente",
+            options=indice.opciones('cliente'),
+            **self.estado_persistente("ventas_cliente_select")
+        )
+        if cliente_sel:
+            df_cliente = indice.grupo('cliente', cliente_sel)
+            self.mostrar_metricas(indice.metricas_cliente(cliente_sel))
+
+            col1, col2 = st.columns(2)
             with col1:
-                cliente_filter = st.multiselect(
-                    "Filtrar por Cliente",
-                    options=sorted(ventas['cliente'].dropna().unique()),
-                    key="ventas_cliente_filter"
-                )
+                fig_dist = self.figura_cacheada(('cliente_pie', cliente_sel), lambda: self.figura_reducida(lambda n: px.pie(
+                    graficos.datos_tarta(df_cliente, 'nombre', 'precio total', n),
+                    values='precio total',
+                    names='nombre',
+                    title=f"Distribución de Compras - {cliente_sel}",
+                    hole=0.4
+                )))
+                self.mostrar_grafico(fig_dist, use_container_width=True, key=f"cliente_pie_{cliente_sel}", nombre="cliente_pie")
             with col2:
-                producto_filter = st.multiselect(
-                    "Filtrar por Producto",
-                    options=sorted(ventas['nombre'].dropna().unique()),
-                    key="ventas_producto_filter"
-                )
-            with col3:
-                vendedor_filter = st.multiselect(
-                    "Filtrar por Vendedor",
-                    options=sorted([v for v in ventas['vendedor'].dropna().unique() if str(v).strip()]),
-                    key="ventas_vendedor_filter"
-                )
-
-            df_fil = ventas.copy()
-            if cliente_filter:
-                df_fil = df_fil[df_fil['cliente'].isin(cliente_filter)]
-            if producto_filter:
-                df_fil = df_fil[df_fil['nombre'].isin(producto_filter)]
-            if vendedor_filter:
-                df_fil = df_fil[df_fil['vendedor'].isin(vendedor_filter)]
-
-            st.dataframe(
-                df_fil[[
-                    'nombre','lote','cliente','vendedor',
-                    'cajas','kg','precio','precio total'
-                ]].sort_values(['cliente','nombre']),
-                use_container_width=True,
-                height=400
+                fig_bar = self.figura_cacheada(('cliente_bar', cliente_sel), lambda: self.figura_reducida(lambda n: px.bar(
+                    graficos.datos_barras(df_cliente, 'nombre', ['cajas','kg'], n),
+                    x='nombre',
+                    y=['cajas','kg'],
+                    title=f"Cantidades por Producto - {cliente_sel}",
+                    barmode='group'
+                ).update_layout(xaxis_tickangle=-45)))
+                self.mostrar_grafico(fig_bar, use_container_width=True, key=f"cliente_bar_{cliente_sel}", nombre="cliente_bar")
+
+    @fragmento
+    def detalle_ventas(self, indice: IndiceVentas):
+        st.markdown("### 📋 Detalle de Ventas")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            cliente_filter = st.multiselect(
+                "Filtrar por Cliente",
+                options=indice.opciones('cliente'),
+                **self.estado_persistente("ventas_cliente_filter")
+            )
+        with col2:
+            producto_filter = st.multiselect(
+                "Filtrar por Producto",
+                options=indice.opciones('nombre'),
+                **self.estado_persistente("ventas_producto_filter")
             )
+        with col3:
+            vendedor_filter = st.multiselect(
+                "Filtrar por Vendedor",
+                options=[v for v in indice.opciones('vendedor') if str(v).strip()],
+                **self.estado_persistente("ventas_vendedor_filter")
+            )
+
+        df_fil = indice.filtrar_detalle({
+            'cliente': cliente_filter, 'nombre': producto_filter, 'vendedor': vendedor_filter
+        })
+        self.tabla_paginada("ventas_detalle", df_fil, key="ventas_detalle", use_container_width=True)
 
     def vista_comercial(self):
         st.markdown(f"<h2 style='color: {self.COLOR_SCHEME['text']}; margin-bottom: 20px;'>🎯 Vista Comercial</h2>", 
@@ -642,168 +1037,271 @@ class InventarioDashboard:
         if stock_df.empty:
             st.warning("⚠️ No hay datos de Stock para mostrar")
             return
+        self.panel_comercial(self.cubo_stock(stock_df))
 
+    @fragmento
+    def panel_comercial(self, cubo: CuboStock):
+        """Filtros comerciales y sus pestañas (cada detalle es a su vez un fragmento)."""
         st.markdown("### 🔍 Filtros de Análisis")
         c1, c2, c3 = st.columns(3)
         with c1:
             lote_filter = st.multiselect(
                 "Filtrar por Lote",
-                options=sorted(stock_df['Lote'].unique()),
-                key="comercial_lote_filter"
+                options=cubo.opciones('Lote'),
+                **self.estado_persistente("comercial_lote_filter")
             )
         with c2:
             alm_filter = st.multiselect(
                 "Filtrar por Almacén",
-                options=sorted(stock_df['Almacén'].unique()),
-                key="comercial_almacen_filter"
+                options=cubo.opciones('Almacén'),
+                **self.estado_persistente("comercial_almacen_filter")
             )
         with c3:
             est_filter = st.multiselect(
                 "Filtrar por Estado",
-                options=sorted(stock_df['Estado Stock'].unique()),
-                key="comercial_estado_filter"
+                options=cubo.opciones('Estado Stock'),
+                **self.estado_persistente("comercial_estado_filter")
             )
 
-        df_f = stock_df.copy()
-        if lote_filter:
-            df_f = df_f[df_f['Lote'].isin(lote_filter)]
-        if alm_filter:
-            df_f = df_f[df_f['Almacén'].isin(alm_filter)]
-        if est_filter:
-            df_f = df_f[df_f['Estado Stock'].isin(est_filter)]
+        filtros = {'Lote': lote_filter, 'Almacén': alm_filter, 'Estado Stock': est_filter}
+        df_f = cubo.filtrar(filtros)
 
-        tab1, tab2, tab3 = st.tabs(["📊 Resumen General", "🔍 Por Producto", "📍 Por Almacén"])
+        tab1, tab2, tab3 = self.pestanas(["📊 Resumen General", "🔍 Por Producto", "📍 Por Almacén"], "comercial_pestana")
 
         with tab1:
-            metricas = self.calcular_metricas_generales(df_f)
-            self.mostrar_metricas(metricas)
+            if self.pestana_abierta(tab1):
+                metricas = self.calcular_metricas_generales(cubo, filtros)
+                self.mostrar_metricas(metricas)
 
-            col1, col2 = st.columns(2)
-            with col1:
-                fig_stock = self.generar_grafico_stock(
-                    df_f, tipo='barras', titulo='Stock por Producto y Estado'
-                )
-                if fig_stock:
-                    st.plotly_chart(fig_stock, use_container_width=True, key="comercial_bar_1")
-
-            with col2:
-                fig_tree = self.generar_grafico_stock(
-                    df_f, tipo='treemap', titulo='Distribución de Stock'
-                )
-                if fig_tree:
-                    st.plotly_chart(fig_tree, use_container_width=True, key="comercial_tree_1")
+                col1, col2 = st.columns(2)
+                with col1:
+                    fig_stock = self.generar_grafico_stock(
+                        df_f, tipo='barras', titulo='Stock por Producto y Estado', filtros=filtros
+                    )
+                    if fig_stock:
+                        self.mostrar_grafico(fig_stock, use_container_width=True, key="comercial_bar_1")
 
-            st.markdown("#### 📊 Entradas vs. Salidas y % Vendido (por Producto)")
-            self.generar_grafico_entradas_vs_salidas(df_f, key_suffix='comercial_view')
+                with col2:
+                    fig_tree = self.generar_grafico_stock(
+                        df_f, tipo='treemap', titulo='Distribución de Stock', filtros=filtros
+                    )
+                    if fig_tree:
+                        self.mostrar_grafico(fig_tree, use_container_width=True, key="comercial_tree_1")
 
-        with tab2:
-            st.markdown("### 🔍 Análisis Detallado por Producto")
-            prod_sel = st.selectbox(
-                "Seleccionar Producto",
-                options=sorted(df_f['Producto'].unique()),
-                key="comercial_producto_select"
-            )
-            if prod_sel:
-                df_prod = df_f[df_f['Producto'] == prod_sel]
-                metricas_prod = {
-                    "Stock Total": df_prod['Stock'].sum(),
-                    "Kg Totales": df_prod['Kg Total'].sum(),
-                    "Ventas Totales ($)": df_prod['Ventas Total'].sum(),
-                    "Rotación (%)": df_prod['Rotación'].mean()
-                }
-                self.mostrar_metricas(metricas_prod)
-
-                st.markdown("#### 📋 Detalle por Almacén y Lote")
-                st.dataframe(
-                    df_prod[[
-                        'Almacén','Lote','Stock','Kg Total','Total Inicial',
-                        'Salidas','% Vendido','% Disponible','Estado Stock'
-                    ]].sort_values(['Almacén','Lote']),
-                    use_container_width=True
+                st.markdown("#### 📊 Entradas vs. Salidas y % Vendido (por Producto)")
+                self.generar_grafico_entradas_vs_salidas(
+                    df_f, key_suffix='comercial_view', cubo=cubo, filtros=filtros
                 )
 
-                c1, c2 = st.columns(2)
-                with c1:
-                    fig_pie = px.pie(
-                        df_prod,
-                        values='Stock',
-                        names='Almacén',
-                        title=f"Distribución por Almacén - {prod_sel}",
-                        hole=0.4
-                    )
-                    st.plotly_chart(fig_pie, use_container_width=True, key=f"comercial_prod_pie_{prod_sel}")
-                with c2:
-                    fig_bar = px.bar(
-                        df_prod,
-                        x='Lote',
-                        y=['Stock','Salidas'],
-                        title=f"Stock vs Salidas - {prod_sel}",
-                        barmode='group'
-                    )
-                    st.plotly_chart(fig_bar, use_container_width=True, key=f"comercial_prod_bar_{prod_sel}")
+        with tab2:
+            if self.pestana_abierta(tab2):
+                self.detalle_producto(cubo, filtros, df_f)
 
         with tab3:
-            st.markdown("### 📍 Análisis Detallado por Almacén")
-            alm_sel = st.selectbox(
-                "Seleccionar Almacén",
-                options=sorted(df_f['Almacén'].unique()),
-                key="comercial_almacen_select"
+            if self.pestana_abierta(tab3):
+                self.detalle_almacen(cubo, filtros, df_f)
+
+    @fragmento
+    def detalle_producto(self, cubo: CuboStock, filtros: dict, df_f: pd.DataFrame):
+        st.markdown("### 🔍 Análisis Detallado por Producto")
+        prod_sel = st.selectbox(
+            "Seleccionar Producto",
+            options=sorted(df_f['Producto'].unique()),
+            **self.estado_persistente("comercial_producto_select")
+        )
+        if prod_sel:
+            df_prod = cubo.filtrar({**filtros, 'Producto': [prod_sel]})
+            self.mostrar_metricas(analytics.metricas_producto(df_prod))
+
+            st.markdown("#### 📋 Detalle por Almacén y Lote")
+            self.tabla_paginada(
+                "comercial_producto_detalle",
+                df_prod[[
+                    'Almacén','Lote','Stock','Kg Total','Total Inicial',
+                    'Salidas','% Vendido','% Disponible','Estado Stock'
+                ]].sort_values(['Almacén','Lote']),
+                key="comercial_producto_detalle",
+                use_container_width=True
             )
-            if alm_sel:
-                df_alm = df_f[df_f['Almacén'] == alm_sel]
-                metricas_alm = {
-                    "Total Productos": len(df_alm['Producto'].unique()),
-                    "Stock Total": df_alm['Stock'].sum(),
-                    "Productos Críticos": len(df_alm[df_alm['Estado Stock'] == 'CRÍTICO'])
-                }
-                self.mostrar_metricas(metricas_alm, 3)
-
-                st.markdown("#### 📊 Estado de Stock por Producto")
-                resumen_stock = df_alm.groupby('Producto').agg({
-                    'Stock': 'sum',
-                    'Kg Total': 'sum',
-                    'Total Inicial': 'sum',
-                    'Salidas': 'sum',
-                    '% Vendido': 'mean',
-                    '% Disponible': 'mean'
-                }).round(2).reset_index()
-
-                def definir_estado(stock_val):
-                    for est, cfg in self.ESTADOS_STOCK.items():
-                        if stock_val <= cfg['umbral']:
-                            return est
-                    return 'NORMAL'
-
-                resumen_stock['Estado'] = resumen_stock['Stock'].apply(definir_estado)
-
-                st.dataframe(
-                    resumen_stock.sort_values('Stock', ascending=False),
-                    use_container_width=True
-                )
 
-                c1, c2 = st.columns(2)
-                with c1:
-                    fig_stock_alm = px.bar(
-                        df_alm,
-                        x='Producto',
-                        y='Stock',
-                        color='Estado Stock',
-                        title=f"Stock por Producto - {alm_sel}"
-                    )
-                    fig_stock_alm.update_layout(xaxis_tickangle=-45)
-                    st.plotly_chart(fig_stock_alm, use_container_width=True, key=f"comercial_alm_bar_{alm_sel}")
+            clave = CuboStock.clave_filtros(filtros)
+            c1, c2 = st.columns(2)
+            with c1:
+                fig_pie = self.figura_cacheada(('comercial_prod_pie', prod_sel, clave), lambda: self.figura_reducida(lambda n: px.pie(
+                    graficos.datos_tarta(df_prod, 'Almacén', 'Stock', n),
+                    values='Stock',
+                    names='Almacén',
+                    title=f"Distribución por Almacén - {prod_sel}",
+                    hole=0.4
+                )))
+                self.mostrar_grafico(fig_pie, use_container_width=True, key=f"comercial_prod_pie_{prod_sel}", nombre="comercial_prod_pie")
+            with c2:
+                fig_bar = self.figura_cacheada(('comercial_prod_bar', prod_sel, clave), lambda: self.figura_reducida(lambda n: px.bar(
+                    graficos.datos_barras(df_prod, 'Lote', ['Stock','Salidas'], n),
+                    x='Lote',
+                    y=['Stock','Salidas'],
+                    title=f"Stock vs Salidas - {prod_sel}",
+                    barmode='group'
+                )))
+                self.mostrar_grafico(fig_bar, use_container_width=True, key=f"comercial_prod_bar_{prod_sel}", nombre="comercial_prod_bar")
+
+    @fragmento
+    def detalle_almacen(self, cubo: CuboStock, filtros: dict, df_f: pd.DataFrame):
+        st.markdown("### 📍 Análisis Detallado por Almacén")
+        alm_sel = st.selectbox(
+            "Seleccionar Almacén",
+            options=sorted(df_f['Almacén'].unique()),
+            **self.estado_persistente("comercial_almacen_select")
+        )
+        if alm_sel:
+            df_alm = cubo.filtrar({**filtros, 'Almacén': [alm_sel]})
+            self.mostrar_metricas(analytics.metricas_almacen(df_alm), 3)
+
+            st.markdown("#### 📊 Estado de Stock por Producto")
+            self.tabla_paginada(
+                "comercial_almacen_resumen",
+                analytics.resumen_almacen(df_alm, self.ESTADOS_STOCK),
+                key="comercial_almacen_resumen",
+                use_container_width=True
+            )
+
+            clave = CuboStock.clave_filtros(filtros)
+            c1, c2 = st.columns(2)
+            with c1:
+                fig_stock_alm = self.figura_cacheada(('comercial_alm_bar', alm_sel, clave), lambda: self.figura_reducida(lambda n: px.bar(
+                    graficos.datos_barras_stock(df_alm, n),
+                    x='Producto',
+                    y='Stock',
+                    color='Estado Stock',
+                    title=f"Stock por Producto - {alm_sel}"
+                ).update_layout(xaxis_tickangle=-45)))
+                self.mostrar_grafico(fig_stock_alm, use_container_width=True, key=f"comercial_alm_bar_{alm_sel}", nombre="comercial_alm_bar")
                 
-                with c2:
-                    fig_estados = px.pie(
-                        df_alm,
-                        names='Estado Stock',
-                        values='Stock',
-                        title=f"Distribución por Estado - {alm_sel}",
-                        hole=0.4
+            with c2:
+                fig_estados = self.figura_cacheada(('comercial_alm_pie', alm_sel, clave), lambda: self.figura_reducida(lambda n: px.pie(
+                    graficos.datos_tarta(df_alm, 'Estado Stock', 'Stock', n),
+                    names='Estado Stock',
+                    values='Stock',
+                    title=f"Distribución por Estado - {alm_sel}",
+                    hole=0.4
+                )))
+                self.mostrar_grafico(fig_estados, use_container_width=True, key=f"comercial_alm_pie_{alm_sel}", nombre="comercial_alm_pie")
+
+    def mostrar_refresco(self):
+        """Hora y duración del último refresco correcto (no la hora del rerun)."""
+        hora = lambda t: datetime.fromtimestamp(t).strftime("%H:%M:%S")
+        if self.publicada is None:
+            self.mostrar_descarga(hora)
+            return
+        st.write(
+            "🕒 Datos de las", hora(self.publicada.terminado_en),
+            f"(refresco de {self.publicada.duracion:.2f} s)"
+        )
+        estado = self.refrescador().estado()
+        if estado['refrescando']:
+            st.caption("⏳ Refrescando en segundo plano...")
+        elif estado['proximo']:
+            st.caption(f"Próximo refresco: {hora(estado['proximo'])} · cada {self.REFRESCO:.0f} s")
+        if estado['ultimo_error']:
+            st.caption(f"⚠️ Falló el último refresco: {estado['ultimo_error']}")
+
+    def mostrar_descarga(self, hora):
+        """Sin refresco de fondo: hora de la descarga más antigua de las hojas mostradas."""
+        cache = obtener_cache_datos()
+        estados = [cache.estado((self.FUENTE, self.SPREADSHEET_ID, rango)) for rango in self.RANGOS]
+        edades = [e['edad'] for e in estados if e['edad'] is not None]
+        if not edades:
+            st.write("🕒 Última actualización:", datetime.now().strftime("%H:%M:%S"))
+            return
+        duracion = max(e['duracion_carga'] for e in estados if e['edad'] is not None)
+        st.write("🕒 Datos de las", hora(time.time() - max(edades)), f"(descarga de {duracion:.2f} s)")
+
+    def mostrar_estado_cache(self):
+        cache = obtener_cache_datos()
+        with st.sidebar:
+            st.markdown("#### 🗄️ Caché de datos")
+            for rango in self.RANGOS:
+                estado = cache.estado((self.FUENTE, self.SPREADSHEET_ID, rango))
+                edad = estado['edad']
+                hoja = f"{categoria_de_rango(rango)} · " if len(self.RANGOS) > 1 else ""
+                st.caption(
+                    f"{hoja}Aciertos: {estado.get('aciertos', 0)} · "
+                    f"Fallos: {estado.get('fallos', 0)} · "
+                    f"Obsoletos: {estado.get('obsoletos', 0)} · "
+                    f"Sin cambios: {estado.get('sin_cambios', 0)}"
+                )
+                if edad is not None:
+                    st.caption(
+                        f"Edad: {edad:.0f}s (TTL {self.CACHE_TTL:.0f}s) · "
+                        f"Descarga: {estado['duracion_carga']:.2f}s"
                     )
-                    st.plotly_chart(fig_estados, use_container_width=True, key=f"comercial_alm_pie_{alm_sel}")
+                if estado['recargando']:
+                    st.caption("⏳ Recargando en segundo plano...")
+            instantanea = self.df.attrs.get('snapshot')
+            if instantanea and instantanea.get('guardado_en'):
+                guardado = datetime.fromtimestamp(instantanea['guardado_en']).strftime("%d/%m %H:%M:%S")
+                st.caption(f"📀 Datos de la instantánea local ({guardado})")
+
+    def mostrar_memoria(self):
+        memoria = self.df.attrs.get('memoria')
+        if not memoria:
+            return
+        with st.sidebar:
+            st.caption(
+                f"💾 Libro en memoria: {memoria['antes'] / 1e6:,.1f} MB → "
+                f"{memoria['despues'] / 1e6:,.1f} MB ({len(self.df):,} filas)"
+            )
+
+    def iniciar_traza(self):
+        """Activa la traza del rerun si hay fichero de traza o el panel está abierto."""
+        # El checkbox se dibuja después en la barra lateral; su valor es el del rerun anterior
+        panel = st.session_state.get('perfil_panel', False)
+        if 'perfil_sesion' not in st.session_state:
+            st.session_state['perfil_sesion'] = uuid.uuid4().hex[:12]
+        st.session_state['perfil_rerun'] = st.session_state.get('perfil_rerun', 0) + 1
+        self.traza = perfil.Traza(
+            activa=panel or bool(self.PERFIL_TRAZA),
+            sesion=st.session_state['perfil_sesion'],
+            rerun=st.session_state['perfil_rerun']
+        )
+
+    def mostrar_perfil(self):
+        self.traza.escribir(self.PERFIL_TRAZA)
+        if not st.session_state.get('perfil_panel'):
+            return
+        resumen = self.traza.resumen()
+        with st.sidebar:
+            st.markdown("#### ⏱️ Tiempos del rerun")
+            st.dataframe(
+                resumen,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    'ms': st.column_config.NumberColumn(format="%.1f"),
+                    'KB': st.column_config.NumberColumn(format="%.1f")
+                }
+            )
+            tiempos = self.df.attrs.get('tiempos')
+            if tiempos:
+                st.caption("Última descarga: " + " · ".join(f"{k} {v:.2f}s" for k, v in tiempos.items()))
+            figuras = obtener_cache_figuras().estado()
+            st.caption(
+                f"Caché de figuras: {figuras['figuras']} ({figuras['bytes'] / 1024:.0f} KB) · "
+                f"aciertos {figuras['aciertos']} · fallos {figuras['fallos']} · "
+                f"expulsadas {figuras['expulsadas']}"
+            )
 
     def run_dashboard(self):
+        self.iniciar_traza()
+        self.rerun_completo = True
+        try:
+            with self.traza.etapa('run_dashboard'):
+                self._run_dashboard()
+        finally:
+            self.rerun_completo = False
+        self.mostrar_perfil()
+
+    def _run_dashboard(self):
         st.markdown(f"""
             <h1 style='text-align: center; color: {self.COLOR_SCHEME['primary']}; padding: 1rem 0;'>
                 📦 Dashboard de Inventario COHESA
@@ -812,26 +1310,50 @@ class InventarioDashboard:
 
         with st.sidebar:
             st.markdown("### ⚙️ Control del Dashboard")
-            st.write("🕒 Última actualización:", datetime.now().strftime("%H:%M:%S"))
+            # Se rellena tras cargar, con la hora de los datos que se muestran
+            estado_refresco = st.container()
+            st.checkbox("⏱️ Perfil de rendimiento", key="perfil_panel")
 
             if st.button('🔄 Actualizar Datos', key="refresh_button"):
-                st.cache_data.clear()
-                st.rerun()
-
-        if not self.load_data():
+                with st.spinner("Actualizando datos..."), self.traza.etapa('recarga_forzada'):
+                    if self.REFRESCO > 0:
+                        self.refrescador().refrescar()
+                    else:
+                        cargar_rangos(
+                            self.SPREADSHEET_ID, self.RANGOS, self.CACHE_TTL,
+                            forzar=True, fuente=self.FUENTE, opciones=self.OPCIONES_DESCARGA,
+                            snapshot_dir=self.SNAPSHOT_DIR
+                        )
+
+        with self.traza.etapa('load_data') as info:
+            cargado = self.load_data()
+            info['filas'] = len(self.df)
+            info['ultima_descarga'] = self.df.attrs.get('tiempos')
+        if not cargado:
             st.error("❌ Error al cargar los datos")
             return
 
-        tab1, tab2, tab3 = st.tabs(["📊 Stock", "💰 Ventas", "🎯 Vista Comercial"])
+        with estado_refresco:
+            self.mostrar_refresco()
+        self.mostrar_estado_cache()
+        self.mostrar_memoria()
+
+        tab1, tab2, tab3 = self.pestanas(["📊 Stock", "💰 Ventas", "🎯 Vista Comercial"], "vista_pestana")
 
         with tab1:
-            self.stock_view()
+            if self.pestana_abierta(tab1):
+                with self.traza.etapa('tab_stock'):
+                    self.stock_view()
 
         with tab2:
-            self.ventas_view()
+            if self.pestana_abierta(tab2):
+                with self.traza.etapa('tab_ventas'):
+                    self.ventas_view()
 
         with tab3:
-            self.vista_comercial()
+            if self.pestana_abierta(tab3):
+                with self.traza.etapa('tab_comercial'):
+                    self.vista_comercial()
 
 
 # -----------------------------------------------------------------------------
@@ -0,0 +1,146 @@
+"""
+Caché de datos de proceso para las descargas de Google Sheets.
+
+- TTL configurable por llamada.
+- Invalidación por clave (hoja/rango) en lugar de vaciar todas las cachés.
+- Stale-while-revalidate: una entrada caducada o invalidada se sigue sirviendo
+  mientras se recarga en segundo plano; sólo el primer acceso espera.
+- Semilla opcional (p. ej. una instantánea en disco) para el primer acceso:
+  se sirve al momento y se revalida en segundo plano.
+- Contadores de aciertos, fallos y edad por clave; una carga que devuelve
+  el mismo objeto que ya había (la fuente no cambió) cuenta como "sin cambios".
+"""
+import threading
+import time
+
+
+class _Entrada:
+    def __init__(self, valor, duracion: float, cargado_en: float):
+        self.valor = valor
+        self.cargado_en = cargado_en
+        self.duracion = duracion
+        self.invalidada = False
+
+    def edad(self, ahora: float) -> float:
+        return ahora - self.cargado_en
+
+    def vigente(self, ttl: float, ahora: float) -> bool:
+        return not self.invalidada and self.edad(ahora) < ttl
+
+
+class CacheDatos:
+    def __init__(self, reloj=time.time):
+        # ``reloj()`` da la hora (segundos) con la que se miden edad y TTL
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._cargas = {}
+        self._contadores = {}
+
+    def _contar(self, clave, evento: str):
+        contadores = self._contadores.setdefault(
+            clave, {'aciertos': 0, 'fallos': 0, 'obsoletos': 0, 'cargas': 0, 'errores': 0, 'semillas': 0,
+                    'sin_cambios': 0}
+        )
+        contadores[evento] += 1
+
+    def obtener(self, clave, cargar, ttl: float, semilla=None):
+        """
+        Devuelve el valor de ``clave``. Si no existe, lo carga con ``cargar()``
+        (una sola carga aunque haya varias sesiones esperando). Si está caducado,
+        devuelve la copia anterior y lanza la recarga en segundo plano.
+
+        ``semilla()`` puede devolver ``(valor, cargado_en)`` para el primer
+        acceso; ese valor se sirve de inmediato y se revalida en segundo plano.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                if entrada.vigente(ttl, self._reloj()):
+                    self._contar(clave, 'aciertos')
+                else:
+                    self._contar(clave, 'obsoletos')
+                    self._recargar_en_segundo_plano(clave, cargar)
+                return entrada.valor
+            self._contar(clave, 'fallos')
+        return self._cargar(clave, cargar, semilla=semilla)
+
+    def refrescar(self, clave, cargar):
+        """Recarga ``clave`` en primer plano; el resto de sesiones sigue viendo la copia anterior."""
+        self.invalidar(clave)
+        return self._cargar(clave, cargar, forzar=True)
+
+    def invalidar(self, clave):
+        """Marca ``clave`` como caducada sin descartar su valor."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                entrada.invalidada = True
+
+    def valor(self, clave):
+        """Valor guardado de ``clave`` (caducado o no), sin contar el acceso."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            return entrada.valor if entrada else None
+
+    def estado(self, clave) -> dict:
+        """Contadores y edad (segundos) de ``clave``."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            estado = dict(self._contadores.get(clave, {}))
+            estado['edad'] = entrada.edad(self._reloj()) if entrada else None
+            estado['duracion_carga'] = entrada.duracion if entrada else None
+            estado['recargando'] = clave in self._cargas
+            return estado
+
+    def _recargar_en_segundo_plano(self, clave, cargar):
+        # Se llama con self._lock tomado
+        if clave in self._cargas:
+            return
+        self._cargas[clave] = threading.Event()
+        threading.Thread(
+            target=self._ejecutar_carga, args=(clave, cargar, True), daemon=True
+        ).start()
+
+    def _cargar(self, clave, cargar, forzar: bool = False, semilla=None):
+        while True:
+            with self._lock:
+                entrada = self._entradas.get(clave)
+                if entrada is not None and not (forzar and entrada.invalidada):
+                    return entrada.valor
+                en_curso = self._cargas.get(clave)
+                if en_curso is None:
+                    self._cargas[clave] = threading.Event()
+                    break
+            en_curso.wait()
+            forzar = False
+        return self._ejecutar_carga(clave, cargar, False, semilla)
+
+    def _ejecutar_carga(self, clave, cargar, en_segundo_plano: bool, semilla=None):
+        inicio = time.perf_counter()
+        try:
+            sembrado = semilla() if semilla is not None else None
+            valor = sembrado[0] if sembrado else cargar()
+        except Exception:
+            with self._lock:
+                self._contar(clave, 'errores')
+                self._cargas.pop(clave).set()
+            if en_segundo_plano:
+                return None
+            raise
+
+        with self._lock:
+            anterior = self._entradas.get(clave)
+            entrada = _Entrada(valor, time.perf_counter() - inicio, self._reloj())
+            self._entradas[clave] = entrada
+            self._cargas.pop(clave).set()
+            if sembrado:
+                entrada.cargado_en = sembrado[1]
+                entrada.invalidada = True
+                self._contar(clave, 'semillas')
+                self._recargar_en_segundo_plano(clave, cargar)
+            elif anterior is not None and anterior.valor is valor:
+                self._contar(clave, 'sin_cambios')
+            else:
+                self._contar(clave, 'cargas')
+        return valor
@@ -0,0 +1,363 @@
+"""
+Orígenes de datos intercambiables para el libro de movimientos.
+
+Todas las fuentes devuelven lo mismo que la API de Google Sheets: un
+DataFrame de texto cuyas columnas son la fila 1 del rango, de modo que
+``InventarioDashboard.load_data`` funciona igual con cualquiera de ellas.
+
+``firma`` es una sonda barata de la versión de un rango (revisión del
+fichero en Drive, o fecha y tamaño del fichero local): si no cambia entre
+dos descargas, la segunda se puede omitir.
+
+URIs admitidas por ``crear_fuente``:
+    sheets                 Google Sheets (credenciales de servicio)
+    http://host:puerto     servidor local compatible con la API (sheets_local.py)
+    csv:ruta               fichero .csv o carpeta con <hoja>.csv
+    parquet:ruta           fichero .parquet o carpeta con <hoja>.parquet
+    sqlite:ruta            base de datos con una tabla por hoja
+"""
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sheets_client import DRIVE, obtener_pool
+
+_CELDAS_A1 = re.compile(r"^(?P<c0>[A-Z]+)(?P<f0>\d+)?(?::(?P<c1>[A-Z]+)(?P<f1>\d+)?)?$")
+
+
+def _columna_a_indice(letras: str) -> int:
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + (ord(letra) - ord('A') + 1)
+    return indice - 1
+
+
+def _indice_a_columna(indice: int) -> str:
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+
+def parsear_rango(range_name: str) -> dict:
+    """
+    Descompone un rango A1 ('Carnes!A1:L', 'Carnes!A2:L5000', 'Carnes') en
+    hoja, columnas (base 0, inclusivas, None = abierto) y filas (base 1,
+    inclusivas, None = abierto).
+    """
+    hoja, _, celdas = range_name.replace("'", "").rpartition('!')
+    if not hoja:
+        return {'hoja': celdas, 'col_ini': 0, 'col_fin': None, 'fila_ini': 1, 'fila_fin': None}
+
+    m = _CELDAS_A1.match(celdas)
+    if not m:
+        raise ValueError(f"Rango no soportado: {range_name}")
+    c0 = _columna_a_indice(m['c0'])
+    return {
+        'hoja': hoja,
+        'col_ini': c0,
+        'col_fin': _columna_a_indice(m['c1']) if m['c1'] else c0,
+        'fila_ini': int(m['f0']) if m['f0'] else 1,
+        'fila_fin': int(m['f1']) if m['f1'] else None,
+    }
+
+
+def dataframe_desde_valores(values: list) -> pd.DataFrame:
+    """Convierte la respuesta 'values' de Sheets (fila 1 = cabecera) en DataFrame."""
+    if not values:
+        return pd.DataFrame()
+    return _filas_a_dataframe(values[1:], values[0])
+
+
+def _filas_a_dataframe(filas: list, columnas: list) -> pd.DataFrame:
+    """
+    Sheets omite las celdas vacías al final de cada fila, así que una fila
+    puede ser más corta que la cabecera: lo que falta se rellena con None.
+    """
+    df = pd.DataFrame(filas)
+    df = df.iloc[:, :len(columnas)]
+    for posicion in range(df.shape[1], len(columnas)):
+        df[posicion] = None
+    df.columns = columnas
+    return df
+
+
+def _firma_ficheros(*rutas: str):
+    """Fecha de modificación (ns) y tamaño de los ficheros que existen."""
+    marcas = []
+    for ruta in rutas:
+        try:
+            estado = os.stat(ruta)
+        except OSError:
+            continue
+        marcas.append(f"{estado.st_mtime_ns}:{estado.st_size}")
+    return '|'.join(marcas) or None
+
+
+def _celdas_usadas(df: pd.DataFrame) -> np.ndarray:
+    """Celdas de cada fila hasta la última no vacía."""
+    llenas = (df != '').to_numpy()
+    return np.where(llenas.any(axis=1), llenas.shape[1] - np.argmax(llenas[:, ::-1], axis=1), 0)
+
+
+def _filas_usadas(usadas: np.ndarray) -> int:
+    """Filas hasta la última con alguna celda."""
+    return int(np.flatnonzero(usadas)[-1]) + 1 if usadas.any() else 0
+
+
+def _como_texto(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza una tabla local al formato de Sheets: todo texto, vacíos como ''."""
+    return df.astype(object).where(df.notna(), '').astype(str)
+
+
+class FuenteDatos:
+    """Interfaz común: ``leer`` devuelve el rango como lo haría Sheets."""
+
+    def leer(self, range_name: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def leer_varios(self, ranges: list) -> list:
+        return [self.leer(r) for r in ranges]
+
+    def firma(self, range_name: str):
+        """Marca de la versión del rango, o None si la fuente no sabe darla."""
+        return None
+
+
+class FuenteGoogleSheets(FuenteDatos):
+    """
+    API de Google Sheets. Con ``api_endpoint`` apunta a un servidor compatible
+    (p. ej. sheets_local.py) sin credenciales ni acceso a la red.
+
+    Con ``filas_por_bloque`` los rangos abiertos ('Carnes!A1:L') se descargan
+    en ventanas de filas en paralelo (``max_hilos``), agrupando
+    ``ventanas_por_peticion`` ventanas en cada batchGet. Cada petición se
+    reintenta con backoff exponencial (``reintentos``).
+    """
+
+    def __init__(self, spreadsheet_id: str, credenciales: dict = None, api_endpoint: str = None,
+                 filas_por_bloque: int = None, max_hilos: int = 4,
+                 ventanas_por_peticion: int = 1, reintentos: int = 3):
+        self.spreadsheet_id = spreadsheet_id
+        self.credenciales = credenciales
+        self.api_endpoint = api_endpoint
+        self.filas_por_bloque = filas_por_bloque
+        self.max_hilos = max_hilos
+        self.ventanas_por_peticion = ventanas_por_peticion
+        self.reintentos = reintentos
+
+    def _cliente(self):
+        # Servicio prestado por el pool del proceso (conexión HTTP persistente)
+        return obtener_pool().cliente(self.credenciales, self.api_endpoint)
+
+    def _get(self, range_name: str) -> list:
+        with self._cliente() as servicio:
+            result = servicio.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range=range_name
+            ).execute(num_retries=self.reintentos)
+        return result.get('values', [])
+
+    def _batch_get(self, ranges: list) -> list:
+        with self._cliente() as servicio:
+            result = servicio.spreadsheets().values().batchGet(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=ranges
+            ).execute(num_retries=self.reintentos)
+        return [vr.get('values', []) for vr in result.get('valueRanges', [])]
+
+    def firma(self, range_name: str):
+        """
+        Versión y fecha de modificación del fichero en Drive (cubren todas las
+        hojas). None si la API de Drive no responde: entonces se descarga.
+        """
+        try:
+            with obtener_pool().cliente(self.credenciales, self.api_endpoint, DRIVE) as servicio:
+                meta = servicio.files().get(
+                    fileId=self.spreadsheet_id,
+                    fields="version,modifiedTime",
+                    supportsAllDrives=True
+                ).execute(num_retries=self.reintentos)
+        except Exception:
+            return None
+        return f"{meta.get('version')}@{meta.get('modifiedTime')}"
+
+    def num_filas(self, hoja: str) -> int:
+        """Filas de la cuadrícula de la hoja (incluye la cabecera y filas vacías)."""
+        with self._cliente() as servicio:
+            meta = servicio.spreadsheets().get(
+                spreadsheetId=self.spreadsheet_id,
+                ranges=[hoja],
+                fields="sheets.properties(title,gridProperties.rowCount)"
+            ).execute(num_retries=self.reintentos)
+        for hoja_meta in meta.get('sheets', []):
+            if hoja_meta['properties']['title'] == hoja:
+                return hoja_meta['properties']['gridProperties']['rowCount']
+        return 0
+
+    def leer(self, range_name: str) -> pd.DataFrame:
+        rango = parsear_rango(range_name)
+        if (self.filas_por_bloque and rango['col_fin'] is not None
+                and rango['fila_ini'] == 1 and rango['fila_fin'] is None):
+            return self._leer_por_bloques(rango)
+        return dataframe_desde_valores(self._get(range_name))
+
+    def leer_varios(self, ranges: list) -> list:
+        return [dataframe_desde_valores(values) for values in self._batch_get(ranges)]
+
+    def _leer_por_bloques(self, rango: dict) -> pd.DataFrame:
+        hoja = rango['hoja']
+        c0 = _indice_a_columna(rango['col_ini'])
+        c1 = _indice_a_columna(rango['col_fin'])
+
+        cabecera = self._get(f"{hoja}!{c0}1:{c1}1")
+        if not cabecera:
+            return pd.DataFrame()
+        columnas = cabecera[0]
+
+        total = self.num_filas(hoja)
+        ventanas = [
+            f"{hoja}!{c0}{ini}:{c1}{min(ini + self.filas_por_bloque - 1, total)}"
+            for ini in range(2, total + 1, self.filas_por_bloque)
+        ]
+        grupos = [
+            ventanas[i:i + self.ventanas_por_peticion]
+            for i in range(0, len(ventanas), self.ventanas_por_peticion)
+        ]
+
+        def descargar(grupo: list) -> list:
+            # Cada ventana se convierte en DataFrame en cuanto llega: nunca se
+            # construye una lista con todas las filas de la hoja.
+            bloques = [self._get(grupo[0])] if len(grupo) == 1 else self._batch_get(grupo)
+            return [_filas_a_dataframe(values, columnas) for values in bloques if values]
+
+        with ThreadPoolExecutor(max_workers=self.max_hilos) as pool:
+            partes = [df for dfs in pool.map(descargar, grupos) for df in dfs]
+
+        if not partes:
+            return pd.DataFrame(columns=columnas)
+        return pd.concat(partes, ignore_index=True)
+
+
+class _FuenteTabular(FuenteDatos):
+    """Fuente local: una tabla completa por hoja, recortada según el rango A1."""
+
+    def tabla(self, hoja: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def hojas(self) -> list:
+        raise NotImplementedError
+
+    def firma_hoja(self, hoja: str):
+        return None
+
+    def firma(self, range_name: str):
+        return self.firma_hoja(parsear_rango(range_name)['hoja'])
+
+    def valores(self, range_name: str) -> list:
+        """
+        Rango en el formato 'values' de la API (lista de filas de texto). Como
+        Sheets, omite las celdas vacías al final de cada fila y las filas
+        vacías al final del rango.
+        """
+        rango = parsear_rango(range_name)
+        df = self._recortar(self.tabla(rango['hoja']), rango)
+        usadas = _celdas_usadas(df)
+        filas = [fila[:n] for fila, n in zip(df.values.tolist()[:_filas_usadas(usadas)], usadas)]
+        return [list(df.columns)] + filas if rango['fila_ini'] <= 1 else filas
+
+    def leer(self, range_name: str) -> pd.DataFrame:
+        """El mismo DataFrame que la API: las celdas que Sheets omitiría quedan nulas."""
+        rango = parsear_rango(range_name)
+        df = self._recortar(self.tabla(rango['hoja']), rango)
+        usadas = _celdas_usadas(df)
+        filas = _filas_usadas(usadas)
+        df = df.iloc[:filas].reset_index(drop=True)
+        return df.mask(np.arange(df.shape[1]) >= usadas[:filas, None])
+
+    @staticmethod
+    def _recortar(df: pd.DataFrame, rango: dict) -> pd.DataFrame:
+        # La fila 1 de la hoja es la cabecera: la fila de datos i está en la fila i + 2
+        inicio = max(rango['fila_ini'] - 2, 0)
+        fin = None if rango['fila_fin'] is None else max(rango['fila_fin'] - 1, 0)
+        col_fin = None if rango['col_fin'] is None else rango['col_fin'] + 1
+        return df.iloc[inicio:fin, rango['col_ini']:col_fin]
+
+
+class _FuenteFichero(_FuenteTabular):
+    extension = ''
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+
+    def _ruta_hoja(self, hoja: str) -> str:
+        if os.path.isdir(self.ruta):
+            return os.path.join(self.ruta, f"{hoja}{self.extension}")
+        return self.ruta
+
+    def firma_hoja(self, hoja: str):
+        return _firma_ficheros(self._ruta_hoja(hoja))
+
+    def hojas(self) -> list:
+        if os.path.isdir(self.ruta):
+            return sorted(
+                f[:-len(self.extension)] for f in os.listdir(self.ruta) if f.endswith(self.extension)
+            )
+        return [os.path.splitext(os.path.basename(self.ruta))[0]]
+
+
+class FuenteCSV(_FuenteFichero):
+    extension = '.csv'
+
+    def tabla(self, hoja: str) -> pd.DataFrame:
+        return pd.read_csv(self._ruta_hoja(hoja), dtype=str, keep_default_na=False)
+
+
+class FuenteParquet(_FuenteFichero):
+    extension = '.parquet'
+
+    def tabla(self, hoja: str) -> pd.DataFrame:
+        return _como_texto(pd.read_parquet(self._ruta_hoja(hoja)))
+
+
+class FuenteSQLite(_FuenteTabular):
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+
+    def tabla(self, hoja: str) -> pd.DataFrame:
+        with sqlite3.connect(self.ruta) as conn:
+            df = pd.read_sql_query(f'SELECT * FROM "{hoja}"', conn)
+        return _como_texto(df)
+
+    def firma_hoja(self, hoja: str):
+        # La base entera: con WAL las escrituras recientes sólo cambian el -wal
+        return _firma_ficheros(self.ruta, f"{self.ruta}-wal")
+
+    def hojas(self) -> list:
+        with sqlite3.connect(self.ruta) as conn:
+            filas = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        return sorted(nombre for (nombre,) in filas)
+
+
+def crear_fuente(uri: str, spreadsheet_id: str = '', credenciales: dict = None,
+                 **opciones_sheets) -> FuenteDatos:
+    """
+    Construye la fuente a partir de su URI (ver el docstring del módulo).
+    ``opciones_sheets`` se pasan a FuenteGoogleSheets (descarga por bloques).
+    """
+    if uri == 'sheets':
+        return FuenteGoogleSheets(spreadsheet_id, credenciales, **opciones_sheets)
+    if uri.startswith(('http://', 'https://')):
+        return FuenteGoogleSheets(spreadsheet_id, api_endpoint=uri, **opciones_sheets)
+
+    tipo, _, ruta = uri.partition(':')
+    fuentes = {'csv': FuenteCSV, 'parquet': FuenteParquet, 'sqlite': FuenteSQLite}
+    if tipo not in fuentes or not ruta:
+        raise ValueError(f"Fuente de datos desconocida: {uri}")
+    return fuentes[tipo](ruta)
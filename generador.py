@@ -0,0 +1,168 @@
+"""
+Generador de libros de movimientos sintéticos con la forma de la hoja
+'Carnes' (todo texto, como lo devuelve Sheets).
+
+Los movimientos siguen un patrón realista: cada lote pertenece a un único
+producto, las ENTRADA y TRASPASO preceden a las SALIDA en el tiempo, los
+traspasos van a un almacén distinto del de origen y las ventas se concentran
+en unos pocos clientes. Una pequeña fracción de celdas viene "sucia"
+('#N/A', movimientos en minúsculas, almacenes con espacios) para que la
+limpieza de la ingesta trabaje como con la hoja real.
+
+    python generador.py 1000000 --salida datos/ --formato parquet
+"""
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS = [
+    'fecha', 'nombre', 'lote', 'movimiento', 'almacen', 'almacen actual',
+    'cajas', 'kg', 'precio', 'precio total', 'cliente', 'vendedor'
+]
+MOVIMIENTOS = ['ENTRADA', 'TRASPASO', 'SALIDA']
+PROPORCIONES = [0.25, 0.15, 0.60]
+
+
+def _texto(valores: np.ndarray, nombres: np.ndarray) -> np.ndarray:
+    """Códigos -> texto; el código -1 es una celda vacía."""
+    nombres = np.append(np.asarray(nombres, dtype=object), '')
+    return nombres[valores]
+
+
+def _numero_texto(valores: np.ndarray) -> np.ndarray:
+    return pd.Series(valores).astype(str).to_numpy(dtype=object)
+
+
+def generar_libro(filas: int, productos: int = 40, lotes_por_producto: int = 6,
+                  almacenes: int = 5, clientes: int = 200, vendedores: int = 12,
+                  dias: int = 365, semilla: int = 0, suciedad: float = 0.01) -> pd.DataFrame:
+    """
+    Libro de ``filas`` movimientos ordenados por fecha. ``suciedad`` es la
+    fracción aproximada de celdas con valores que la ingesta debe limpiar.
+    """
+    rng = np.random.default_rng(semilla)
+
+    # Fechas crecientes; las entradas tienden a ir al principio del periodo
+    # y las salidas al final, de modo que el stock se consume con el tiempo.
+    movimiento = rng.choice(len(MOVIMIENTOS), size=filas, p=PROPORCIONES)
+    sesgo = np.array([0.6, 1.0, 1.4])[movimiento]
+    dia = np.minimum((rng.random(filas) ** (1 / sesgo) * dias).astype(np.int32), dias - 1)
+    orden = np.argsort(dia, kind='stable')
+    movimiento, dia = movimiento[orden], dia[orden]
+    es_traspaso = movimiento == 1
+    es_salida = movimiento == 2
+
+    # Cada lote pertenece a un producto; unos pocos productos mueven más volumen
+    lote = np.minimum(
+        (rng.random(filas) ** 1.5 * productos * lotes_por_producto).astype(np.int64),
+        productos * lotes_por_producto - 1
+    )
+    producto = lote // lotes_por_producto
+
+    almacen = rng.integers(0, almacenes, size=filas)
+    desplazamiento = rng.integers(1, max(almacenes, 2), size=filas)
+    almacen_actual = np.where(es_traspaso, (almacen + desplazamiento) % almacenes, -1)
+
+    # Las entradas son partidas grandes y las salidas pedidos pequeños, de modo
+    # que lo vendido ronda el 70 % de lo recibido
+    cajas = np.select(
+        [movimiento == 0, es_traspaso],
+        [rng.integers(20, 121, size=filas), rng.integers(5, 41, size=filas)],
+        rng.integers(1, 41, size=filas)
+    )
+    kg_por_caja = rng.uniform(8, 25, size=productos)[producto]
+    kg = np.round(cajas * kg_por_caja * rng.uniform(0.95, 1.05, size=filas), 2)
+    precio_base = rng.uniform(3, 15, size=productos)[producto]
+    precio = np.where(es_salida, np.round(precio_base * rng.uniform(0.9, 1.1, size=filas), 2), 0.0)
+    # Algunas salidas sin precio (mermas, muestras) que no cuentan como venta
+    precio[es_salida & (rng.random(filas) < 0.02)] = 0.0
+    precio_total = np.round(kg * precio, 2)
+
+    # Pocos clientes concentran la mayoría de las compras
+    cliente = np.where(es_salida, (rng.random(filas) ** 2.5 * clientes).astype(np.int64), -1)
+    vendedor = np.where(es_salida, rng.integers(0, vendedores, size=filas), -1)
+
+    nombres_producto = np.array([f"PRODUCTO {p:03d}" for p in range(productos)], dtype=object)
+    nombres_lote = np.array(
+        [f"L{p:03d}-{l:02d}" for p in range(productos) for l in range(lotes_por_producto)],
+        dtype=object
+    )
+    nombres_almacen = np.array([f"ALMACEN {a}" for a in range(almacenes)], dtype=object)
+    fechas = pd.date_range('2024-01-01', periods=dias).strftime('%d/%m/%Y').to_numpy(dtype=object)
+
+    df = pd.DataFrame({
+        'fecha': fechas[dia],
+        'nombre': nombres_producto[producto],
+        'lote': nombres_lote[lote],
+        'movimiento': np.array(MOVIMIENTOS, dtype=object)[movimiento],
+        'almacen': nombres_almacen[almacen],
+        'almacen actual': _texto(almacen_actual, nombres_almacen),
+        'cajas': _numero_texto(cajas),
+        'kg': _numero_texto(kg),
+        'precio': np.where(es_salida, _numero_texto(precio), ''),
+        'precio total': np.where(es_salida, _numero_texto(precio_total), ''),
+        'cliente': _texto(cliente, np.array([f"CLIENTE {c:04d}" for c in range(clientes)], dtype=object)),
+        'vendedor': _texto(vendedor, np.array([f"VENDEDOR {v:02d}" for v in range(vendedores)], dtype=object)),
+    }, columns=COLUMNAS)
+
+    if suciedad:
+        _ensuciar(df, rng, suciedad)
+    return df
+
+
+def _ensuciar(df: pd.DataFrame, rng: np.random.Generator, fraccion: float):
+    """Errores típicos de la hoja: fórmulas rotas, mayúsculas y espacios."""
+    n = len(df)
+    for col, valor in (('precio', '#N/A'), ('kg', '#VALUE!'), ('cajas', '')):
+        df.loc[rng.random(n) < fraccion / 10, col] = valor
+    marca = rng.random(n) < fraccion
+    df.loc[marca, 'movimiento'] = df.loc[marca, 'movimiento'].str.lower()
+    marca = rng.random(n) < fraccion
+    df.loc[marca, 'almacen'] = df.loc[marca, 'almacen'] + ' '
+
+
+def guardar_libro(df: pd.DataFrame, carpeta: str, hoja: str = 'Carnes', formato: str = 'csv') -> str:
+    """
+    Escribe el libro como una hoja de una fuente local (ver data_sources) y
+    devuelve la URI para ``crear_fuente``.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    if formato == 'csv':
+        df.to_csv(os.path.join(carpeta, f"{hoja}.csv"), index=False)
+    elif formato == 'parquet':
+        df.to_parquet(os.path.join(carpeta, f"{hoja}.parquet"), index=False)
+    elif formato == 'sqlite':
+        with sqlite3.connect(os.path.join(carpeta, 'libro.db')) as conn:
+            df.to_sql(hoja, conn, index=False, if_exists='replace')
+        return f"sqlite:{os.path.join(carpeta, 'libro.db')}"
+    else:
+        raise ValueError(f"Formato desconocido: {formato}")
+    return f"{formato}:{carpeta}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un libro de movimientos sintético")
+    parser.add_argument("filas", type=int)
+    parser.add_argument("--salida", default="datos")
+    parser.add_argument("--hoja", default="Carnes")
+    parser.add_argument("--formato", choices=['csv', 'parquet', 'sqlite'], default='csv')
+    parser.add_argument("--productos", type=int, default=40)
+    parser.add_argument("--lotes", type=int, default=6, help="lotes por producto")
+    parser.add_argument("--almacenes", type=int, default=5)
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--vendedores", type=int, default=12)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    df = generar_libro(
+        args.filas, args.productos, args.lotes, args.almacenes,
+        args.clientes, args.vendedores, semilla=args.semilla
+    )
+    print(guardar_libro(df, args.salida, args.hoja, args.formato))
+
+
+if __name__ == '__main__':
+    main()
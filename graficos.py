@@ -0,0 +1,135 @@
+"""
+Reducción de datos para las figuras del dashboard.
+
+Cada gráfico recibe los datos agregados al nivel que realmente dibuja (p. ej.
+producto × estado en lugar de una fila por producto, lote y almacén), con las
+``n`` categorías principales y el resto sumado en "Otros". ``limitar_payload``
+reconstruye la figura con menos categorías (o menos puntos, en las series)
+mientras su JSON supere el máximo configurado; si ni con una sola sigue
+cabiendo, lo registra en el log.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from analytics import porcentaje
+from perfil import bytes_figura
+
+OTROS = 'Otros'
+# A partir de este número de puntos las series de líneas usan WebGL
+PUNTOS_WEBGL = 1000
+# Categorías (además de "Otros") o puntos que quedan como mínimo al recortar
+N_MINIMO = 1
+
+logger = logging.getLogger(__name__)
+
+
+def agregar(df: pd.DataFrame, claves: list, medidas: list) -> pd.DataFrame:
+    """Suma ``medidas`` por ``claves`` conservando el orden de aparición."""
+    return df.groupby(claves, sort=False, observed=True, as_index=False)[medidas].sum()
+
+
+def top_n(df: pd.DataFrame, categoria: str, medida: str, n: int, grupo: str = None) -> pd.DataFrame:
+    """
+    Conserva las ``n`` categorías con mayor ``medida`` (dentro de cada
+    ``grupo`` si se indica) y renombra el resto como "Otros", al final.
+    ``n`` <= 0 no reduce nada.
+    """
+    if not n or df.empty:
+        return df
+    claves = ([grupo] if grupo else []) + [categoria]
+    totales = df.groupby(claves, sort=False, observed=True)[medida].sum()
+    if grupo:
+        rango = totales.groupby(level=0, sort=False).rank(method='first', ascending=False)
+    else:
+        rango = totales.rank(method='first', ascending=False)
+    if (rango <= n).all():
+        return df
+
+    principales = rango.index[(rango <= n).to_numpy()]
+    filas = pd.MultiIndex.from_frame(df[claves]) if grupo else pd.Index(df[categoria])
+    es_principal = filas.isin(principales)
+    resto = df[~es_principal].assign(**{categoria: OTROS})
+    return pd.concat([df[es_principal], resto], ignore_index=True)
+
+
+def reducir(df: pd.DataFrame, claves: list, medidas: list, categoria: str, n: int,
+            grupo: str = None) -> pd.DataFrame:
+    """Agrega a ``claves``, aplica ``top_n`` sobre la primera medida y vuelve a agregar."""
+    datos = agregar(df, claves, medidas)
+    reducido = top_n(datos, categoria, medidas[0], n, grupo)
+    if reducido is datos:
+        return datos
+    return agregar(reducido, claves, medidas)
+
+
+# -----------------------------------------------------------------------------
+#        Datos de cada gráfico
+# -----------------------------------------------------------------------------
+def datos_barras_stock(stock_df: pd.DataFrame, n: int) -> pd.DataFrame:
+    """Stock por producto y estado (las barras apiladas por lote y almacén, sumadas)."""
+    return reducir(stock_df, ['Producto', 'Estado Stock'], ['Stock'], 'Producto', n)
+
+
+def datos_treemap_stock(stock_df: pd.DataFrame, n: int) -> pd.DataFrame:
+    """Hojas almacén → producto (con su estado); ``n`` productos por almacén."""
+    return reducir(
+        stock_df, ['Almacén', 'Producto', 'Estado Stock'], ['Stock'], 'Producto', n, grupo='Almacén'
+    )
+
+
+def datos_tarta(df: pd.DataFrame, nombres: str, valores: str, n: int) -> pd.DataFrame:
+    return reducir(df, [nombres], [valores], nombres, n)
+
+
+def datos_barras(df: pd.DataFrame, x: str, ys: list, n: int) -> pd.DataFrame:
+    """Una barra por valor de ``x`` con la suma de cada serie ``ys``."""
+    return reducir(df, [x], ys, x, n)
+
+
+def datos_entradas_vs_salidas(df_group: pd.DataFrame, n: int) -> pd.DataFrame:
+    """Top ``n`` productos por entradas; el % vendido de "Otros" sale de sus totales."""
+    reducido = top_n(df_group, 'Producto', 'Entradas', n)
+    if reducido is df_group:
+        return df_group
+    reducido = agregar(reducido, ['Producto'], ['Entradas', 'Salidas', 'Total Inicial'])
+    reducido['% Vendido'] = porcentaje(reducido['Salidas'], reducido['Total Inicial'])
+    return reducido
+
+
+def muestrear(serie: pd.DataFrame, n: int) -> pd.DataFrame:
+    """Como mucho ``n`` filas equiespaciadas de la serie, con la primera y la última."""
+    if not n or len(serie) <= n:
+        return serie
+    posiciones = np.unique(np.linspace(0, len(serie) - 1, n).round().astype(int))
+    return serie.iloc[posiciones]
+
+
+def usar_webgl(puntos: int) -> bool:
+    return puntos > PUNTOS_WEBGL
+
+
+def limitar_payload(construir, n: int, max_bytes: int) -> tuple:
+    """
+    ``construir(n)`` devuelve la figura con ``n`` categorías (0 = todas).
+    Mientras el JSON supere ``max_bytes`` se reconstruye con la mitad, hasta
+    N_MINIMO; si aun así no cabe se avisa en el log y se devuelve la más
+    pequeña. ``max_bytes`` <= 0 desactiva el límite.
+
+    Devuelve ``(figura, bytes)`` con el tamaño ya medido de la figura final
+    (None si no se midió), para que la caché de figuras no la serialice otra vez.
+    """
+    fig = construir(n)
+    if not max_bytes:
+        return fig, None
+    tamano = bytes_figura(fig)
+    while tamano > max_bytes and n != N_MINIMO:
+        # Sin top N configurado se empieza a recortar por 200 categorías
+        n = max((n or 400) // 2, N_MINIMO)
+        fig = construir(n)
+        tamano = bytes_figura(fig)
+    if tamano > max_bytes:
+        logger.warning("Figura de %d bytes con %d categorías: supera el máximo de %d bytes",
+                       tamano, n, max_bytes)
+    return fig, tamano
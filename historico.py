@@ -0,0 +1,157 @@
+"""
+Stock a una fecha pasada a partir de sumas acumuladas por clave.
+
+Las patas del libro (ver analytics.descomponer_patas) se ordenan por
+(almacén, producto, lote) y fecha, y para cada clave se guardan las sumas
+acumuladas de cajas, kg e importe de cada tipo de pata. El stock de una
+clave a la fecha ``t`` es la fila acumulada de su última pata con fecha
+<= ``t``, que se localiza con una búsqueda binaria sobre la clave compuesta
+(clave, día). Así una consulta "a fecha" o una serie diaria no vuelve a
+agregar el histórico filtrado.
+
+Los movimientos sin fecha legible cuentan desde el principio, de modo que
+el stock a la última fecha coincide con analytics.calcular_stock_actual.
+"""
+import numpy as np
+import pandas as pd
+
+from analytics import (
+    _MEDIDAS, _PATAS, ESTADOS_STOCK, COLUMNAS_STOCK,
+    descomponer_patas, ordenar_stock, ordenes_libro, tabla_stock
+)
+from ingestion import COLUMNA_FECHA
+
+_CLAVES = ['almacen', 'nombre', 'lote']
+# Columnas acumuladas en el orden de la tabla ancha de agregar_movimientos
+_COLUMNAS = pd.MultiIndex.from_product([_MEDIDAS, _PATAS])
+# Máximo de consultas (clave × día) por bloque al calcular una serie
+_BLOQUE_SERIE = 2_000_000
+
+
+def _dias(fechas: pd.Series) -> np.ndarray:
+    """Días desde 1970 (int64); el valor de NaT no tiene sentido y se descarta aparte."""
+    return fechas.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+
+
+def _codigos(serie: pd.Series) -> tuple:
+    """Códigos y valores; en las categóricas del libro no hace falta factorizar."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy().astype(np.int64), serie.cat.categories
+    codigos, valores = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int64), valores
+
+
+class HistoricoStock:
+    """Índice temporal de una versión del libro (sólo lectura)."""
+
+    def __init__(self, libro: pd.DataFrame):
+        self.primera = self.ultima = None
+        self.claves = pd.DataFrame(columns=['Almacén', 'Producto', 'Lote'])
+        self._compuesto = np.empty(0, dtype=np.int64)
+        if libro.empty or COLUMNA_FECHA not in libro.columns:
+            return
+        fechas = libro[COLUMNA_FECHA]
+        if fechas.notna().sum() == 0:
+            return
+        self._ordenes = ordenes_libro(libro)
+
+        patas = descomponer_patas(libro, [COLUMNA_FECHA])
+        (alm, almacenes), (prod, productos), (lote, lotes) = (_codigos(patas[c]) for c in _CLAVES)
+        # Como en el groupby de agregar_movimientos, las claves nulas no cuentan
+        completas = (alm >= 0) & (prod >= 0) & (lote >= 0)
+        patas = patas[completas]
+        combinada = (alm[completas] * len(productos) + prod[completas]) * len(lotes) + lote[completas]
+        unicas, clave = np.unique(combinada, return_inverse=True)
+        self.claves = pd.DataFrame({
+            'Almacén': np.asarray(almacenes[unicas // (len(productos) * len(lotes))], dtype=object),
+            'Producto': np.asarray(productos[unicas // len(lotes) % len(productos)], dtype=object),
+            'Lote': np.asarray(lotes[unicas % len(lotes)], dtype=object),
+        })
+
+        # Día 0 = "sin fecha" (antes de todo); los días reales empiezan en 1
+        dias = _dias(patas[COLUMNA_FECHA])
+        con_fecha = patas[COLUMNA_FECHA].notna().to_numpy()
+        self._dia0 = int(dias[con_fecha].min()) - 1
+        self.primera = pd.Timestamp(self._dia0 + 1, unit='D')
+        self.ultima = pd.Timestamp(int(dias[con_fecha].max()), unit='D')
+        desplazado = np.where(con_fecha, dias - self._dia0, 0)
+        self._rango = int(desplazado.max()) + 1
+
+        compuesto = clave.astype(np.int64) * self._rango + desplazado
+        orden = np.argsort(compuesto, kind='stable')
+        self._compuesto = compuesto[orden]
+        self._clave = clave[orden]
+        # Primera pata de cada clave en el orden final
+        self._inicio = np.searchsorted(self._compuesto, np.arange(len(unicas), dtype=np.int64) * self._rango)
+
+        # Valores por pata: una columna por (medida, pata), cero en las demás patas
+        pata = patas['pata'].cat.codes.to_numpy()[orden]
+        valores = np.zeros((len(orden), len(_COLUMNAS)))
+        for i, medida in enumerate(_MEDIDAS):
+            columna = i * len(_PATAS) + pata
+            valores[np.arange(len(orden)), columna] = patas[medida].to_numpy(dtype=float)[orden]
+        # Suma acumulada dentro de cada clave (sin restar totales globales)
+        self._acumulado = pd.DataFrame(valores).groupby(self._clave, sort=False).cumsum().to_numpy()
+        # Las cajas enteras se devuelven enteras, como en el groupby original
+        self._enteras = {m: libro[m].dtype for m in _MEDIDAS if pd.api.types.is_integer_dtype(libro[m].dtype)}
+        signo = np.array([1, 1, -1, -1], dtype=float)
+        self._neto = {
+            medida: self._acumulado[:, i * len(_PATAS):(i + 1) * len(_PATAS)] @ signo
+            for i, medida in enumerate(['cajas', 'kg'])
+        }
+
+    @property
+    def disponible(self) -> bool:
+        return self.primera is not None
+
+    def _desplazar(self, fechas) -> np.ndarray:
+        dias = _dias(pd.Series(pd.to_datetime(np.atleast_1d(fechas))))
+        return np.clip(dias - self._dia0, 0, self._rango - 1)
+
+    def _ultima_pata(self, claves: np.ndarray, desplazados: np.ndarray) -> np.ndarray:
+        """Posición de la última pata de cada clave hasta cada día (-1 si no hay)."""
+        consulta = claves.astype(np.int64) * self._rango + desplazados
+        posicion = np.searchsorted(self._compuesto, consulta, side='right') - 1
+        return np.where(posicion >= self._inicio[claves], posicion, -1)
+
+    def stock_a_fecha(self, fecha, estados_stock: dict = ESTADOS_STOCK) -> pd.DataFrame:
+        """Tabla de stock (como calcular_stock_actual) con los movimientos hasta ``fecha``."""
+        if not self.disponible:
+            return pd.DataFrame(columns=COLUMNAS_STOCK)
+        claves = np.arange(len(self.claves))
+        posicion = self._ultima_pata(claves, np.full(len(claves), self._desplazar(fecha)[0]))
+        presentes = posicion >= 0
+        indice = pd.MultiIndex.from_arrays(
+            [self.claves.loc[presentes, c].to_numpy() for c in ('Producto', 'Lote', 'Almacén')],
+            names=['nombre', 'lote', 'almacen']
+        )
+        ancho = pd.DataFrame(self._acumulado[posicion[presentes]], index=indice, columns=_COLUMNAS)
+        for medida, tipo in self._enteras.items():
+            ancho[medida] = ancho[medida].round().astype(tipo)
+        return ordenar_stock(tabla_stock(ancho, estados_stock), *self._ordenes).round(2)
+
+    def seleccion(self, filtros: dict = None) -> np.ndarray:
+        """Claves que cumplen los filtros ({'Almacén': [...], 'Producto': [...], 'Lote': [...]})."""
+        marca = np.ones(len(self.claves), dtype=bool)
+        for dim, valores in (filtros or {}).items():
+            if valores and dim in self.claves.columns:
+                marca &= self.claves[dim].isin(valores).to_numpy()
+        return np.flatnonzero(marca)
+
+    def serie(self, desde=None, hasta=None, filtros: dict = None) -> pd.DataFrame:
+        """Stock total (cajas y kg) de las claves filtradas al final de cada día."""
+        if not self.disponible:
+            return pd.DataFrame(columns=['Fecha', 'Stock', 'Kg Total'])
+        dias = pd.date_range(desde or self.primera, hasta or self.ultima, freq='D')
+        desplazados = self._desplazar(dias)
+        claves = self.seleccion(filtros)
+        stock = np.zeros(len(dias))
+        kg = np.zeros(len(dias))
+        paso = max(1, _BLOQUE_SERIE // max(len(dias), 1))
+        for inicio in range(0, len(claves), paso):
+            bloque = claves[inicio:inicio + paso]
+            posicion = self._ultima_pata(bloque[:, None], desplazados[None, :])
+            hay = posicion >= 0
+            stock += np.where(hay, self._neto['cajas'][posicion], 0).sum(axis=0)
+            kg += np.where(hay, self._neto['kg'][posicion], 0).sum(axis=0)
+        return pd.DataFrame({'Fecha': dias, 'Stock': stock.round(2), 'Kg Total': kg.round(2)})
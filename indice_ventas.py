@@ -0,0 +1,176 @@
+"""
+Índice de ventas para los desgloses de la vista de ventas sin recorrer
+todas las filas en cada rerun.
+
+Se construye una vez por versión de los datos a partir de las ventas
+válidas. Para cada dimensión (cliente, producto, lote y vendedor) las filas
+se ordenan por valor de forma estable y se guardan los desplazamientos de
+inicio de cada grupo: las filas de un valor son un tramo contiguo de esa
+ordenación, ya en su orden original. Junto a ellos se guardan las sumas de
+cajas, kg e importe de cada grupo y las tablas agrupadas de la vista.
+
+Una combinación de filtros se resuelve uniendo los tramos de los valores
+elegidos en cada dimensión e intersectando las dimensiones, como en el cubo
+de stock.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import analytics
+
+DIMENSIONES = ['cliente', 'nombre', 'lote', 'vendedor']
+_MEDIDAS = ['cajas', 'kg', 'precio total']
+
+
+class IndiceVentas:
+    """Ventas válidas de una versión del libro con sus índices (sólo lectura)."""
+
+    def __init__(self, ventas: pd.DataFrame, max_selecciones: int = 128):
+        self.ventas = ventas
+        self.filas = len(ventas)
+        self.metricas = analytics.metricas_ventas(ventas)
+        self.total_ventas = self.metricas["Total Ventas"]
+
+        # Misma ordenación que analytics.detalle_ventas, guardando la permutación
+        # para llevar una selección de filas de ventas a posiciones del detalle
+        orden = ventas[['cliente', 'nombre']].reset_index(drop=True).sort_values(['cliente', 'nombre']).index.to_numpy()
+        self.detalle = ventas[analytics.COLUMNAS_DETALLE_VENTAS].iloc[orden]
+        self._en_detalle = np.empty(self.filas, dtype=np.intp)
+        self._en_detalle[orden] = np.arange(self.filas)
+
+        # Las sumas de pandas omiten los nulos
+        medidas = np.nan_to_num(ventas[_MEDIDAS].to_numpy(dtype=float))
+        self._valores = {}
+        self._posicion = {}
+        self._orden = {}
+        self._inicios = {}
+        self._sumas = {}
+        for dim in DIMENSIONES:
+            codigos, valores = self._factorizar(ventas[dim])
+            self._valores[dim] = valores
+            self._posicion[dim] = {v: i for i, v in enumerate(valores)}
+            # Filas agrupadas por valor; el tramo de cada valor conserva el orden original
+            validas = codigos >= 0
+            orden = np.flatnonzero(validas)[np.argsort(codigos[validas], kind='stable')]
+            conteo = np.bincount(codigos[validas], minlength=len(valores))
+            self._orden[dim] = orden
+            self._inicios[dim] = np.concatenate([[0], np.cumsum(conteo)])
+            self._sumas[dim] = pd.DataFrame({
+                col: np.bincount(codigos[validas], weights=medidas[validas, j], minlength=len(valores))
+                for j, col in enumerate(_MEDIDAS)
+            }, index=pd.Index(valores, dtype=object, name=dim))
+
+        self._agrupados = {}
+        self.max_selecciones = max_selecciones
+        self._selecciones = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _factorizar(serie: pd.Series) -> tuple:
+        """Códigos por fila (-1 si es nulo) y valores en el orden de sorted()."""
+        codigos, unicos = pd.factorize(serie)
+        unicos = np.asarray(unicos, dtype=object)
+        orden = sorted(range(len(unicos)), key=unicos.__getitem__)
+        nuevo = np.empty(len(unicos) + 1, dtype=np.intp)
+        nuevo[orden] = np.arange(len(unicos))
+        nuevo[-1] = -1
+        return nuevo[codigos], list(unicos[orden])
+
+    # -------------------------------------------------------------------------
+    #        Grupos
+    # -------------------------------------------------------------------------
+    def opciones(self, dim: str) -> list:
+        """Valores de la dimensión en orden (como sorted(ventas[dim].dropna().unique()))."""
+        return list(self._valores[dim])
+
+    def posiciones(self, dim: str, valor) -> np.ndarray:
+        """Posiciones (ordenadas) de las ventas con ``dim == valor``."""
+        codigo = self._posicion[dim].get(valor)
+        if codigo is None:
+            return np.empty(0, dtype=np.intp)
+        inicios = self._inicios[dim]
+        return self._orden[dim][inicios[codigo]:inicios[codigo + 1]]
+
+    def grupo(self, dim: str, valor) -> pd.DataFrame:
+        """Igual que ventas[ventas[dim] == valor]."""
+        return self.ventas.iloc[self.posiciones(dim, valor)]
+
+    def sumas(self, dim: str) -> pd.DataFrame:
+        """Cajas, kg e importe de cada valor de la dimensión (sin redondear)."""
+        return self._sumas[dim]
+
+    def metricas_cliente(self, cliente) -> dict:
+        """Como analytics.metricas_cliente, leyendo las sumas del cliente."""
+        if cliente not in self._posicion['cliente']:
+            return analytics.metricas_compras(0, 0, self.total_ventas)
+        fila = self._sumas['cliente'].loc[cliente]
+        return analytics.metricas_compras(fila['precio total'], fila['kg'], self.total_ventas)
+
+    def agrupado(self, claves) -> pd.DataFrame:
+        """analytics.ventas_agrupadas sobre todas las ventas; se calcula una vez por ``claves``."""
+        clave = tuple(claves) if isinstance(claves, list) else claves
+        with self._lock:
+            agrupado = self._agrupados.get(clave)
+        if agrupado is None:
+            agrupado = analytics.ventas_agrupadas(self.ventas, claves, self.total_ventas)
+            with self._lock:
+                agrupado = self._agrupados.setdefault(clave, agrupado)
+        return agrupado
+
+    # -------------------------------------------------------------------------
+    #        Filtros
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def clave_filtros(filtros: dict) -> tuple:
+        return tuple(
+            (dim, tuple(sorted(map(str, filtros[dim]))))
+            for dim in DIMENSIONES if filtros.get(dim)
+        )
+
+    def _posiciones_dimension(self, dim: str, valores) -> np.ndarray:
+        tramos = [self.posiciones(dim, v) for v in dict.fromkeys(valores)]
+        tramos = [t for t in tramos if len(t)]
+        if not tramos:
+            return np.empty(0, dtype=np.intp)
+        if len(tramos) == 1:
+            return tramos[0]
+        # Los tramos de una misma dimensión son disjuntos: basta con ordenar
+        return np.sort(np.concatenate(tramos))
+
+    def seleccion(self, filtros: dict = None) -> np.ndarray:
+        """Posiciones (ordenadas) de las ventas que cumplen todos los filtros."""
+        filtros = filtros or {}
+        clave = self.clave_filtros(filtros)
+        with self._lock:
+            if clave in self._selecciones:
+                self._selecciones.move_to_end(clave)
+                return self._selecciones[clave]
+
+        if not clave:
+            posiciones = np.arange(self.filas)
+        else:
+            por_dimension = sorted(
+                (self._posiciones_dimension(dim, filtros[dim]) for dim, _ in clave), key=len
+            )
+            posiciones = por_dimension[0]
+            for otras in por_dimension[1:]:
+                if not len(posiciones):
+                    break
+                posiciones = np.intersect1d(posiciones, otras, assume_unique=True)
+        posiciones.setflags(write=False)
+
+        with self._lock:
+            self._selecciones[clave] = posiciones
+            while len(self._selecciones) > self.max_selecciones:
+                self._selecciones.popitem(last=False)
+        return posiciones
+
+    def filtrar_detalle(self, filtros: dict = None) -> pd.DataFrame:
+        """Igual que analytics.filtrar_ventas: detalle filtrado, ordenado por cliente y producto."""
+        posiciones = self.seleccion(filtros)
+        if len(posiciones) == self.filas:
+            return self.detalle
+        return self.detalle.iloc[np.sort(self._en_detalle[posiciones])]
@@ -0,0 +1,118 @@
+"""
+Calcula las tablas del dashboard sin Streamlit a partir de un libro de
+movimientos y las escribe en una carpeta (una tabla por fichero):
+
+    python informe.py datos/Carnes.csv --salida informe/
+    python informe.py sqlite:libro.db --rango Carnes --formato parquet
+    python informe.py http://127.0.0.1:8765 --rango 'Carnes!A1:L' --spreadsheet-id ID
+    python informe.py sheets --rango 'Carnes!A1:L' --spreadsheet-id ID --credenciales cuenta.json
+
+Tablas: stock, ventas_producto, ventas_cliente, almacenes y
+entradas_vs_salidas; las métricas generales y de ventas van en metricas.json.
+"""
+import argparse
+import json
+import os
+
+import pandas as pd
+
+import analytics
+import ingestion
+from data_sources import crear_fuente
+
+_EXTENSIONES = {'.csv': 'csv', '.parquet': 'parquet', '.db': 'sqlite', '.sqlite': 'sqlite'}
+
+
+def _uri(ruta: str) -> str:
+    """Admite también rutas de fichero sin prefijo (el tipo sale de la extensión)."""
+    tipo = _EXTENSIONES.get(os.path.splitext(ruta)[1].lower())
+    if tipo and os.path.exists(ruta):
+        return f"{tipo}:{ruta}"
+    return ruta
+
+
+def leer_libro(uri: str, rango: str = None, spreadsheet_id: str = '',
+               credenciales: dict = None) -> pd.DataFrame:
+    """Lee y tipa el libro; sin ``rango`` se usa la primera hoja completa."""
+    fuente = crear_fuente(_uri(uri), spreadsheet_id, credenciales)
+    if rango is None:
+        if not hasattr(fuente, 'hojas'):
+            raise ValueError("Indique --rango para esta fuente")
+        rango = fuente.hojas()[0]
+    df = fuente.leer(rango)
+    faltantes = ingestion.columnas_faltantes(df)
+    if faltantes:
+        raise ValueError(f"Faltan columnas requeridas: {faltantes}")
+    return ingestion.preparar_libro(df)
+
+
+def calcular_informe(libro: pd.DataFrame, estados_stock: dict = analytics.ESTADOS_STOCK) -> dict:
+    """Todas las tablas del informe; la clave 'metricas' es un diccionario."""
+    stock_df = analytics.calcular_stock_actual(libro, estados_stock)
+    ventas = analytics.ventas_validas(libro)
+    metricas_ventas = analytics.metricas_ventas(ventas)
+    total_ventas = metricas_ventas["Total Ventas"]
+    return {
+        'stock': stock_df,
+        'ventas_producto': analytics.ventas_agrupadas(ventas, ['nombre', 'lote'], total_ventas).reset_index(),
+        'ventas_cliente': analytics.ventas_agrupadas(ventas, 'cliente', total_ventas).reset_index(),
+        'almacenes': analytics.resumen_almacenes(stock_df),
+        'entradas_vs_salidas': analytics.entradas_vs_salidas(stock_df),
+        'metricas': {
+            'generales': analytics.calcular_metricas_generales(stock_df),
+            'ventas': metricas_ventas,
+            'filas_libro': len(libro),
+            'huella': analytics.huella_dataframe(libro),
+        },
+    }
+
+
+def _json_escalar(valor):
+    return valor.item() if hasattr(valor, 'item') else valor
+
+
+def escribir_informe(informe: dict, carpeta: str, formato: str = 'csv') -> list:
+    """Escribe cada tabla en ``carpeta`` y devuelve las rutas creadas."""
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = []
+    for nombre, valor in informe.items():
+        if nombre == 'metricas':
+            ruta = os.path.join(carpeta, 'metricas.json')
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(valor, f, ensure_ascii=False, indent=2, default=_json_escalar)
+        elif formato == 'csv':
+            ruta = os.path.join(carpeta, f"{nombre}.csv")
+            valor.to_csv(ruta, index=False)
+        elif formato == 'parquet':
+            ruta = os.path.join(carpeta, f"{nombre}.parquet")
+            valor.to_parquet(ruta, index=False)
+        elif formato == 'json':
+            ruta = os.path.join(carpeta, f"{nombre}.json")
+            valor.to_json(ruta, orient='records', force_ascii=False)
+        else:
+            raise ValueError(f"Formato desconocido: {formato}")
+        rutas.append(ruta)
+    return rutas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Informe de inventario desde un libro de movimientos")
+    parser.add_argument("fuente", help="fichero .csv/.parquet/.db o URI de data_sources")
+    parser.add_argument("--rango", help="rango A1 u hoja (por defecto la primera hoja completa)")
+    parser.add_argument("--spreadsheet-id", default='', help="id de la hoja (fuentes sheets y http://)")
+    parser.add_argument("--credenciales", help="JSON de la cuenta de servicio (fuente sheets)")
+    parser.add_argument("--salida", default="informe")
+    parser.add_argument("--formato", choices=['csv', 'parquet', 'json'], default='csv')
+    args = parser.parse_args()
+
+    credenciales = None
+    if args.credenciales:
+        with open(args.credenciales, encoding='utf-8') as f:
+            credenciales = json.load(f)
+    libro = leer_libro(args.fuente, args.rango, args.spreadsheet_id, credenciales)
+    for ruta in escribir_informe(calcular_informe(libro), args.salida, args.formato):
+        print(ruta)
+
+
+if __name__ == '__main__':
+    main()
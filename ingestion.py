@@ -0,0 +1,174 @@
+"""
+Ingesta tipada del libro de movimientos.
+
+Convierte el DataFrame de texto que devuelve Sheets en un libro compacto:
+columnas de texto como categóricas (almacen y almacen actual comparten
+diccionario), limpieza aplicada sólo sobre los valores únicos, columnas
+numéricas enteras reducidas a int32 y, si existe, 'fecha' como datetime.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNAS_REQUERIDAS = [
+    'nombre', 'lote', 'movimiento', 'almacen',
+    'almacen actual', 'cajas', 'kg', 'precio', 'precio total'
+]
+COLUMNAS_NUMERICAS = ['cajas', 'kg', 'precio', 'precio total']
+COLUMNAS_CATEGORICAS = ['nombre', 'lote', 'movimiento', 'cliente', 'vendedor']
+COLUMNAS_ALMACEN = ['almacen', 'almacen actual']
+# Opcional: sin ella no hay stock histórico
+COLUMNA_FECHA = 'fecha'
+# Añadida al combinar varias hojas: la hoja de origen de cada fila
+COLUMNA_CATEGORIA = 'categoria'
+
+
+def columnas_faltantes(df: pd.DataFrame) -> list:
+    return [c for c in COLUMNAS_REQUERIDAS if c not in df.columns]
+
+
+def _limpiar_numerica(serie: pd.Series) -> pd.Series:
+    """
+    Equivale a reemplazar '', 'E', '#VALUE!' y '#N/A' por '0' y convertir:
+    cualquier texto no numérico acaba en 0. Si todos los valores son enteros
+    y caben se guardan en int32 (int8/int16 desbordarían en restas y sumas
+    acumuladas); los decimales se quedan en float64 porque sumar en float32
+    alteraría los totales de kg e importes.
+    """
+    valores = pd.to_numeric(serie, errors='coerce').fillna(0).astype('float64')
+    arr = valores.to_numpy()
+    limite = np.iinfo(np.int32)
+    if (len(arr) and np.all(np.isfinite(arr)) and np.all(arr == np.round(arr))
+            and arr.min() >= limite.min and arr.max() <= limite.max):
+        return valores.astype('int32')
+    return valores
+
+
+def _categorica(serie: pd.Series, limpiar=None, categorias=None) -> pd.Series:
+    """
+    Codifica ``serie`` como categórica. ``limpiar`` se aplica sólo a los
+    valores únicos (y al nulo); los valores que colisionan tras limpiar se
+    fusionan.
+    """
+    codigos, unicos = pd.factorize(serie)
+    # El nulo se añade al final para que también pase por ``limpiar``
+    unicos = pd.Series(list(unicos) + [np.nan], dtype=object)
+    if limpiar is not None:
+        unicos = limpiar(unicos)
+    valores = unicos.to_numpy()
+    if categorias is None:
+        categorias = pd.Index(pd.unique(valores[pd.notna(valores)])).sort_values()
+    # Código de cada valor único en las categorías finales (-1 = nulo)
+    destino = categorias.get_indexer(valores)
+    codigos_finales = destino[codigos]
+    return pd.Series(
+        pd.Categorical.from_codes(codigos_finales, categories=categorias),
+        index=serie.index, name=serie.name
+    )
+
+
+def _limpiar_movimiento(unicos: pd.Series) -> pd.Series:
+    return unicos.str.upper().fillna('')
+
+
+def _limpiar_almacen(unicos: pd.Series) -> pd.Series:
+    return unicos.str.strip().fillna('')
+
+
+def _limpiar_fecha(serie: pd.Series) -> pd.Series:
+    """
+    Fechas de la hoja (dd/mm/aaaa); lo que no tenga ese formato se intenta
+    como ISO y lo ilegible queda en NaT. Se convierte sólo cada valor único.
+    """
+    codigos, unicos = pd.factorize(serie)
+    unicos = pd.Series(unicos, dtype=object)
+    fechas = pd.to_datetime(unicos, format='%d/%m/%Y', errors='coerce')
+    resto = fechas.isna() & unicos.notna()
+    if resto.any():
+        fechas[resto] = pd.to_datetime(unicos[resto], format='mixed', errors='coerce')
+    valores = np.append(fechas.to_numpy(dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return pd.Series(valores[codigos], index=serie.index, name=serie.name)
+
+
+def memoria(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def preparar_libro(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Devuelve una copia tipada del libro. ``attrs['memoria']`` guarda los bytes
+    antes y después de la conversión.
+    """
+    antes = memoria(df)
+    tipado = df.copy()
+
+    for col in COLUMNAS_NUMERICAS:
+        tipado[col] = _limpiar_numerica(df[col])
+
+    if COLUMNA_FECHA in df.columns:
+        tipado[COLUMNA_FECHA] = _limpiar_fecha(df[COLUMNA_FECHA])
+
+    tipado['movimiento'] = _categorica(df['movimiento'], _limpiar_movimiento)
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns and col != 'movimiento':
+            tipado[col] = _categorica(df[col])
+
+    # Diccionario común para ambos almacenes: las comparaciones y uniones
+    # entre 'almacen' y 'almacen actual' se resuelven con los códigos.
+    limpios = {col: _limpiar_almacen(pd.Series(df[col].unique(), dtype=object)) for col in COLUMNAS_ALMACEN}
+    categorias = pd.Index(pd.unique(pd.concat(limpios.values()).to_numpy())).sort_values()
+    for col in COLUMNAS_ALMACEN:
+        tipado[col] = _categorica(df[col], _limpiar_almacen, categorias)
+
+    tipado.attrs['memoria'] = {'antes': antes, 'despues': memoria(tipado)}
+    return tipado
+
+
+def _columna_vacia(filas: int, dtype) -> pd.Series:
+    """Columna opcional ausente en una hoja: todo nulo con el tipo de las demás."""
+    return pd.Series([None] * filas, dtype=dtype)
+
+
+def combinar_libros(libros: dict) -> pd.DataFrame:
+    """
+    Concatena libros tipados ({categoría: libro}) en uno solo con la columna
+    'categoria'. Las categóricas se recodifican a la unión ordenada de los
+    diccionarios (almacen y almacen actual siguen compartiendo el suyo), de
+    modo que el resultado es igual de compacto que cada parte.
+    """
+    partes = list(libros.values())
+    columnas = list(dict.fromkeys(c for parte in partes for c in parte.columns))
+    tipos = {}
+    for parte in partes:
+        for col in parte.columns:
+            tipos.setdefault(col, parte[col].dtype)
+
+    diccionarios = {}
+    for col in columnas:
+        if not isinstance(tipos[col], pd.CategoricalDtype):
+            continue
+        grupo = COLUMNAS_ALMACEN if col in COLUMNAS_ALMACEN else [col]
+        valores = [parte[c].cat.categories for parte in partes for c in grupo if c in parte.columns]
+        diccionarios[col] = pd.Index(pd.unique(np.concatenate([v.to_numpy(dtype=object) for v in valores]))).sort_values()
+
+    recodificadas = []
+    for parte in partes:
+        nuevas = {}
+        for col in columnas:
+            if col not in parte.columns:
+                nuevas[col] = (
+                    pd.Series(pd.Categorical.from_codes(np.full(len(parte), -1), categories=diccionarios[col]))
+                    if col in diccionarios else _columna_vacia(len(parte), tipos[col])
+                )
+            elif col in diccionarios:
+                nuevas[col] = parte[col].cat.set_categories(diccionarios[col]).reset_index(drop=True)
+            else:
+                nuevas[col] = parte[col].reset_index(drop=True)
+        recodificadas.append(pd.DataFrame(nuevas, columns=columnas))
+
+    libro = pd.concat(recodificadas, ignore_index=True)
+    libro[COLUMNA_CATEGORIA] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(partes)), [len(p) for p in partes]), categories=list(libros)
+    )
+    antes = sum(p.attrs.get('memoria', {}).get('antes', 0) for p in partes)
+    libro.attrs['memoria'] = {'antes': antes, 'despues': memoria(libro)}
+    return libro
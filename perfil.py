@@ -0,0 +1,159 @@
+"""
+Trazas de rendimiento por rerun del dashboard.
+
+Cada etapa medida es un evento completo del formato Chrome trace
+(``ph: 'X'``, tiempos en microsegundos desde epoch) y se guarda como una
+línea JSON, de modo que las trazas de varias sesiones y procesos se pueden
+concatenar sin más. Para abrirlas en chrome://tracing o Perfetto, o para
+obtener percentiles por etapa:
+
+    python perfil.py traza.jsonl --chrome traza.json
+    python perfil.py traza.jsonl
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import plotly.io as pio
+
+_LOCKS_FICHERO = {}
+_LOCK_GLOBAL = threading.Lock()
+
+
+def _lock_fichero(ruta: str) -> threading.Lock:
+    with _LOCK_GLOBAL:
+        return _LOCKS_FICHERO.setdefault(os.path.abspath(ruta), threading.Lock())
+
+
+def bytes_figura(fig) -> int:
+    """Tamaño del JSON que Streamlit envía al navegador para una figura Plotly."""
+    return len(pio.to_json(fig, validate=False))
+
+
+def bytes_tabla(df: pd.DataFrame) -> int:
+    """Tamaño aproximado del payload Arrow de st.dataframe."""
+    tabla = pa.Table.from_pandas(df)
+    destino = io.BytesIO()
+    with pa.ipc.new_stream(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+    return destino.tell()
+
+
+class Traza:
+    """
+    Eventos de un rerun. Inactiva, ``etapa`` no mide nada y su coste es
+    despreciable; los tamaños de payload sólo se calculan si está activa.
+    """
+
+    def __init__(self, activa: bool = False, sesion: str = '', rerun: int = 0):
+        self.activa = activa
+        self.sesion = sesion
+        self.rerun = rerun
+        self.eventos = []
+        self._profundidad = 0
+        self._epoch = time.time()
+        self._origen = time.perf_counter()
+
+    def _registrar(self, nombre: str, categoria: str, inicio: float, duracion: float, args: dict):
+        self.eventos.append({
+            'name': nombre,
+            'cat': categoria,
+            'ph': 'X',
+            'ts': round((self._epoch + inicio - self._origen) * 1e6),
+            'dur': round(duracion * 1e6),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': {'sesion': self.sesion, 'rerun': self.rerun,
+                     'profundidad': self._profundidad, **args},
+        })
+
+    @contextmanager
+    def etapa(self, nombre: str, categoria: str = 'etapa', **args):
+        """Mide el bloque ``with``; ``args`` puede ampliarse dentro del bloque."""
+        if not self.activa:
+            yield args
+            return
+        inicio = time.perf_counter()
+        self._profundidad += 1
+        try:
+            yield args
+        finally:
+            self._profundidad -= 1
+            self._registrar(nombre, categoria, inicio, time.perf_counter() - inicio, args)
+
+    def resumen(self) -> pd.DataFrame:
+        """Etapas en orden de inicio, sangradas según su anidamiento."""
+        filas = [
+            {
+                'Etapa': '  ' * e['args']['profundidad'] + e['name'],
+                'ms': e['dur'] / 1000,
+                'KB': e['args']['bytes'] / 1024 if 'bytes' in e['args'] else None,
+            }
+            for e in sorted(self.eventos, key=lambda e: (e['ts'], e['args']['profundidad']))
+        ]
+        return pd.DataFrame(filas, columns=['Etapa', 'ms', 'KB'])
+
+    def escribir(self, ruta: str):
+        """Añade los eventos del rerun al fichero JSON lines ``ruta``."""
+        if not self.eventos or not ruta:
+            return
+        lineas = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in self.eventos)
+        with _lock_fichero(ruta):
+            with open(ruta, 'a', encoding='utf-8') as f:
+                f.write(lineas)
+
+
+# -----------------------------------------------------------------------------
+#        Agregación de trazas
+# -----------------------------------------------------------------------------
+def leer_traza(ruta: str) -> list:
+    with open(ruta, encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def a_chrome_trace(eventos: list) -> dict:
+    return {'traceEvents': eventos, 'displayTimeUnit': 'ms'}
+
+
+def resumen_etapas(eventos: list) -> pd.DataFrame:
+    """Percentiles de duración (ms) y tamaño medio de payload por etapa."""
+    if not eventos:
+        return pd.DataFrame()
+    df = pd.DataFrame({
+        'etapa': [e['name'] for e in eventos],
+        'categoria': [e.get('cat', '') for e in eventos],
+        'ms': [e['dur'] / 1000 for e in eventos],
+        'bytes': [e.get('args', {}).get('bytes') for e in eventos],
+    })
+    grupos = df.groupby(['categoria', 'etapa'])
+    return pd.DataFrame({
+        'n': grupos.size(),
+        'p50_ms': grupos['ms'].quantile(0.5),
+        'p95_ms': grupos['ms'].quantile(0.95),
+        'max_ms': grupos['ms'].max(),
+        'bytes_medio': grupos['bytes'].mean(),
+    }).round(2).sort_values('p95_ms', ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrega trazas de rendimiento del dashboard")
+    parser.add_argument("trazas", nargs='+', help="ficheros JSON lines")
+    parser.add_argument("--chrome", help="escribe un fichero Chrome trace con todos los eventos")
+    args = parser.parse_args()
+
+    eventos = [e for ruta in args.trazas for e in leer_traza(ruta)]
+    if args.chrome:
+        with open(args.chrome, 'w', encoding='utf-8') as f:
+            json.dump(a_chrome_trace(eventos), f)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(resumen_etapas(eventos))
+
+
+if __name__ == '__main__':
+    main()
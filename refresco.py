@@ -0,0 +1,121 @@
+"""
+Refresco periódico de los datos fuera del camino de las peticiones.
+
+Un hilo de proceso llama a ``preparar()`` cada ``intervalo`` segundos y, si
+termina bien, sustituye de golpe la publicación vigente. Las sesiones
+leen siempre la última publicación completa sin esperar: la referencia se
+cambia bajo un lock y cada publicación es inmutable, de modo que un rerun
+que la tomó al empezar la ve entera aunque se publique otra a mitad.
+
+Si un refresco falla se conserva la publicación anterior, se guarda el
+error y se reintenta antes (``reintento``) que en el ciclo normal. La
+espera por la primera publicación está acotada (``espera``): si la primera
+carga se atasca, las sesiones reciben None en lugar de quedarse colgadas.
+"""
+import threading
+import time
+from collections import namedtuple
+
+# datos: lo que devuelve preparar(); terminado_en: time.time() al publicarla
+Publicacion = namedtuple('Publicacion', ['datos', 'huella', 'terminado_en', 'duracion'])
+
+
+class Refrescador:
+    def __init__(self, preparar, intervalo: float, reintento: float = 30, espera: float = 120):
+        """
+        ``preparar(anterior, forzar)`` recibe la publicación vigente (o None)
+        y devuelve ``(datos, huella)``; ``forzar`` es False en el primer ciclo,
+        que puede servirse de una copia local. ``espera`` son los segundos que
+        ``actual()`` aguarda como máximo a la primera publicación.
+        """
+        self._preparar = preparar
+        self.intervalo = intervalo
+        self.reintento = min(reintento, intervalo)
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._en_curso = threading.Lock()
+        self._despertar = threading.Event()
+        self._primera = threading.Event()
+        self._hilo = None
+        self._actual = None
+        self.refrescos = 0
+        self.errores = 0
+        self.ultimo_error = None
+        # Fin del último intento, bueno o malo
+        self.ultimo_intento = None
+        # Hora prevista del siguiente ciclo del hilo de fondo
+        self.proximo = None
+
+    def iniciar(self) -> 'Refrescador':
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name='refresco', daemon=True)
+                self._hilo.start()
+        return self
+
+    def actual(self, espera: float = None):
+        """
+        Última publicación. Sólo antes de la primera se espera, hasta
+        ``espera`` segundos (por defecto ``self.espera``); devuelve None si
+        falló o si aún no ha terminado (ver ``primera_terminada``).
+        """
+        if not self._primera.is_set():
+            self._primera.wait(self.espera if espera is None else espera)
+        with self._lock:
+            return self._actual
+
+    @property
+    def primera_terminada(self) -> bool:
+        """True en cuanto termina el primer intento, bueno o malo."""
+        return self._primera.is_set()
+
+    def refrescar(self, forzar: bool = True):
+        """Refresca ya, en el hilo que llama; devuelve la publicación vigente."""
+        with self._en_curso:
+            with self._lock:
+                anterior = self._actual
+            inicio = time.perf_counter()
+            try:
+                datos, huella = self._preparar(anterior, forzar)
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                    self.ultimo_error = str(e) or type(e).__name__
+                return anterior
+            finally:
+                self.ultimo_intento = time.time()
+                self._primera.set()
+            publicacion = Publicacion(datos, huella, time.time(), time.perf_counter() - inicio)
+            with self._lock:
+                self._actual = publicacion
+                self.refrescos += 1
+                self.ultimo_error = None
+            return publicacion
+
+    def solicitar(self):
+        """Adelanta el próximo ciclo del hilo de fondo."""
+        self._despertar.set()
+
+    def estado(self) -> dict:
+        with self._lock:
+            actual = self._actual
+            return {
+                'ultimo_exito': actual.terminado_en if actual else None,
+                'duracion': actual.duracion if actual else None,
+                'refrescos': self.refrescos,
+                'errores': self.errores,
+                'ultimo_error': self.ultimo_error,
+                'refrescando': self._en_curso.locked(),
+                'proximo': self.proximo,
+            }
+
+    def _bucle(self):
+        forzar = False
+        while True:
+            self.refrescar(forzar)
+            # El primer ciclo pudo servirse de una copia local: el segundo llega antes
+            espera = self.reintento if self.ultimo_error or not forzar else self.intervalo
+            forzar = True
+            self.proximo = time.time() + espera
+            self._despertar.wait(espera)
+            self._despertar.clear()
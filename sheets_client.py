@@ -0,0 +1,102 @@
+"""
+Pool de clientes de la API de Google Sheets compartido por todo el proceso.
+También presta clientes de Drive v3, que sólo se usan para leer la versión
+del fichero (ver FuenteGoogleSheets.firma).
+
+- El documento de descubrimiento estático se parsea una sola vez.
+- Las credenciales de cada cuenta de servicio se crean una vez y se reutilizan
+  (el token se renueva sólo cuando caduca).
+- Cada cliente lleva su propia conexión HTTP persistente (httplib2 no es
+  thread-safe); los clientes se prestan a un hilo y se devuelven al pool, de
+  modo que las conexiones sobreviven entre descargas y reruns.
+"""
+import json
+import threading
+from contextlib import contextmanager
+
+import google_auth_httplib2
+import httplib2
+from google.oauth2 import service_account
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets.readonly",
+    "https://www.googleapis.com/auth/drive.metadata.readonly",
+]
+SHEETS = ("sheets", "v4")
+DRIVE = ("drive", "v3")
+
+
+class PoolClientesSheets:
+    def __init__(self, max_libres: int = 16, timeout: float = 120):
+        self.max_libres = max_libres
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._documentos = {}
+        self._credenciales = {}
+        self._libres = {}
+        self.creados = 0
+        self.reutilizados = 0
+
+    def _documento_descubrimiento(self, api: tuple) -> dict:
+        with self._lock:
+            if api not in self._documentos:
+                self._documentos[api] = json.loads(discovery_cache.get_static_doc(*api))
+            return self._documentos[api]
+
+    @staticmethod
+    def _clave(credenciales: dict, api_endpoint: str) -> tuple:
+        if api_endpoint:
+            return ('endpoint', api_endpoint)
+        return ('cuenta', credenciales.get('client_email'), credenciales.get('private_key_id'))
+
+    def _credenciales_para(self, clave: tuple, credenciales: dict):
+        with self._lock:
+            if clave not in self._credenciales:
+                self._credenciales[clave] = service_account.Credentials.from_service_account_info(
+                    credenciales, scopes=SCOPES
+                )
+            return self._credenciales[clave]
+
+    def _crear(self, clave: tuple, credenciales: dict, api_endpoint: str, api: tuple):
+        http = httplib2.Http(timeout=self.timeout)
+        opciones = None
+        if api_endpoint:
+            opciones = {"api_endpoint": api_endpoint}
+        else:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self._credenciales_para(clave, credenciales), http=http
+            )
+        servicio = build_from_document(
+            self._documento_descubrimiento(api), http=http, client_options=opciones
+        )
+        with self._lock:
+            self.creados += 1
+        return servicio
+
+    @contextmanager
+    def cliente(self, credenciales: dict = None, api_endpoint: str = None, api: tuple = SHEETS):
+        """Presta un servicio (por defecto 'sheets' v4) al hilo actual durante el bloque ``with``."""
+        clave = self._clave(credenciales, api_endpoint)
+        with self._lock:
+            libres = self._libres.setdefault((api, clave), [])
+            servicio = libres.pop() if libres else None
+            if servicio is not None:
+                self.reutilizados += 1
+        if servicio is None:
+            servicio = self._crear(clave, credenciales, api_endpoint, api)
+        try:
+            yield servicio
+        finally:
+            with self._lock:
+                if len(libres) < self.max_libres:
+                    libres.append(servicio)
+
+
+_POOL = PoolClientesSheets()
+
+
+def obtener_pool() -> PoolClientesSheets:
+    """Pool único del proceso."""
+    return _POOL
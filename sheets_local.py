@@ -0,0 +1,186 @@
+"""
+Servidor HTTP local que imita la API de Google Sheets v4 (values.get,
+values:batchGet y spreadsheets.get con las propiedades de cada hoja) a partir
+de una fuente local (CSV, Parquet o SQLite). También responde a files.get de
+Drive v3 con la versión y la fecha de modificación, que avanzan cuando
+cambia algún fichero de la fuente.
+
+Permite ejecutar el dashboard y las pruebas de carga sin red ni credenciales:
+
+    python sheets_local.py csv:datos/ --puerto 8765
+    INVENTARIO_FUENTE=http://127.0.0.1:8765 streamlit run dashboard.py
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from data_sources import _FuenteTabular, crear_fuente
+
+
+class _TablasEnMemoria(_FuenteTabular):
+    """
+    Lee cada hoja de la fuente una sola vez y la vuelve a leer si cambia su
+    firma (fecha y tamaño del fichero); ``olvidar`` fuerza la relectura.
+    """
+
+    def __init__(self, fuente: _FuenteTabular):
+        self.fuente = fuente
+        self._tablas = {}
+        self._lock = threading.Lock()
+        self._firmas = None
+        self._version = 0
+        self._modificado = time.time()
+
+    def tabla(self, hoja: str):
+        firma = self.fuente.firma_hoja(hoja)
+        with self._lock:
+            guardada = self._tablas.get(hoja)
+            if guardada is None or (firma is not None and firma != guardada[0]):
+                guardada = self._tablas[hoja] = (firma, self.fuente.tabla(hoja))
+            return guardada[1]
+
+    def hojas(self) -> list:
+        return self.fuente.hojas()
+
+    def firma_hoja(self, hoja: str):
+        return self.fuente.firma_hoja(hoja)
+
+    def revision(self) -> tuple:
+        """(versión, modificado_en) del conjunto de hojas, como los metadatos de Drive."""
+        firmas = tuple(self.fuente.firma_hoja(h) for h in self.hojas())
+        with self._lock:
+            if firmas != self._firmas:
+                if self._firmas is not None:
+                    self._version += 1
+                    self._modificado = time.time()
+                self._firmas = firmas
+            return self._version, self._modificado
+
+    def olvidar(self):
+        with self._lock:
+            self._tablas.clear()
+            self._firmas = None
+            self._version += 1
+            self._modificado = time.time()
+
+
+class _ManejadorSheets(BaseHTTPRequestHandler):
+    fuente = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, codigo: int, cuerpo: dict):
+        datos = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _value_range(self, range_name: str) -> dict:
+        return {
+            'range': range_name,
+            'majorDimension': 'ROWS',
+            'values': self.fuente.valores(range_name)
+        }
+
+    def _propiedades(self, hojas: list) -> dict:
+        return {'sheets': [
+            {'properties': {
+                'title': hoja,
+                'gridProperties': {
+                    'rowCount': len(self.fuente.tabla(hoja)) + 1,
+                    'columnCount': len(self.fuente.tabla(hoja).columns)
+                }
+            }}
+            for hoja in hojas
+        ]}
+
+    def _archivo(self, spreadsheet_id: str) -> dict:
+        version, modificado = self.fuente.revision()
+        return {
+            'id': spreadsheet_id,
+            'version': str(version),
+            'modifiedTime': datetime.fromtimestamp(modificado, timezone.utc).isoformat(timespec='milliseconds'),
+        }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = url.path.strip('/').split('/')
+        consulta = parse_qs(url.query)
+        # v4/spreadsheets/{id} | v4/spreadsheets/{id}/values/{range} | v4/spreadsheets/{id}/values:batchGet
+        # files/{id} (Drive v3: con api_endpoint el cliente no antepone drive/v3)
+        try:
+            if len(partes) == 2 and partes[0] == 'files':
+                self._responder(200, self._archivo(partes[1]))
+            elif len(partes) == 3 and partes[1] == 'spreadsheets':
+                hojas = [r.split('!')[0] for r in consulta.get('ranges', [])] or self.fuente.hojas()
+                self._responder(200, self._propiedades(hojas))
+            elif len(partes) == 5 and partes[3] == 'values':
+                self._responder(200, self._value_range(unquote(partes[4])))
+            elif len(partes) == 4 and partes[3] == 'values:batchGet':
+                ranges = consulta.get('ranges', [])
+                self._responder(200, {
+                    'spreadsheetId': partes[2],
+                    'valueRanges': [self._value_range(r) for r in ranges]
+                })
+            else:
+                self._responder(404, {'error': {'code': 404, 'message': 'Not found'}})
+        except (FileNotFoundError, ValueError) as e:
+            self._responder(400, {'error': {'code': 400, 'message': str(e)}})
+
+
+class ServidorSheetsLocal:
+    """Servidor en un hilo propio; ``url`` sirve como INVENTARIO_FUENTE."""
+
+    def __init__(self, fuente, host: str = '127.0.0.1', puerto: int = 0):
+        self.fuente = _TablasEnMemoria(fuente)
+        manejador = type('Manejador', (_ManejadorSheets,), {'fuente': self.fuente})
+        self.servidor = ThreadingHTTPServer((host, puerto), manejador)
+        self.servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self) -> str:
+        host, puerto = self.servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self) -> str:
+        self._hilo = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self.url
+
+    def recargar(self):
+        """
+        Vuelve a leer la fuente en la próxima petición. Los ficheros modificados
+        se releen solos; esto sólo hace falta si la fuente no tiene firma.
+        """
+        self.fuente.olvidar()
+
+    def detener(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatible con la API de Google Sheets")
+    parser.add_argument("fuente", help="csv:ruta | parquet:ruta | sqlite:ruta")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+
+    servidor = ServidorSheetsLocal(crear_fuente(args.fuente), args.host, args.puerto)
+    print(f"Sirviendo {args.fuente} en {servidor.url}")
+    try:
+        servidor.servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.detener()
+
+
+if __name__ == '__main__':
+    main()
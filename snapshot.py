@@ -0,0 +1,77 @@
+"""
+Instantánea local del libro tipado en formato Arrow IPC (sin compresión).
+
+Un proceso recién arrancado mapea el fichero en memoria y muestra los datos
+de inmediato; las columnas numéricas no se copian y las categóricas se
+reconstruyen desde los diccionarios de Arrow. La huella y el informe de
+memoria viajan en los metadatos del esquema.
+"""
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+_CLAVE_METADATOS = b'inventario'
+
+
+def ruta_snapshot(directorio: str, clave: tuple) -> str:
+    nombre = hashlib.sha1(repr(clave).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directorio, f"libro_{nombre}.arrow")
+
+
+def _metadatos(ruta: str) -> dict:
+    with pa.memory_map(ruta) as fuente:
+        esquema = pa.ipc.open_file(fuente).schema
+    return json.loads((esquema.metadata or {}).get(_CLAVE_METADATOS, b'{}'))
+
+
+def leer_huella(ruta: str):
+    """Huella del libro guardado, o None si no hay instantánea válida."""
+    try:
+        return _metadatos(ruta).get('huella')
+    except (OSError, pa.ArrowInvalid, ValueError):
+        return None
+
+
+def guardar(df: pd.DataFrame, ruta: str):
+    """Escribe la instantánea de forma atómica (fichero temporal + rename)."""
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    metadatos = dict(tabla.schema.metadata or {})
+    metadatos[_CLAVE_METADATOS] = json.dumps({
+        'huella': df.attrs.get('huella'),
+        'memoria': df.attrs.get('memoria'),
+        'firma': df.attrs.get('firma'),
+        'guardado_en': time.time()
+    }).encode('utf-8')
+    tabla = tabla.replace_schema_metadata(metadatos)
+
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with pa.OSFile(temporal, 'wb') as destino:
+        with pa.ipc.new_file(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    os.replace(temporal, ruta)
+
+
+def cargar(ruta: str):
+    """
+    Devuelve (libro, guardado_en) mapeando el fichero en memoria, o None si
+    no existe o está dañado.
+    """
+    try:
+        with pa.memory_map(ruta) as fuente:
+            lector = pa.ipc.open_file(fuente)
+            tabla = lector.read_all()
+        meta = json.loads((tabla.schema.metadata or {}).get(_CLAVE_METADATOS, b'{}'))
+    except (OSError, pa.ArrowInvalid, ValueError):
+        return None
+
+    df = tabla.to_pandas(split_blocks=True)
+    for clave in ('huella', 'memoria', 'firma'):
+        if meta.get(clave) is not None:
+            df.attrs[clave] = meta[clave]
+    df.attrs['snapshot'] = {'ruta': ruta, 'guardado_en': meta.get('guardado_en')}
+    return df, meta.get('guardado_en') or os.path.getmtime(ruta)
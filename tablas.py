@@ -0,0 +1,70 @@
+"""
+Tablas de detalle paginadas en el servidor.
+
+Búsqueda, orden y corte se hacen aquí sobre el DataFrame completo y al
+navegador sólo se envía la página visible, de modo que el tamaño de cada
+envío depende del tamaño de página y no del número de filas del libro.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+TAMANOS_PAGINA = [25, 50, 100, 250]
+TAMANO_INICIAL = 50
+
+
+def buscar(df: pd.DataFrame, texto: str) -> pd.DataFrame:
+    """Filas con ``texto`` (sin distinguir mayúsculas) en alguna columna de texto."""
+    texto = (texto or '').strip().lower()
+    if not texto or df.empty:
+        return df
+    marca = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # Se busca en las categorías (pocas) y no en cada fila
+            categorias = serie.cat.categories.astype(str).str.lower().str.contains(texto, regex=False)
+            codigos = np.flatnonzero(categorias)
+            marca |= np.isin(serie.cat.codes.to_numpy(), codigos)
+        elif serie.dtype == object or pd.api.types.is_string_dtype(serie.dtype):
+            marca |= serie.fillna('').astype(str).str.lower().str.contains(texto, regex=False).to_numpy()
+    return df[marca]
+
+
+def ordenar(df: pd.DataFrame, columna: str = None, descendente: bool = False,
+            filas: int = None) -> pd.DataFrame:
+    """
+    Orden estable por ``columna`` (nulos al final). Con ``filas`` sólo se
+    garantiza el orden de las primeras ``filas``: en columnas numéricas se
+    seleccionan con nsmallest/nlargest sin ordenar la tabla entera.
+    """
+    if not columna or columna not in df.columns:
+        return df
+    serie = df[columna]
+    if (filas is not None and filas * 10 < len(df)
+            and pd.api.types.is_numeric_dtype(serie.dtype)
+            and not pd.api.types.is_bool_dtype(serie.dtype)
+            and serie.notna().sum() >= filas):
+        metodo = df.nlargest if descendente else df.nsmallest
+        return metodo(filas, columna, keep='first')
+    return df.sort_values(columna, ascending=not descendente, kind='stable', na_position='last')
+
+
+def total_paginas(filas: int, tamano: int) -> int:
+    return max(1, math.ceil(filas / tamano))
+
+
+def pagina(df: pd.DataFrame, numero: int, tamano: int) -> pd.DataFrame:
+    """Página ``numero`` (desde 1) de ``tamano`` filas."""
+    inicio = (numero - 1) * tamano
+    return df.iloc[inicio:inicio + tamano]
+
+
+def preparar_pagina(df: pd.DataFrame, columna: str = None, descendente: bool = False,
+                    texto: str = '', numero: int = 1, tamano: int = 50):
+    """Busca, ordena y corta; devuelve la página y el total de filas encontradas."""
+    encontradas = buscar(df, texto)
+    numero = min(max(numero, 1), total_paginas(len(encontradas), tamano))
+    ordenadas = ordenar(encontradas, columna, descendente, filas=numero * tamano)
+    return pagina(ordenadas, numero, tamano), len(encontradas)
@@ -0,0 +1,214 @@
+"""
+Cálculos de la versión original del dashboard, sin Streamlit, para comparar
+con ellos los resultados de analytics. Se copian tal cual: no optimizar.
+"""
+import pandas as pd
+
+ESTADOS_STOCK = {
+    'CRÍTICO': {'umbral': 5, 'color': '#e74c3c'},
+    'BAJO': {'umbral': 20, 'color': '#f39c12'},
+    'NORMAL': {'umbral': float('inf'), 'color': '#2ecc71'}
+}
+
+
+def calcular_porcentaje(parte, total):
+    """Calcula porcentaje con manejo de errores."""
+    try:
+        return round((parte / total * 100), 2) if total > 0 else 0
+    except:
+        return 0
+
+
+def limpiar(df_tmp: pd.DataFrame) -> pd.DataFrame:
+    """Limpieza de InventarioDashboard.load_data."""
+    df_tmp = df_tmp.copy()
+    numeric_cols = ['cajas', 'kg', 'precio', 'precio total']
+    for col in numeric_cols:
+        df_tmp[col] = pd.to_numeric(
+            df_tmp[col].replace(['', 'E', '#VALUE!', '#N/A'], '0'),
+            errors='coerce'
+        ).fillna(0)
+
+    df_tmp['movimiento'] = df_tmp['movimiento'].str.upper().fillna('')
+    df_tmp['almacen'] = df_tmp['almacen'].str.strip().fillna('')
+    df_tmp['almacen actual'] = df_tmp['almacen actual'].str.strip().fillna('')
+    return df_tmp
+
+
+def calcular_stock_actual(df: pd.DataFrame, estados_stock: dict = ESTADOS_STOCK) -> pd.DataFrame:
+    """Bucle producto × lote × almacén de InventarioDashboard.calcular_stock_actual."""
+    stock_data = []
+
+    productos = df['nombre'].unique()
+    lotes = df['lote'].unique()
+    almacenes = pd.concat([df['almacen'], df['almacen actual']]).unique()
+    almacenes = [a for a in almacenes if pd.notna(a) and str(a).strip() != '']
+
+    for prod in productos:
+        for lote in lotes:
+            for alm in almacenes:
+                df_fil = df[(df['nombre'] == prod) & (df['lote'] == lote)]
+
+                df_ent = df_fil[(df_fil['movimiento'] == 'ENTRADA') & (df_fil['almacen'] == alm)]
+                entradas = df_ent['cajas'].sum()
+                kg_entradas = df_ent['kg'].sum()
+
+                df_t_rec = df_fil[(df_fil['movimiento'] == 'TRASPASO') & (df_fil['almacen actual'] == alm)]
+                tr_rec = df_t_rec['cajas'].sum()
+                kg_t_rec = df_t_rec['kg'].sum()
+
+                df_t_env = df_fil[(df_fil['movimiento'] == 'TRASPASO') & (df_fil['almacen'] == alm)]
+                tr_env = df_t_env['cajas'].sum()
+                kg_t_env = df_t_env['kg'].sum()
+
+                df_sal = df_fil[(df_fil['movimiento'] == 'SALIDA') & (df_fil['almacen'] == alm)]
+                salidas = df_sal['cajas'].sum()
+                kg_sal = df_sal['kg'].sum()
+                ventas_total = df_sal['precio total'].sum()
+
+                total_inicial = entradas + tr_rec
+                stock = total_inicial - tr_env - salidas
+                kg_total = kg_entradas + kg_t_rec - kg_t_env - kg_sal
+
+                pct_vendido = calcular_porcentaje(salidas, total_inicial)
+                pct_disp = calcular_porcentaje(stock, total_inicial)
+                rotacion = pct_vendido
+
+                estado = 'NORMAL'
+                for est, config in estados_stock.items():
+                    if stock <= config['umbral']:
+                        estado = est
+                        break
+
+                if total_inicial > 0 or stock != 0:
+                    stock_data.append({
+                        'Almacén': alm,
+                        'Producto': prod,
+                        'Lote': lote,
+                        'Stock': stock,
+                        'Kg Total': kg_total,
+                        'Total Inicial': total_inicial,
+                        'Entradas': entradas,
+                        'Traspasos Recibidos': tr_rec,
+                        'Traspasos Enviados': tr_env,
+                        'Salidas': salidas,
+                        'Ventas Total': ventas_total,
+                        '% Vendido': pct_vendido,
+                        '% Disponible': pct_disp,
+                        'Estado Stock': estado,
+                        'Rotación': rotacion
+                    })
+
+    return pd.DataFrame(stock_data).round(2)
+
+
+def calcular_metricas_generales(stock_df: pd.DataFrame) -> dict:
+    return {
+        'Total Productos': len(stock_df['Producto'].unique()),
+        'Total Almacenes': len(stock_df['Almacén'].unique()),
+        'Total Lotes': len(stock_df['Lote'].unique()),
+        'Total Cajas en Stock': stock_df['Stock'].sum(),
+        'Total Kg en Stock': stock_df['Kg Total'].sum(),
+        'Total Ventas ($)': stock_df['Ventas Total'].sum(),
+        'Productos en Estado Crítico': len(stock_df[stock_df['Estado Stock'] == 'CRÍTICO']),
+        'Rotación Promedio (%)': stock_df['Rotación'].mean()
+    }
+
+
+def entradas_vs_salidas(stock_df: pd.DataFrame) -> pd.DataFrame:
+    df_group = stock_df.groupby('Producto').agg({
+        'Entradas': 'sum',
+        'Salidas': 'sum',
+        'Total Inicial': 'sum'
+    }).reset_index()
+
+    df_group['% Vendido'] = df_group.apply(
+        lambda row: calcular_porcentaje(row['Salidas'], row['Total Inicial']),
+        axis=1
+    )
+    return df_group
+
+
+def resumen_almacen(df_alm: pd.DataFrame, estados_stock: dict = ESTADOS_STOCK) -> pd.DataFrame:
+    resumen_stock = df_alm.groupby('Producto').agg({
+        'Stock': 'sum',
+        'Kg Total': 'sum',
+        'Total Inicial': 'sum',
+        'Salidas': 'sum',
+        '% Vendido': 'mean',
+        '% Disponible': 'mean'
+    }).round(2).reset_index()
+
+    def definir_estado(stock_val):
+        for est, cfg in estados_stock.items():
+            if stock_val <= cfg['umbral']:
+                return est
+        return 'NORMAL'
+
+    resumen_stock['Estado'] = resumen_stock['Stock'].apply(definir_estado)
+    return resumen_stock.sort_values('Stock', ascending=False)
+
+
+# -----------------------------------------------------------------------------
+#        Ventas (InventarioDashboard.ventas_view)
+# -----------------------------------------------------------------------------
+def ventas(df: pd.DataFrame) -> pd.DataFrame:
+    ventas = df[df['movimiento'] == 'SALIDA'].copy()
+    return ventas[ventas['precio'] > 0]
+
+
+def metricas_ventas(ventas: pd.DataFrame) -> dict:
+    total_ventas = ventas['precio total'].sum()
+    total_kg = ventas['kg'].sum()
+    total_cajas = ventas['cajas'].sum()
+    precio_prom = total_ventas / total_kg if total_kg else 0
+    return {
+        "Total Ventas": total_ventas,
+        "Total Kg Vendidos": total_kg,
+        "Total Cajas Vendidas": total_cajas,
+        "Precio Promedio/Kg": precio_prom
+    }
+
+
+def ventas_agrupadas(ventas: pd.DataFrame, claves, total_ventas: float) -> pd.DataFrame:
+    agrupado = ventas.groupby(claves).agg({
+        'cajas': 'sum', 'kg': 'sum', 'precio total': 'sum'
+    }).round(2).sort_values('precio total', ascending=False)
+    agrupado['% del Total'] = (agrupado['precio total'] / total_ventas * 100).round(2)
+    agrupado['Precio/Kg'] = (agrupado['precio total'] / agrupado['kg']).round(2)
+    return agrupado
+
+
+def metricas_cliente(ventas: pd.DataFrame, cliente_sel, total_ventas: float) -> dict:
+    df_cliente = ventas[ventas['cliente'] == cliente_sel]
+    total_cli = df_cliente['precio total'].sum()
+    kg_cli = df_cliente['kg'].sum()
+    return {
+        "Total Compras": total_cli,
+        "Total Kg": kg_cli,
+        "% del Total": (total_cli/total_ventas*100) if total_ventas else 0,
+        "Precio Promedio/Kg": total_cli/kg_cli if kg_cli > 0 else 0
+    }
+
+
+def detalle_ventas(ventas: pd.DataFrame, cliente_filter=(), producto_filter=(), vendedor_filter=()) -> pd.DataFrame:
+    df_fil = ventas.copy()
+    if cliente_filter:
+        df_fil = df_fil[df_fil['cliente'].isin(cliente_filter)]
+    if producto_filter:
+        df_fil = df_fil[df_fil['nombre'].isin(producto_filter)]
+    if vendedor_filter:
+        df_fil = df_fil[df_fil['vendedor'].isin(vendedor_filter)]
+    return df_fil[[
+        'nombre', 'lote', 'cliente', 'vendedor',
+        'cajas', 'kg', 'precio', 'precio total'
+    ]].sort_values(['cliente', 'nombre'])
+
+
+def texto_plano(df: pd.DataFrame) -> pd.DataFrame:
+    """Categóricas a texto e índice a columnas, para comparar con el original."""
+    df = df.reset_index()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    return df
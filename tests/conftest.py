@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generador
+import ingestion
+
+import baseline
+
+
+def generar(filas: int = 800, semilla: int = 0, **opciones):
+    """Libro sintético pequeño: el bucle original recorre producto × lote × almacén."""
+    opciones = {'productos': 6, 'lotes_por_producto': 3, 'almacenes': 4, 'clientes': 15,
+                'vendedores': 4, 'dias': 60, **opciones}
+    return generador.generar_libro(filas, semilla=semilla, suciedad=0.02, **opciones)
+
+
+@pytest.fixture(params=range(3), ids=lambda s: f"semilla{s}")
+def libros(request):
+    """(libro limpio como lo dejaba el dashboard original, libro tipado por la ingesta)."""
+    crudo = generar(semilla=request.param)
+    return baseline.limpiar(crudo), ingestion.preparar_libro(crudo)
+
+
+@pytest.fixture(scope='module')
+def libro():
+    """Libro tipado más grande, con fechas, para los índices y cachés."""
+    return ingestion.preparar_libro(generar(5000, semilla=7, dias=120))
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics
+import baseline
+from baseline import texto_plano
+
+
+@pytest.mark.parametrize('semilla', range(5))
+def test_porcentaje_igual_que_fila_a_fila(semilla):
+    rng = np.random.default_rng(semilla)
+    parte = np.round(rng.random(20_000) * 1000, 2)
+    total = np.round(rng.random(20_000) * 1000, 2)
+    total[::7] = 0
+    esperado = [baseline.calcular_porcentaje(p, t) for p, t in zip(parte, total)]
+    np.testing.assert_array_equal(analytics.porcentaje(parte, total), esperado)
+
+
+def test_porcentaje_empates():
+    # 13.309999999999999 / 40 cae en un empate que numpy y round() de Python resuelven distinto
+    for parte, total in ((13.309999999999999, 40), (2.675, 100)):
+        esperado = baseline.calcular_porcentaje(np.float64(parte), np.float64(total))
+        assert analytics.porcentaje(parte, total) == esperado
+
+
+def test_porcentaje_escalar_y_total_nulo():
+    assert np.ndim(analytics.porcentaje(1, 3)) == 0
+    assert analytics.porcentaje(1, 3) == 33.33
+    assert analytics.porcentaje(5, 0) == 0
+    assert analytics.porcentaje(5, np.nan) == 0
+
+
+def test_clasificar_estado_igual_que_primer_umbral():
+    def estado_fila(stock, estados):
+        for est, config in estados.items():
+            if stock <= config['umbral']:
+                return est
+        return 'NORMAL'
+
+    stock = np.concatenate([np.arange(-10, 40, 0.5), [np.nan, np.inf, -np.inf]])
+    for estados in (analytics.ESTADOS_STOCK,
+                    {'A': {'umbral': 10}, 'B': {'umbral': 3}, 'C': {'umbral': 20}},
+                    {'A': {'umbral': float('nan')}, 'B': {'umbral': 0}},
+                    {}):
+        assert list(analytics.clasificar_estado(stock, estados)) == [estado_fila(s, estados) for s in stock]
+
+
+# -----------------------------------------------------------------------------
+#        Equivalencia con el dashboard original
+# -----------------------------------------------------------------------------
+def test_stock_igual_que_el_bucle_original(libros):
+    limpio, tipado = libros
+    esperado = baseline.calcular_stock_actual(limpio)
+    stock_df = analytics.calcular_stock_actual(tipado, baseline.ESTADOS_STOCK)
+    assert list(stock_df.columns) == list(esperado.columns)
+    pd.testing.assert_frame_equal(stock_df, esperado, check_dtype=False)
+
+
+def test_metricas_generales(libros):
+    limpio, tipado = libros
+    esperado = baseline.calcular_stock_actual(limpio)
+    stock_df = analytics.calcular_stock_actual(tipado)
+    assert analytics.calcular_metricas_generales(stock_df) == pytest.approx(
+        baseline.calcular_metricas_generales(esperado)
+    )
+    assert analytics.calcular_metricas_generales(stock_df.iloc[:0]) == analytics.METRICAS_VACIAS
+
+
+def test_entradas_vs_salidas_y_resumen_almacen(libros):
+    limpio, tipado = libros
+    esperado = baseline.calcular_stock_actual(limpio)
+    stock_df = analytics.calcular_stock_actual(tipado)
+    pd.testing.assert_frame_equal(
+        analytics.entradas_vs_salidas(stock_df), baseline.entradas_vs_salidas(esperado), check_dtype=False
+    )
+    for almacen in esperado['Almacén'].unique():
+        pd.testing.assert_frame_equal(
+            analytics.resumen_almacen(stock_df[stock_df['Almacén'] == almacen]),
+            baseline.resumen_almacen(esperado[esperado['Almacén'] == almacen]),
+            check_dtype=False
+        )
+
+
+def test_ventas_y_desgloses(libros):
+    limpio, tipado = libros
+    ventas_esperadas = baseline.ventas(limpio)
+    ventas = analytics.ventas_validas(tipado)
+    metricas = analytics.metricas_ventas(ventas)
+    assert metricas == pytest.approx(baseline.metricas_ventas(ventas_esperadas))
+
+    total = metricas["Total Ventas"]
+    for claves in (['nombre', 'lote'], 'cliente'):
+        pd.testing.assert_frame_equal(
+            texto_plano(analytics.ventas_agrupadas(ventas, claves, total)),
+            texto_plano(baseline.ventas_agrupadas(ventas_esperadas, claves, total)),
+            check_dtype=False
+        )
+
+    clientes = sorted(ventas_esperadas['cliente'].dropna().unique())
+    for cliente in clientes:
+        assert analytics.metricas_cliente(ventas[ventas['cliente'] == cliente], total) == pytest.approx(
+            baseline.metricas_cliente(ventas_esperadas, cliente, total)
+        )
+
+    vendedores = sorted(v for v in ventas_esperadas['vendedor'].dropna().unique() if str(v).strip())
+    productos = sorted(ventas_esperadas['nombre'].dropna().unique())
+    for filtros in ([], [], []), (clientes[:3], [], []), (clientes[:2], productos[:2], []), ([], [], vendedores[:1]):
+        pd.testing.assert_frame_equal(
+            texto_plano(analytics.filtrar_ventas(ventas, *filtros)),
+            texto_plano(baseline.detalle_ventas(ventas_esperadas, *filtros)),
+            check_dtype=False
+        )
+
+
+@pytest.mark.parametrize('decimales', [0, 2, 3])
+def test_formatear_numeros_igual_que_escalar(decimales):
+    rng = np.random.default_rng(decimales)
+    valores = np.concatenate([
+        rng.standard_normal(5_000) * 10.0 ** rng.integers(-2, 9, 5_000),
+        [0.0, -0.0, 999.995, 999.999, 1_000, -1_000, 999_999.995, 1_000_000, -1e12,
+         np.nan, np.inf, -np.inf],
+    ])
+    esperado = [analytics.formatear_numero(v, decimales) for v in valores]
+    assert analytics.formatear_numeros(valores, decimales).tolist() == esperado
+
+    enteros = rng.integers(-5_000_000, 5_000_000, 2_000)
+    assert analytics.formatear_numeros(enteros, decimales).tolist() == [
+        analytics.formatear_numero(v, decimales) for v in enteros
+    ]
+
+
+def test_formatear_numeros_valores_no_numericos():
+    valores = [1500, None, 'abc', 2.5, True]
+    assert analytics.formatear_numeros(valores).tolist() == [analytics.formatear_numero(v) for v in valores]
+
+
+def test_formatear_metricas():
+    metricas = {'Total Productos': 12, 'Total Cajas en Stock': np.int64(40_000),
+                'Total Ventas ($)': 1_234_567.891, 'Rotación Promedio (%)': np.float64(37.456)}
+    assert analytics.formatear_metricas(metricas.values()) == ['12', '40000', '1.23M', '37.46']
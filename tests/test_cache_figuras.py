@@ -0,0 +1,38 @@
+import plotly.express as px
+import pytest
+
+import cache_figuras
+import graficos
+from cache_figuras import CacheFiguras
+from perfil import bytes_figura
+
+
+def _barras(n: int):
+    n = n or 300
+    return px.bar(x=[f"P{i}" for i in range(n)], y=list(range(n)))
+
+
+def test_limitar_payload_devuelve_el_tamano_medido():
+    fig, tamano = graficos.limitar_payload(_barras, 0, 8_000)
+    assert tamano == bytes_figura(fig) <= 8_000
+    assert graficos.limitar_payload(_barras, 10, 0)[1] is None
+
+
+def test_la_cache_no_vuelve_a_serializar(monkeypatch):
+    fig, tamano = graficos.limitar_payload(_barras, 20, 1_000_000)
+    cache = CacheFiguras()
+
+    def no_medir(_):
+        pytest.fail("la figura ya venía medida")
+
+    monkeypatch.setattr(cache_figuras, 'bytes_figura', no_medir)
+    assert cache.obtener(('barras',), lambda: (fig, tamano)) is fig
+    assert cache.estado()['bytes'] == tamano
+    assert cache.obtener(('barras',), lambda: pytest.fail("debía salir de la caché")) is fig
+
+
+def test_figura_sin_medir():
+    cache = CacheFiguras()
+    fig = _barras(5)
+    assert cache.obtener(('sin_medir',), lambda: fig) is fig
+    assert cache.estado()['bytes'] == bytes_figura(fig)
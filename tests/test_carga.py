@@ -0,0 +1,47 @@
+import io
+import json
+import os
+
+import carga
+
+
+def test_muestreo_del_proceso():
+    with carga.Muestreo(os.getpid(), intervalo=0.01) as muestreo:
+        sum(i * i for i in range(300_000))
+    assert muestreo.inicial > 0 and muestreo.pico >= muestreo.inicial
+    assert muestreo.cpu >= 0 and muestreo.segundos > 0
+
+
+def test_muestreo_sin_proceso():
+    with carga.Muestreo(2**22 + 1) as muestreo:
+        pass
+    assert (muestreo.inicial, muestreo.pico, muestreo.cpu) == (None, None, None)
+
+
+def test_registros_nivel():
+    medidas = [('inicial', 2.0, carga.OK), ('lote', 0.1, carga.OK), ('lote', 0.3, carga.ERROR_APP),
+               ('cliente', None, carga.OMITIDO), ('cliente', None, carga.ERROR_ARNES)]
+    resultado = {'medidas': medidas, 'errores_arnes': ['cliente: TimeoutError: '], 'segundos': 4.0,
+                 'rss_inicial': 100e6, 'rss_pico': 300e6, 'cpu': 2.0}
+    resumen, *acciones = carga.registros_nivel(2, resultado)
+    assert (resumen['reruns'], resumen['errores_app'], resumen['errores_arnes'], resumen['omitidos']) == (2, 1, 1, 1)
+    assert (resumen['p50_ms'], resumen['inicial_p50_ms']) == (200, 2000)
+    assert (resumen['rss_pico_mb'], resumen['rss_por_sesion_mb']) == (300, 100)
+    assert (resumen['cpu_nucleos'], resumen['cpu_segundos_por_sesion']) == (0.5, 1.0)
+    assert {a['accion']: (a['n'], a['omitidos']) for a in acciones} == {'cliente': (0, 1), 'lote': (2, 0)}
+
+    sin_proc = carga.registros_nivel(2, {**resultado, 'rss_inicial': None, 'rss_pico': None, 'cpu': None})[0]
+    assert sin_proc['rss_pico_mb'] is None and sin_proc['cpu_nucleos'] is None
+
+
+def test_sesiones_contra_un_servidor():
+    # Un servidor de Streamlit real con dos sesiones simultáneas
+    salida = io.StringIO()
+    carga.ejecutar([2], interacciones=3, filas=2000, salida=salida)
+    registros = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+    resumen = next(r for r in registros if r['tipo'] == 'carga')
+    assert resumen['sesiones'] == 2
+    assert resumen['errores_app'] == resumen['errores_arnes'] == 0, resumen['detalle_arnes']
+    assert resumen['inicial_p50_ms'] > 0
+    assert resumen['rss_pico_mb'] >= resumen['rss_inicial_mb'] > 0
+    assert resumen['cpu_segundos'] > 0
@@ -0,0 +1,57 @@
+import random
+
+import pandas as pd
+import pytest
+
+import analytics
+from cubo import DIMENSIONES, CuboStock
+
+
+@pytest.fixture(scope='module')
+def stock(libro):
+    return analytics.calcular_stock_actual(libro)
+
+
+@pytest.fixture(scope='module')
+def cubo(stock):
+    return CuboStock(stock)
+
+
+def filtrar(stock: pd.DataFrame, filtros: dict) -> pd.DataFrame:
+    marca = pd.Series(True, index=stock.index)
+    for dim, valores in filtros.items():
+        if valores:
+            marca &= stock[dim].isin(valores)
+    return stock[marca]
+
+
+def combinaciones(cubo: CuboStock, n: int = 100):
+    azar = random.Random(0)
+    yield {}
+    yield {'Producto': ['no existe']}
+    for _ in range(n):
+        yield {dim: azar.sample(cubo.opciones(dim), azar.randint(0, 2)) for dim in DIMENSIONES}
+
+
+def test_opciones(stock, cubo):
+    for dim in DIMENSIONES:
+        assert cubo.opciones(dim) == sorted(stock[dim].unique())
+
+
+def test_filtros_igual_que_la_tabla(stock, cubo):
+    for filtros in combinaciones(cubo):
+        esperado = filtrar(stock, filtros)
+        pd.testing.assert_frame_equal(cubo.filtrar(filtros).reset_index(drop=True), esperado.reset_index(drop=True))
+        assert cubo.metricas(filtros) == pytest.approx(analytics.calcular_metricas_generales(esperado))
+        pd.testing.assert_frame_equal(
+            cubo.entradas_vs_salidas(filtros), analytics.entradas_vs_salidas(esperado), check_dtype=False
+        )
+
+
+def test_filtros_de_las_vistas(stock, cubo):
+    lotes, almacenes = cubo.opciones('Lote')[:3], cubo.opciones('Almacén')[:1]
+    filtros = {'Lote': lotes, 'Almacén': almacenes, 'Estado Stock': []}
+    pd.testing.assert_frame_equal(
+        cubo.filtrar(filtros).reset_index(drop=True),
+        analytics.filtrar_stock(stock, lotes, almacenes, []).reset_index(drop=True)
+    )
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+from data_cache import CacheDatos
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+class Cargador:
+    """Devuelve 'v1', 'v2', ... y cuenta las llamadas; ``bloqueo`` la detiene."""
+
+    def __init__(self):
+        self.llamadas = 0
+        self.bloqueo = None
+
+    def __call__(self):
+        if self.bloqueo is not None:
+            self.bloqueo.wait(5)
+        self.llamadas += 1
+        return f"v{self.llamadas}"
+
+
+@pytest.fixture
+def reloj():
+    return Reloj()
+
+
+@pytest.fixture
+def cache(reloj):
+    return CacheDatos(reloj)
+
+
+def esperar_recarga(cache: CacheDatos, clave):
+    limite = time.monotonic() + 5
+    while cache.estado(clave)['recargando']:
+        assert time.monotonic() < limite, "la recarga no terminó"
+        time.sleep(0.005)
+
+
+def test_aciertos_y_fallos_dentro_del_ttl(cache, reloj):
+    cargar = Cargador()
+    assert cache.obtener('hoja', cargar, ttl=60) == 'v1'
+    reloj.ahora += 59
+    assert cache.obtener('hoja', cargar, ttl=60) == 'v1'
+    estado = cache.estado('hoja')
+    assert (estado['fallos'], estado['aciertos'], estado['cargas']) == (1, 1, 1)
+    assert estado['edad'] == 59
+    assert cargar.llamadas == 1
+
+
+def test_caducada_se_sirve_y_se_recarga_en_segundo_plano(cache, reloj):
+    cargar = Cargador()
+    cache.obtener('hoja', cargar, ttl=60)
+    reloj.ahora += 60
+    cargar.bloqueo = threading.Event()
+    # La copia anterior se sirve al momento mientras se recarga
+    assert cache.obtener('hoja', cargar, ttl=60) == 'v1'
+    assert cache.estado('hoja')['recargando']
+    assert cache.obtener('hoja', cargar, ttl=60) == 'v1'
+    cargar.bloqueo.set()
+    esperar_recarga(cache, 'hoja')
+
+    assert cache.obtener('hoja', cargar, ttl=60) == 'v2'
+    estado = cache.estado('hoja')
+    assert (estado['obsoletos'], estado['cargas'], estado['aciertos']) == (2, 2, 1)
+    assert estado['edad'] == 0
+    assert cargar.llamadas == 2
+
+
+def test_invalidar_afecta_solo_a_su_clave(cache):
+    carnes, pescados = Cargador(), Cargador()
+    cache.obtener('carnes', carnes, ttl=60)
+    cache.obtener('pescados', pescados, ttl=60)
+    cache.invalidar('carnes')
+
+    assert cache.obtener('carnes', carnes, ttl=60) == 'v1'
+    esperar_recarga(cache, 'carnes')
+    assert cache.valor('carnes') == 'v2'
+    assert cache.obtener('pescados', pescados, ttl=60) == 'v1'
+    assert pescados.llamadas == 1
+    assert cache.estado('pescados')['obsoletos'] == 0
+
+
+def test_refrescar_recarga_en_primer_plano(cache):
+    cargar = Cargador()
+    cache.obtener('hoja', cargar, ttl=60)
+    assert cache.refrescar('hoja', cargar) == 'v2'
+    assert cache.obtener('hoja', cargar, ttl=60) == 'v2'
+    assert cache.estado('hoja')['cargas'] == 2
+
+
+def test_sin_cambios_si_la_carga_devuelve_el_mismo_objeto(cache):
+    libro = object()
+    cache.obtener('hoja', lambda: libro, ttl=60)
+    cache.refrescar('hoja', lambda: libro)
+    estado = cache.estado('hoja')
+    assert (estado['cargas'], estado['sin_cambios']) == (1, 1)
+
+
+def test_semilla_se_sirve_y_se_revalida(cache, reloj):
+    cargar = Cargador()
+    cargar.bloqueo = threading.Event()
+    valor = cache.obtener('hoja', cargar, ttl=60, semilla=lambda: ('instantanea', reloj.ahora - 3600))
+    assert valor == 'instantanea'
+    assert cache.estado('hoja')['edad'] == 3600
+    assert cache.estado('hoja')['semillas'] == 1
+    cargar.bloqueo.set()
+    esperar_recarga(cache, 'hoja')
+    assert cache.obtener('hoja', cargar, ttl=60) == 'v1'
+    assert cache.estado('hoja')['cargas'] == 1
+
+
+def test_error_en_la_carga(cache, reloj):
+    def fallar():
+        raise RuntimeError("sin red")
+
+    with pytest.raises(RuntimeError):
+        cache.obtener('hoja', fallar, ttl=60)
+    assert cache.estado('hoja')['errores'] == 1
+
+    # Un error en la recarga de fondo conserva la copia anterior
+    cache.obtener('hoja', Cargador(), ttl=60)
+    reloj.ahora += 61
+    assert cache.obtener('hoja', fallar, ttl=60) == 'v1'
+    esperar_recarga(cache, 'hoja')
+    assert cache.valor('hoja') == 'v1'
+    assert cache.estado('hoja')['errores'] == 2
+
+
+def test_una_sola_carga_con_varias_sesiones(cache):
+    cargar = Cargador()
+    cargar.bloqueo = threading.Event()
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener('hoja', cargar, ttl=60)))
+             for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    cargar.bloqueo.set()
+    for hilo in hilos:
+        hilo.join()
+    assert resultados == ['v1'] * 5
+    assert cargar.llamadas == 1
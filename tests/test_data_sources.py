@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+import dashboard
+import generador
+import ingestion
+from conftest import generar
+from data_sources import FuenteGoogleSheets, crear_fuente, dataframe_desde_valores
+from sheets_local import ServidorSheetsLocal
+
+CABECERA = ['nombre', 'lote', 'movimiento', 'cliente']
+
+
+class _SheetsEnMemoria(FuenteGoogleSheets):
+    """Responde con filas recortadas como Sheets, sin red."""
+
+    def __init__(self, filas: list, **opciones):
+        super().__init__('libro', **opciones)
+        self.filas = filas
+
+    def _valores(self, rango: str) -> list:
+        inicio, fin = (int(''.join(c for c in parte if c.isdigit())) for parte in rango.split('!')[1].split(':'))
+        todas = [CABECERA] + self.filas
+        return todas[inicio - 1:fin]
+
+    def _get(self, range_name: str) -> list:
+        return self._valores(range_name)
+
+    def _batch_get(self, ranges: list) -> list:
+        return [self._valores(r) for r in ranges]
+
+    def num_filas(self, hoja: str) -> int:
+        return len(self.filas) + 1
+
+
+def test_filas_cortas_en_una_peticion():
+    df = dataframe_desde_valores([CABECERA, ['A', 'L1'], ['B']])
+    assert list(df.columns) == CABECERA
+    assert df.iloc[0].tolist() == ['A', 'L1', None, None]
+
+
+def test_ventana_con_todas_las_filas_cortas():
+    filas = [['A', 'L1', 'SALIDA', 'C1'], ['B', 'L2'], ['C', 'L3'], ['D', 'L4', 'ENTRADA']]
+    fuente = _SheetsEnMemoria(filas, filas_por_bloque=2)
+    esperado = [f + [None] * (len(CABECERA) - len(f)) for f in filas]
+    for ventanas_por_peticion in (1, 2):
+        fuente.ventanas_por_peticion = ventanas_por_peticion
+        df = fuente.leer('Carnes!A1:D')
+        assert list(df.columns) == CABECERA
+        assert _filas(df) == esperado
+
+
+def _filas(df: pd.DataFrame) -> list:
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+@pytest.fixture(scope='module')
+def crudo():
+    return generar(400, semilla=3)
+
+
+@pytest.fixture(scope='module', params=['csv', 'parquet', 'sqlite'])
+def fuente_local(request, crudo, tmp_path_factory):
+    carpeta = tmp_path_factory.mktemp(request.param)
+    return generador.guardar_libro(crudo, str(carpeta), formato=request.param)
+
+
+@pytest.fixture(scope='module')
+def servidor(fuente_local):
+    servidor = ServidorSheetsLocal(crear_fuente(fuente_local))
+    servidor.iniciar()
+    yield servidor
+    servidor.detener()
+
+
+@pytest.mark.parametrize('rango', ['Carnes!A1:L', 'Carnes!A1:E50', 'Carnes!B1:D'])
+def test_misma_lectura_que_sheets(fuente_local, servidor, rango):
+    local = crear_fuente(fuente_local).leer(rango)
+    por_api = crear_fuente(servidor.url, 'libro').leer(rango)
+    pd.testing.assert_frame_equal(local, por_api, check_dtype=False)
+
+
+def test_mismo_libro_que_sheets(fuente_local, servidor, crudo):
+    local = dashboard.descargar_hoja(fuente_local, 'libro', 'Carnes!A1:L')
+    por_api = dashboard.descargar_hoja(servidor.url, 'libro', 'Carnes!A1:L')
+    pd.testing.assert_frame_equal(local, por_api)
+    assert local.attrs['huella'] == por_api.attrs['huella']
+    assert len(local) == len(crudo)
+
+
+def test_mismo_libro_que_la_respuesta_de_sheets(fuente_local, crudo):
+    # Sheets omite las celdas vacías al final de cada fila
+    filas = [list(crudo.columns)]
+    for fila in crudo.values.tolist():
+        while fila and fila[-1] == '':
+            fila.pop()
+        filas.append(fila)
+    esperado = ingestion.preparar_libro(dataframe_desde_valores(filas))
+    local = dashboard.descargar_hoja(fuente_local, 'libro', 'Carnes!A1:L')
+    pd.testing.assert_frame_equal(local, esperado, check_dtype=False)
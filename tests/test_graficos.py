@@ -0,0 +1,88 @@
+import logging
+
+import pandas as pd
+import plotly.express as px
+import pytest
+
+import graficos
+from perfil import bytes_figura
+
+
+@pytest.fixture
+def ventas():
+    return pd.DataFrame({
+        'Almacén': ['A', 'A', 'A', 'B', 'B', 'B', 'B'],
+        'Producto': ['p1', 'p2', 'p3', 'p1', 'p2', 'p3', 'p4'],
+        'Stock': [50, 30, 30, 5, 40, 10, 1],
+    })
+
+
+def test_top_n_suma_el_resto_en_otros(ventas):
+    reducido = graficos.reducir(ventas, ['Producto'], ['Stock'], 'Producto', 2)
+    assert reducido['Producto'].tolist() == ['p1', 'p2', graficos.OTROS]
+    assert reducido['Stock'].tolist() == [55, 70, 41]
+    assert reducido['Stock'].sum() == ventas['Stock'].sum()
+
+
+def test_top_n_empates_y_sin_recorte(ventas):
+    datos = graficos.agregar(ventas[ventas['Almacén'] == 'A'], ['Producto'], ['Stock'])
+    # Con empate se queda el primero que aparece, como rank(method='first')
+    assert graficos.top_n(datos, 'Producto', 'Stock', 2)['Producto'].tolist() == ['p1', 'p2', graficos.OTROS]
+    assert graficos.top_n(datos, 'Producto', 'Stock', 0) is datos
+    assert graficos.top_n(datos, 'Producto', 'Stock', 3) is datos
+
+
+def test_top_n_por_grupo(ventas):
+    reducido = graficos.reducir(ventas, ['Almacén', 'Producto'], ['Stock'], 'Producto', 1, grupo='Almacén')
+    assert reducido.values.tolist() == [['A', 'p1', 50], ['B', 'p2', 40], ['A', graficos.OTROS, 60],
+                                        ['B', graficos.OTROS, 16]]
+
+
+def test_entradas_vs_salidas_recalcula_el_porcentaje_de_otros():
+    df_group = pd.DataFrame({
+        'Producto': ['a', 'b', 'c'], 'Entradas': [100, 50, 10],
+        'Salidas': [10, 25, 5], 'Total Inicial': [100, 50, 10], '% Vendido': [10.0, 50.0, 50.0],
+    })
+    reducido = graficos.datos_entradas_vs_salidas(df_group, 1)
+    assert reducido['Producto'].tolist() == ['a', graficos.OTROS]
+    assert reducido['% Vendido'].tolist() == [10.0, 50.0]
+
+
+def test_muestrear_conserva_extremos():
+    serie = pd.DataFrame({'Fecha': pd.date_range('2024-01-01', periods=100), 'Stock': range(100)})
+    muestra = graficos.muestrear(serie, 10)
+    assert len(muestra) == 10
+    assert muestra['Stock'].iloc[[0, -1]].tolist() == [0, 99]
+    assert graficos.muestrear(serie, 0) is serie
+
+
+def _barras(n_productos: int):
+    datos = pd.DataFrame({'Producto': [f"producto {i:04d}" for i in range(n_productos)],
+                          'Stock': range(n_productos, 0, -1)})
+    construidas = []
+
+    def construir(n):
+        construidas.append(n)
+        return px.bar(graficos.datos_barras(datos, 'Producto', ['Stock'], n), x='Producto', y='Stock')
+    return construir, construidas
+
+
+def test_limitar_payload_reduce_hasta_caber():
+    construir, construidas = _barras(2000)
+    completa = bytes_figura(construir(0))
+    fig, tamano = graficos.limitar_payload(construir, 0, completa // 2)
+    assert tamano == bytes_figura(fig) <= completa // 2
+    assert construidas[1:3] == [0, 200]
+
+    construidas.clear()
+    fig, tamano = graficos.limitar_payload(construir, 25, 0)
+    assert tamano is None and construidas == [25]
+
+
+def test_limitar_payload_avisa_si_no_cabe(caplog):
+    construir, construidas = _barras(50)
+    with caplog.at_level(logging.WARNING, logger='graficos'):
+        fig, tamano = graficos.limitar_payload(construir, 8, 100)
+    assert construidas == [8, 4, 2, 1]
+    assert tamano > 100
+    assert 'supera el máximo' in caplog.text
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+import analytics
+from historico import HistoricoStock
+
+
+@pytest.fixture(scope='module')
+def historico(libro):
+    return HistoricoStock(libro)
+
+
+def ordenada(stock: pd.DataFrame) -> pd.DataFrame:
+    return stock.sort_values(['Almacén', 'Producto', 'Lote']).reset_index(drop=True)
+
+
+def hasta(libro: pd.DataFrame, fecha) -> pd.DataFrame:
+    """Movimientos hasta ``fecha``; los que no tienen fecha cuentan desde el principio."""
+    return libro[libro['fecha'].isna() | (libro['fecha'] <= fecha)]
+
+
+@pytest.mark.parametrize('sin_fecha', [0, 0.05])
+def test_stock_a_fecha_igual_que_recalcular(libro, sin_fecha):
+    libro = libro.copy()
+    libro.loc[libro.sample(frac=sin_fecha, random_state=0).index, 'fecha'] = pd.NaT
+    historico = HistoricoStock(libro)
+    fechas = pd.date_range(historico.primera, historico.ultima, periods=6)
+    for fecha in [historico.primera - pd.Timedelta(days=1), *fechas]:
+        pd.testing.assert_frame_equal(
+            ordenada(historico.stock_a_fecha(fecha)),
+            ordenada(analytics.calcular_stock_actual(hasta(libro, fecha))),
+            check_dtype=False
+        )
+
+
+def test_ultima_fecha_igual_que_stock_actual(libro, historico):
+    pd.testing.assert_frame_equal(
+        historico.stock_a_fecha(historico.ultima), analytics.calcular_stock_actual(libro), check_dtype=False
+    )
+
+
+def test_serie_suma_el_stock_de_cada_dia(libro, historico):
+    filtros = {'Almacén': [historico.claves['Almacén'].iloc[0]]}
+    serie = historico.serie(filtros=filtros)
+    assert len(serie) == (historico.ultima - historico.primera).days + 1
+    for _, fila in serie.iloc[::15].iterrows():
+        stock = analytics.calcular_stock_actual(hasta(libro, fila['Fecha']))
+        stock = stock[stock['Almacén'].isin(filtros['Almacén'])]
+        assert fila['Stock'] == pytest.approx(stock['Stock'].sum(), abs=0.05)
+        assert fila['Kg Total'] == pytest.approx(stock['Kg Total'].sum(), abs=0.05)
+
+
+def test_sin_fechas_no_hay_historico(libro):
+    assert not HistoricoStock(libro.drop(columns='fecha')).disponible
+    assert HistoricoStock(libro.assign(fecha=pd.NaT)).stock_a_fecha('2024-01-01').empty
@@ -0,0 +1,63 @@
+import random
+
+import pandas as pd
+import pytest
+
+import analytics
+import baseline
+from baseline import texto_plano
+from indice_ventas import DIMENSIONES, IndiceVentas
+
+
+@pytest.fixture(scope='module')
+def ventas(libro):
+    return analytics.ventas_validas(libro)
+
+
+@pytest.fixture(scope='module')
+def indice(ventas):
+    return IndiceVentas(ventas)
+
+
+def test_grupos_y_opciones(ventas, indice):
+    pd.testing.assert_frame_equal(indice.detalle, analytics.detalle_ventas(ventas))
+    for dim in DIMENSIONES:
+        assert indice.opciones(dim) == sorted(ventas[dim].dropna().unique())
+        for valor in indice.opciones(dim)[:10]:
+            pd.testing.assert_frame_equal(indice.grupo(dim, valor), ventas[ventas[dim] == valor])
+    assert indice.grupo('cliente', 'no existe').empty
+
+
+def test_metricas_y_agrupados(ventas, indice):
+    total = analytics.metricas_ventas(ventas)["Total Ventas"]
+    for cliente in indice.opciones('cliente') + ['no existe']:
+        assert indice.metricas_cliente(cliente) == pytest.approx(
+            analytics.metricas_cliente(ventas[ventas['cliente'] == cliente], total)
+        )
+    for claves in (['nombre', 'lote'], 'cliente'):
+        pd.testing.assert_frame_equal(indice.agrupado(claves), analytics.ventas_agrupadas(ventas, claves, total))
+
+
+def test_filtros_combinados(ventas, indice):
+    azar = random.Random(0)
+    for _ in range(100):
+        filtros = {dim: azar.sample(indice.opciones(dim), azar.randint(0, 3))
+                   for dim in ['cliente', 'nombre', 'vendedor']}
+        pd.testing.assert_frame_equal(
+            indice.filtrar_detalle(filtros),
+            analytics.filtrar_ventas(ventas, filtros['cliente'], filtros['nombre'], filtros['vendedor'])
+        )
+
+
+def test_detalle_igual_que_original(libros):
+    limpio, tipado = libros
+    esperadas = baseline.ventas(limpio)
+    indice = IndiceVentas(analytics.ventas_validas(tipado))
+    clientes = indice.opciones('cliente')
+    productos = indice.opciones('nombre')
+    for clientes_sel, productos_sel in ([], []), (clientes[:3], []), (clientes[:2], productos[:2]):
+        pd.testing.assert_frame_equal(
+            texto_plano(indice.filtrar_detalle({'cliente': clientes_sel, 'nombre': productos_sel})),
+            texto_plano(baseline.detalle_ventas(esperadas, clientes_sel, productos_sel, [])),
+            check_dtype=False
+        )
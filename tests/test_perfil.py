@@ -0,0 +1,88 @@
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import perfil
+
+CAMPOS_CHROME = {'name', 'cat', 'ph', 'ts', 'dur', 'pid', 'tid', 'args'}
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj manual: ``reloj.avanzar(s)``; epoch fijo en 1000 s."""
+    estado = SimpleNamespace(ahora=50.0)
+    estado.avanzar = lambda s: setattr(estado, 'ahora', estado.ahora + s)
+    monkeypatch.setattr(perfil, 'time', SimpleNamespace(time=lambda: 1000.0, perf_counter=lambda: estado.ahora))
+    return estado
+
+
+def _rerun(reloj, sesion: str, rerun: int, carga: float, grafico: float) -> perfil.Traza:
+    traza = perfil.Traza(activa=True, sesion=sesion, rerun=rerun)
+    with traza.etapa('rerun'):
+        with traza.etapa('carga', 'datos'):
+            reloj.avanzar(carga)
+        with traza.etapa('grafico', 'figura') as args:
+            reloj.avanzar(grafico)
+            args['bytes'] = 2048
+    return traza
+
+
+def test_eventos_chrome_trace(reloj):
+    traza = _rerun(reloj, 'abc', 3, carga=0.25, grafico=0.5)
+    eventos = {e['name']: e for e in traza.eventos}
+    assert set(eventos) == {'rerun', 'carga', 'grafico'}
+    for e in traza.eventos:
+        assert set(e) == CAMPOS_CHROME
+        assert e['ph'] == 'X'
+        assert e['pid'] == os.getpid() and e['tid'] == threading.get_ident()
+        assert e['args']['sesion'] == 'abc' and e['args']['rerun'] == 3
+    # Microsegundos desde epoch
+    assert eventos['rerun']['ts'] == eventos['carga']['ts'] == 1000 * 10**6
+    assert eventos['grafico']['ts'] == 1000 * 10**6 + 250_000
+    assert (eventos['carga']['dur'], eventos['grafico']['dur'], eventos['rerun']['dur']) == (250_000, 500_000, 750_000)
+    assert eventos['carga']['cat'] == 'datos' and eventos['grafico']['args']['bytes'] == 2048
+    assert [eventos[n]['args']['profundidad'] for n in ('rerun', 'carga')] == [0, 1]
+    assert traza.resumen()['Etapa'].tolist() == ['rerun', '  carga', '  grafico']
+
+
+def test_inactiva_no_registra(tmp_path):
+    traza = perfil.Traza()
+    with traza.etapa('rerun') as args:
+        args['bytes'] = 1
+    assert traza.eventos == []
+    traza.escribir(str(tmp_path / 'traza.jsonl'))
+    assert not (tmp_path / 'traza.jsonl').exists()
+
+
+def test_agregado_desde_cli(reloj, tmp_path, monkeypatch, capsys):
+    rutas = [str(tmp_path / 'a.jsonl'), str(tmp_path / 'b.jsonl')]
+    duraciones = [(0.1, 0.2), (0.3, 0.4), (0.5, 0.6)]
+    for i, (carga, grafico) in enumerate(duraciones):
+        _rerun(reloj, f"s{i}", i, carga, grafico).escribir(rutas[i % 2])
+    eventos = [e for ruta in rutas for e in perfil.leer_traza(ruta)]
+    assert len(eventos) == 3 * len(duraciones)
+
+    resumen = perfil.resumen_etapas(eventos)
+    carga = resumen.loc[('datos', 'carga')]
+    assert carga['n'] == 3
+    assert (carga['p50_ms'], carga['max_ms']) == (300, 500)
+    assert resumen.loc[('figura', 'grafico'), 'bytes_medio'] == 2048
+    assert pd.isna(resumen.loc[('etapa', 'rerun'), 'bytes_medio'])
+    assert resumen.loc[('etapa', 'rerun'), 'max_ms'] == 1100
+    assert resumen.index[0] == ('etapa', 'rerun')
+
+    chrome = str(tmp_path / 'traza.json')
+    monkeypatch.setattr(sys, 'argv', ['perfil.py', *rutas, '--chrome', chrome])
+    perfil.main()
+    salida = capsys.readouterr().out
+    assert 'carga' in salida and 'grafico' in salida
+    with open(chrome, encoding='utf-8') as f:
+        volcado = json.load(f)
+    assert volcado['displayTimeUnit'] == 'ms'
+    assert volcado['traceEvents'] == eventos
+    assert sum(e['dur'] for e in volcado['traceEvents'] if e['name'] == 'carga') == 900_000
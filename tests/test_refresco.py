@@ -0,0 +1,39 @@
+import threading
+import time
+
+from refresco import Refrescador
+
+
+def test_primera_carga_atascada_no_cuelga():
+    liberar = threading.Event()
+
+    def preparar(anterior, forzar):
+        liberar.wait(5)
+        return {'filas': 1}, 'h1'
+
+    refrescador = Refrescador(preparar, intervalo=60, espera=0.05).iniciar()
+    inicio = time.perf_counter()
+    assert refrescador.actual() is None
+    assert time.perf_counter() - inicio < 1
+    assert not refrescador.primera_terminada
+
+    liberar.set()
+    publicacion = refrescador.actual(espera=5)
+    assert refrescador.primera_terminada
+    assert publicacion.datos == {'filas': 1} and publicacion.huella == 'h1'
+
+
+def test_error_conserva_la_publicacion_anterior():
+    respuestas = [({'v': 1}, 'h1'), RuntimeError('sin red')]
+
+    def preparar(anterior, forzar):
+        respuesta = respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    refrescador = Refrescador(preparar, intervalo=60)
+    primera = refrescador.refrescar(forzar=False)
+    assert refrescador.refrescar() is primera
+    assert refrescador.estado()['ultimo_error'] == 'sin red'
+    assert refrescador.actual() is primera
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import dashboard
+import generador
+from conftest import generar
+from data_sources import FuenteGoogleSheets, crear_fuente
+from sheets_local import ServidorSheetsLocal
+
+RANGO = 'Carnes!A1:L'
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    generador.guardar_libro(generar(300), str(tmp_path))
+    servidor = ServidorSheetsLocal(crear_fuente(f"csv:{tmp_path}"))
+    servidor.iniciar()
+    yield servidor
+    servidor.detener()
+
+
+@pytest.fixture
+def lecturas(monkeypatch):
+    """Rangos descargados con FuenteGoogleSheets.leer."""
+    llamadas = []
+    leer = FuenteGoogleSheets.leer
+
+    def contar(self, range_name):
+        llamadas.append(range_name)
+        return leer(self, range_name)
+
+    monkeypatch.setattr(FuenteGoogleSheets, 'leer', contar)
+    return llamadas
+
+
+def anadir_filas(ruta: str, filas: int):
+    with open(ruta, 'a', encoding='utf-8') as f:
+        generar(filas, semilla=1).to_csv(f, header=False, index=False)
+    # La firma es fecha y tamaño: se fuerza otra fecha por si el reloj no avanza
+    estado = os.stat(ruta)
+    os.utime(ruta, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000_000))
+
+
+def test_firma_cambia_con_el_fichero(servidor, tmp_path):
+    fuente = FuenteGoogleSheets('libro', api_endpoint=servidor.url)
+    firma = fuente.firma(RANGO)
+    assert firma is not None
+    assert fuente.firma(RANGO) == firma
+
+    anadir_filas(str(tmp_path / 'Carnes.csv'), 5)
+    assert fuente.firma(RANGO) != firma
+
+
+def test_sin_cambios_no_descarga(servidor, lecturas, tmp_path):
+    primero = dashboard.descargar_hoja(servidor.url, 'libro', RANGO)
+    assert len(primero) == 300 and lecturas == [RANGO]
+
+    assert dashboard.descargar_hoja(servidor.url, 'libro', RANGO, anterior=primero) is primero
+    assert lecturas == [RANGO]
+
+    anadir_filas(str(tmp_path / 'Carnes.csv'), 5)
+    segundo = dashboard.descargar_hoja(servidor.url, 'libro', RANGO, anterior=primero)
+    assert lecturas == [RANGO, RANGO]
+    assert len(segundo) == 305
+    assert segundo.attrs['firma'] != primero.attrs['firma']
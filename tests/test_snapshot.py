@@ -0,0 +1,35 @@
+import pandas as pd
+
+import analytics
+import ingestion
+import snapshot
+
+
+def test_ida_y_vuelta(libro, tmp_path):
+    original = libro.copy()
+    original.attrs['huella'] = analytics.huella_dataframe(original)
+    ruta = snapshot.ruta_snapshot(str(tmp_path), ('sheets', 'hoja', 'A:K'))
+    snapshot.guardar(original, ruta)
+
+    cargado, guardado_en = snapshot.cargar(ruta)
+    pd.testing.assert_frame_equal(cargado, original)
+    assert cargado.attrs['huella'] == original.attrs['huella'] == snapshot.leer_huella(ruta)
+    assert cargado.attrs['memoria'] == original.attrs['memoria']
+    assert guardado_en > 0
+    pd.testing.assert_frame_equal(analytics.calcular_stock_actual(cargado), analytics.calcular_stock_actual(libro))
+
+
+def test_libro_combinado(libro, tmp_path):
+    combinado = ingestion.combinar_libros({'frescos': libro.iloc[:2000], 'congelados': libro.iloc[2000:]})
+    ruta = str(tmp_path / 'combinado.arrow')
+    snapshot.guardar(combinado, ruta)
+    cargado, _ = snapshot.cargar(ruta)
+    pd.testing.assert_frame_equal(cargado, combinado)
+
+
+def test_instantanea_danada_o_ausente(tmp_path):
+    ruta = tmp_path / 'libro.arrow'
+    assert snapshot.cargar(str(ruta)) is None
+    ruta.write_bytes(b'no es arrow')
+    assert snapshot.cargar(str(ruta)) is None
+    assert snapshot.leer_huella(str(ruta)) is None
@@ -0,0 +1,40 @@
+import pandas as pd
+
+import analytics
+
+
+def test_filas_anadidas_igual_que_recalcular(libro):
+    ledger = analytics.StockIncremental()
+    for fin in (1000, 2500, 2500, 4000, len(libro)):
+        parcial = libro.iloc[:fin]
+        pd.testing.assert_frame_equal(ledger.actualizar(parcial), analytics.calcular_stock_actual(parcial))
+    assert ledger.reconstrucciones == 1
+    assert ledger.filas_incrementales == len(libro) - 1000
+
+
+def test_edicion_en_la_cola_reconstruye(libro):
+    ledger = analytics.StockIncremental()
+    ledger.actualizar(libro.iloc[:3000])
+    editado = libro.iloc[:3500].copy()
+    editado.loc[editado.index[2990], 'cajas'] += 7
+    pd.testing.assert_frame_equal(ledger.actualizar(editado), analytics.calcular_stock_actual(editado))
+    assert ledger.reconstrucciones == 2
+
+
+def test_filas_borradas_reconstruye(libro):
+    ledger = analytics.StockIncremental()
+    ledger.actualizar(libro.iloc[:3000])
+    pd.testing.assert_frame_equal(
+        ledger.actualizar(libro.iloc[:2000]), analytics.calcular_stock_actual(libro.iloc[:2000])
+    )
+    assert ledger.reconstrucciones == 2
+
+
+def test_edicion_al_principio_reconstruye(libro):
+    ledger = analytics.StockIncremental()
+    ledger.actualizar(libro.iloc[:3000])
+    editado = libro.iloc[:4000].copy()
+    editado.loc[editado.index[10], 'cajas'] += 1000
+    pd.testing.assert_frame_equal(ledger.actualizar(editado), analytics.calcular_stock_actual(editado))
+    assert ledger.reconstrucciones == 2
+    assert ledger.filas_incrementales == 0
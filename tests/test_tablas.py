@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import tablas
+
+
+def _tabla(filas: int = 2000, semilla: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(semilla)
+    # Pocos valores distintos para que haya muchos empates, y un 10% de nulos
+    cantidad = rng.integers(0, 20, filas).astype(float)
+    cantidad[rng.random(filas) < 0.1] = np.nan
+    return pd.DataFrame({
+        'nombre': [f"Producto {i % 37}" for i in range(filas)],
+        'cantidad': cantidad,
+        'lote': rng.integers(0, 5, filas),
+    }, index=rng.permutation(filas))
+
+
+def _ordenado_completo(df, columna, descendente):
+    return df.sort_values(columna, ascending=not descendente, kind='stable', na_position='last')
+
+
+@pytest.mark.parametrize('columna', ['cantidad', 'lote'])
+@pytest.mark.parametrize('descendente', [False, True])
+@pytest.mark.parametrize('filas', [1, 25, 150])
+def test_atajo_igual_que_orden_completo(columna, descendente, filas):
+    df = _tabla()
+    assert filas * 10 < len(df)
+    atajo = tablas.ordenar(df, columna, descendente, filas=filas)
+    esperado = _ordenado_completo(df, columna, descendente).head(filas)
+    pd.testing.assert_frame_equal(atajo.head(filas), esperado)
+
+
+def test_sin_atajo_con_pocos_valores_no_nulos():
+    df = _tabla(500)
+    df['cantidad'] = np.nan
+    df.iloc[:3, df.columns.get_loc('cantidad')] = [2.0, 1.0, 2.0]
+    resultado = tablas.ordenar(df, 'cantidad', True, filas=10)
+    pd.testing.assert_frame_equal(resultado, _ordenado_completo(df, 'cantidad', True))
+
+
+@pytest.mark.parametrize('tamano', tablas.TAMANOS_PAGINA)
+def test_paginas_cubren_todas_las_filas(tamano):
+    df = _tabla(1013)
+    esperado = _ordenado_completo(df, 'cantidad', False)
+    paginas = tablas.total_paginas(len(df), tamano)
+    trozos = []
+    for numero in range(1, paginas + 1):
+        trozo, total = tablas.preparar_pagina(df, 'cantidad', numero=numero, tamano=tamano)
+        assert total == len(df)
+        assert len(trozo) == (tamano if numero < paginas else len(df) - (paginas - 1) * tamano)
+        trozos.append(trozo)
+    pd.testing.assert_frame_equal(pd.concat(trozos), esperado)
+
+
+def test_limites_de_pagina():
+    df = _tabla(100)
+    assert tablas.total_paginas(0, 50) == 1
+    assert tablas.total_paginas(100, 50) == 2
+    assert tablas.total_paginas(101, 50) == 3
+    # Fuera de rango se corrige a la primera o la última página
+    primera, _ = tablas.preparar_pagina(df, numero=0, tamano=30)
+    ultima, _ = tablas.preparar_pagina(df, numero=99, tamano=30)
+    pd.testing.assert_frame_equal(primera, df.iloc[:30])
+    pd.testing.assert_frame_equal(ultima, df.iloc[90:])
+    vacia, total = tablas.preparar_pagina(df, texto='no existe', numero=3, tamano=30)
+    assert vacia.empty and total == 0
+
+
+def test_busqueda_en_columnas_categoricas():
+    df = _tabla(300)
+    df['categoria'] = pd.Categorical(
+        np.where(np.arange(300) % 3 == 0, 'Carnes Rojas', 'Pollo'), categories=['Carnes Rojas', 'Pollo', 'Sin uso'])
+    df.loc[df.index[5], 'categoria'] = np.nan
+    como_texto = df.assign(categoria=df['categoria'].astype(object))
+    for texto in ('ROJAS', 'pollo', 'sin uso', 'producto 3', '  carnes '):
+        pd.testing.assert_frame_equal(tablas.buscar(df, texto), df.loc[tablas.buscar(como_texto, texto).index])
+    assert len(tablas.buscar(df, 'rojas')) == 100
+    assert tablas.buscar(df, 'sin uso').empty
+    assert tablas.buscar(df, '') is df